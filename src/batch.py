@@ -0,0 +1,175 @@
+'''
+3 Fingerprint compression
+Batch compression
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+import argparse
+import compression
+import configuration as c
+import cost
+import diskcache
+import glob
+import json
+import multiprocessing
+import numpy as np
+import os
+import pgm
+import pywt
+import time
+
+###############################################################################
+# BATCH FUNCTIONS
+###############################################################################
+
+methods = ["dwt2", "wp2", "sd"]
+
+def compressor(S, method, costf=cost.cost_shannon, wavelet="db4", mode=pywt.MODES.ppd, level=4, workers=1, strip=False):
+    '''
+    Returns the compression function of the given method for the given 2D input signal.
+    (see compression.compressor_dwt2, compression.compressor_wp2 and compression.compressor_sd)
+    @param S:         Input signal.
+    @param method:    The compression method ("dwt2", "wp2" or "sd").
+    @param costf:      The cost function (only used by "wp2").
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param level:     Number of decomposition steps to perform (not used by "sd").
+    @param workers:   The number of threads that process the subtrees of the first level
+                      (not used by "dwt2").
+    @param strip:     True if the transformations must be streamed row by row, so the
+                      coefficients are not kept (only used by "dwt2", see
+                      compression.compressor_dwt2). The image and the compressed image
+                      are still held in memory to compute the errors (see compression.sweep).
+    '''
+    if method == "dwt2":
+        return compression.compressor_dwt2(S, wavelet=wavelet, mode=mode, level=level, strip=strip)
+    if method == "wp2":
+        return compression.compressor_wp2(S, costf=costf, wavelet=wavelet, mode=mode, level=level, workers=workers)
+    if method == "sd":
+        return compression.compressor_sd(S, wavelet=wavelet, mode=mode, workers=workers)
+    raise ValueError("Unknown compression method: " + str(method))
+
+def process(task):
+    '''
+    Compresses one fingerprint for all fractions.
+    @param task:      Tuple containing the file name, the fractions, the method,
+                      the name of the cost function, the parameter of the cost function,
+                      the wavelet, the mode, the level, the number of threads, the
+                      directory and maximum number of bytes of the cache (or None) and
+                      whether the transformations are computed row by row (see compressor).
+    @return:          Dictionary containing the results: the file name, the mean squared
+                      errors and the numbers of large coefficients for all fractions,
+                      the time of the analysis and the time of the compression sweep.
+    '''
+    (fname, fractions, method, costname, parameter, wavelet, mode, level, workers, cache, strip) = task
+    S = pgm.image(fname, invert=True)
+    crop = 5 if method == "sd" else level
+
+    start = time.time()
+    if cache != None and method == "wp2":
+        compressf = diskcache.compressor_wp2(S, costname=costname, parameter=parameter, wavelet=wavelet, mode=mode, level=level,
+                                             cache=diskcache.DiskCache(*cache))
+    elif cache != None and method == "sd":
+        compressf = diskcache.compressor_sd(S, wavelet=wavelet, mode=mode, cache=diskcache.DiskCache(*cache))
+    else:
+        compressf = compressor(S, method, costf=cost.cost_function(costname, parameter), wavelet=wavelet, mode=mode, level=level,
+                               workers=workers, strip=strip)
+    analysis = time.time() - start
+    start = time.time()
+    (E, N) = compression.sweep(S, fractions, compressf, crop=crop)
+    sweep = time.time() - start
+
+    return {"file" : os.path.basename(fname),
+            "mse" : [float(e) for e in E],
+            "large_coeffs" : [int(n) for n in N],
+            "analysis_time" : analysis,
+            "sweep_time" : sweep}
+
+def run(fnames, fractions, method, costname="shannon", parameter=None, wavelet="db4", mode=pywt.MODES.ppd, level=4,
+        processes=None, tasks_per_process=8, workers=1, cache=None, cache_size=2**30, strip=False):
+    '''
+    Compresses all the given fingerprints for all the given fractions
+    using a pool of processes. Every process handles one fingerprint at a time
+    and is replaced after the given number of fingerprints to bound its memory.
+    @param fnames:    The file names of the fingerprints.
+    @param fractions: The fractions.
+    @param method:    The compression method ("dwt2", "wp2" or "sd").
+    @param costname:  The name of the cost function (see cost.cost_function).
+    @param parameter: The parameter of the cost function (see cost.cost_function).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param level:     Number of decomposition steps to perform (not used by "sd").
+    @param processes: The number of processes. If the number of processes is None,
+                      the number of CPUs is used.
+    @param tasks_per_process: The number of fingerprints a process handles before
+                      it is replaced.
+    @param workers:   The number of threads of every process that process the subtrees
+                      of the first level of a fingerprint (see compressor).
+    @param cache:     The directory of the cache of the decompositions and best bases
+                      (not used by "dwt2", see diskcache) or None if nothing is cached.
+    @param cache_size: The maximum number of bytes of the cache.
+    @param strip:     True if the transformations must be streamed row by row
+                      (only used by "dwt2", see compressor).
+    @return:          List containing the results for all fingerprints (see process)
+                      in the order of the given file names.
+    '''
+    fractions = [float(f) for f in fractions]
+    cache = None if cache == None else (cache, cache_size)
+    tasks = [(fname, fractions, method, costname, parameter, wavelet, mode, level, workers, cache, strip) for fname in fnames]
+    pool = multiprocessing.Pool(processes=processes, maxtasksperchild=tasks_per_process)
+    try:
+        return pool.map(process, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+###############################################################################
+# COMMAND LINE
+###############################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compresses all fingerprints (.pgm) of a directory for multiple fractions.")
+    parser.add_argument("directory", nargs="?", default=c.get_dir_fingerprints(), help="directory containing the fingerprints")
+    parser.add_argument("--method", choices=methods, default="wp2", help="compression method")
+    parser.add_argument("--cost", default="shannon", choices=["shannon", "log_energy", "threshold", "norm"], help="cost function (wp2 only)")
+    parser.add_argument("--parameter", type=float, default=None, help="threshold value or exponent of the cost function")
+    parser.add_argument("--wavelet", default="db4", help="wavelet")
+    parser.add_argument("--level", type=int, default=4, help="number of decomposition steps (dwt2 and wp2 only)")
+    parser.add_argument("--fractions", type=float, nargs="+", default=None, help="fractions (default: 0 and 10^-20 to 10^-0.5)")
+    parser.add_argument("--processes", type=int, default=None, help="number of processes (default: number of CPUs)")
+    parser.add_argument("--tasks-per-process", type=int, default=8, help="number of fingerprints per process before it is replaced")
+    parser.add_argument("--workers", type=int, default=1, help="number of threads per process (wp2 and sd only)")
+    parser.add_argument("--cache", default=None, help="directory of the cache of the decompositions and best bases (wp2 and sd only)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="maximum size of the cache (in MB)")
+    parser.add_argument("--strip", action="store_true", help="stream the transformations row by row without keeping the coefficients "
+                        "(dwt2 only; the image and the compressed image are still held in memory)")
+    parser.add_argument("--output", default="results.json", help="output file (JSON)")
+    args = parser.parse_args(argv)
+
+    fnames = sorted(glob.glob(os.path.join(args.directory, "*.pgm")))
+    if args.fractions == None:
+        fractions = np.append([0.0], np.power(10, np.arange(-20.0, 0.0, 0.5)))
+    else:
+        fractions = args.fractions
+
+    start = time.time()
+    results = run(fnames, fractions, args.method, costname=args.cost, parameter=args.parameter,
+                  wavelet=args.wavelet, level=args.level,
+                  processes=args.processes, tasks_per_process=args.tasks_per_process, workers=args.workers,
+                  cache=args.cache, cache_size=args.cache_size * 2**20, strip=args.strip)
+
+    output = {"method" : args.method,
+              "cost" : args.cost if args.method == "wp2" else None,
+              "parameter" : args.parameter,
+              "wavelet" : args.wavelet,
+              "level" : args.level if args.method != "sd" else 5,
+              "fractions" : [float(f) for f in fractions],
+              "total_time" : time.time() - start,
+              "results" : results}
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+'''
+3 Fingerprint compression
+Benchmarks
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+import argparse
+import compression
+import configuration as c
+import cost
+import glob
+import json
+import multiprocessing
+import numpy as np
+import os
+import pgm
+import platform
+import pywt
+import quadtree
+import sys
+import time
+import utils
+import wsq
+
+try:
+    import resource
+except ImportError:
+    #Not available on Windows (no peak memory)
+    resource = None
+
+###############################################################################
+# BENCHMARKS
+###############################################################################
+
+costs = ["shannon", "log_energy", "threshold", "norm"]
+benchmarks = ["wp2_" + name for name in costs] + ["sd", "isd", "compress_dwt2", "compress_wp2", "compress_sd", "best_fit", "combine"]
+
+def uses_level(name):
+    '''
+    Checks whether the given benchmark depends on the number of decomposition steps
+    (the subband decomposition for fingerprints has a fixed number of levels).
+    @param name:      The name of the benchmark.
+    '''
+    return name not in ("sd", "isd", "compress_sd")
+
+def prepare(name, S, wavelet="db4", mode=pywt.MODES.ppd, level=4, fraction=0.05):
+    '''
+    Returns the function (without arguments) that runs the given benchmark for the
+    given 2D input signal. The work that must not be measured (e.g. the analysis
+    for "isd" or the compression for "best_fit") is done before returning.
+    @param name:      The name of the benchmark (see benchmarks).
+    @param S:         Input signal.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param level:     Number of decomposition steps to perform (see uses_level).
+    @param fraction:  The fraction of the compression benchmarks.
+    '''
+    if name.startswith("wp2_"):
+        costf = cost.cost_function(name[len("wp2_"):])
+        return lambda: quadtree.wp2(S, costf, wavelet=wavelet, mode=mode, level=level)
+    if name == "sd":
+        return lambda: wsq.sd(S, wavelet=wavelet, mode=mode)
+    if name == "isd":
+        Nodes = wsq.sd(S, wavelet=wavelet, mode=mode)
+        return lambda: wsq.isd(Nodes, wavelet=wavelet, mode=mode)
+    if name == "compress_dwt2":
+        return lambda: compression.compress_dwt2(S, fraction, wavelet=wavelet, mode=mode, level=level)
+    if name == "compress_wp2":
+        return lambda: compression.compress_wp2(S, fraction, wavelet=wavelet, mode=mode, level=level)
+    if name == "compress_sd":
+        return lambda: compression.compress_sd(S, fraction, wavelet=wavelet, mode=mode)
+    if name == "best_fit":
+        R = compression.compress_dwt2(S, fraction, wavelet=wavelet, mode=mode, level=level)
+        return lambda: compression.best_fit(S, R)
+    if name == "combine":
+        A = pywt.wavedec2(S, wavelet=wavelet, mode=mode, level=level)
+        return lambda: utils.combine(utils.concat_coeffs2(A[:-1]), A[-1])
+    raise ValueError("Unknown benchmark: " + str(name))
+
+def peak_memory():
+    '''
+    Returns the peak resident memory of this process (in bytes)
+    or None if it is not available.
+    '''
+    if resource == None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Bytes on Mac OS X and kilobytes on Linux
+    return peak if sys.platform == "darwin" else 1024 * peak
+
+def measure(task):
+    '''
+    Runs one benchmark for all fingerprints.
+    @param task:      Tuple containing the name of the benchmark, the file names,
+                      the wavelet, the mode, the level, the fraction and the number
+                      of repetitions.
+    @return:          Dictionary containing the results: the name of the benchmark,
+                      the wavelet, the level, the number of fingerprints, the wall times
+                      of all repetitions (for all fingerprints), the smallest wall time,
+                      the throughput (fingerprints per second for the smallest wall time)
+                      and the peak memory (in bytes) above the memory of the prepared
+                      benchmark.
+    '''
+    (name, fnames, wavelet, mode, level, fraction, repeat) = task
+    Images = [pgm.image(fname, invert=True) for fname in fnames]
+    Functions = [prepare(name, S, wavelet=wavelet, mode=mode, level=level, fraction=fraction) for S in Images]
+    memory = peak_memory()
+
+    #The first run fills the caches (schedules, plans, ...) and is not timed
+    for f in Functions:
+        f()
+    Times = []
+    for r in range(repeat):
+        start = time.time()
+        for f in Functions:
+            f()
+        Times.append(time.time() - start)
+
+    best = min(Times)
+    return {"benchmark" : name,
+            "wavelet" : wavelet,
+            "level" : level if uses_level(name) else None,
+            "images" : len(Images),
+            "times" : Times,
+            "time" : best,
+            "throughput" : len(Images) / best if best > 0 else None,
+            "peak_memory" : None if memory == None else peak_memory() - memory}
+
+def key(result):
+    '''
+    Returns the key of the given result of a benchmark (see measure).
+    @param result:    The result.
+    '''
+    return result["benchmark"] + "/" + result["wavelet"] + "/" + str(result["level"])
+
+def run(fnames, names=benchmarks, wavelets=["db4"], levels=[4], mode=pywt.MODES.ppd, fraction=0.05, repeat=3):
+    '''
+    Runs the given benchmarks for all the given fingerprints, wavelets and levels.
+    Every benchmark runs in a new process (one at a time), so the peak memory
+    of a benchmark does not depend on the benchmarks before it.
+    @param fnames:    The file names of the fingerprints.
+    @param names:     The names of the benchmarks (see benchmarks).
+    @param wavelets:  The wavelets.
+    @param levels:    The numbers of decomposition steps (see uses_level).
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param fraction:  The fraction of the compression benchmarks.
+    @param repeat:    The number of timed repetitions of every benchmark.
+    @return:          List containing the results of all benchmarks (see measure).
+    '''
+    tasks = []
+    for name in names:
+        for wavelet in wavelets:
+            for level in (levels if uses_level(name) else levels[:1]):
+                tasks.append((name, fnames, wavelet, mode, level, fraction, repeat))
+    pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+    try:
+        return pool.map(measure, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def compare(results, baseline, tolerance=0.2, memory_slack=2**20):
+    '''
+    Returns the regressions of the given results against the given baseline results
+    (of the same benchmarks). Benchmarks that are not in the baseline are ignored.
+    @param results:   List containing the results (see run).
+    @param baseline:  List containing the baseline results (see run).
+    @param tolerance: The tolerated relative increase of the wall time and the peak memory.
+    @param memory_slack: The tolerated absolute increase of the peak memory (in bytes).
+    @return:          List containing a tuple (key, quantity, baseline value, value)
+                      for every regression.
+    '''
+    Baseline = dict([(key(result), result) for result in baseline])
+    Regressions = []
+    for result in results:
+        if key(result) not in Baseline:
+            continue
+        base = Baseline[key(result)]
+        if result["time"] > (1 + tolerance) * base["time"]:
+            Regressions.append((key(result), "time", base["time"], result["time"]))
+        if result["peak_memory"] != None and base["peak_memory"] != None:
+            if result["peak_memory"] > (1 + tolerance) * base["peak_memory"] + memory_slack:
+                Regressions.append((key(result), "peak_memory", base["peak_memory"], result["peak_memory"]))
+    return Regressions
+
+def environment():
+    '''
+    Returns a dictionary describing the environment of the benchmarks.
+    '''
+    return {"python" : platform.python_version(),
+            "numpy" : np.__version__,
+            "pywt" : getattr(pywt, "__version__", None),
+            "platform" : platform.platform(),
+            "cpus" : multiprocessing.cpu_count(),
+            "date" : time.strftime("%Y-%m-%d %H:%M:%S")}
+
+###############################################################################
+# COMMAND LINE
+###############################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the transforms, best basis searches and compressions for the fingerprints (.pgm) of a directory.")
+    parser.add_argument("directory", nargs="?", default=c.get_dir_fingerprints(), help="directory containing the fingerprints")
+    parser.add_argument("--pattern", default="*.pgm", help="pattern of the file names of the fingerprints")
+    parser.add_argument("--count", type=int, default=None, help="number of fingerprints (default: all)")
+    parser.add_argument("--benchmarks", nargs="+", choices=benchmarks, default=benchmarks, help="benchmarks")
+    parser.add_argument("--wavelets", nargs="+", default=["db4"], help="wavelets")
+    parser.add_argument("--levels", type=int, nargs="+", default=[4], help="numbers of decomposition steps (not used by sd, isd and compress_sd)")
+    parser.add_argument("--fraction", type=float, default=0.05, help="fraction of the compression benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed repetitions")
+    parser.add_argument("--output", default="benchmark.json", help="output file (JSON)")
+    parser.add_argument("--baseline", default=None, help="output file (JSON) of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="tolerated relative increase of the wall time and the peak memory")
+    args = parser.parse_args(argv)
+
+    fnames = sorted(glob.glob(os.path.join(args.directory, args.pattern)))[:args.count]
+    results = run(fnames, names=args.benchmarks, wavelets=args.wavelets, levels=args.levels,
+                  fraction=args.fraction, repeat=args.repeat)
+
+    output = {"files" : [os.path.basename(fname) for fname in fnames],
+              "fraction" : args.fraction,
+              "repeat" : args.repeat,
+              "environment" : environment(),
+              "results" : results}
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=1)
+
+    for result in results:
+        memory = "-" if result["peak_memory"] == None else "%.1f MB" % (result["peak_memory"] / 2.0**20)
+        print "%-32s %10.4f s %10.2f images/s %12s" % (key(result), result["time"], result["throughput"] or 0, memory)
+
+    if args.baseline != None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+        Regressions = compare(results, baseline, tolerance=args.tolerance)
+        for (name, quantity, base, value) in Regressions:
+            print "Regression: %s %s %g -> %g" % (name, quantity, base, value)
+        return 1 if len(Regressions) > 0 else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,13 @@
 @version    1.0
 '''
 
+import copy
 import cost
-import heapq
+import dwt
 import node
 import numpy as np
 import pywt
+import synthesis
 
 ###############################################################################
 # ANALYSIS ALGORITHM FUNCTIONS
@@ -25,7 +27,9 @@ def wp(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=None):
                       in one of these types it will be converted to the default double precision
                       data format before performing computations.
     @param costf:      The (single parameter) cost function that must be used while
-                      searching for the best basis.
+                      searching for the best basis. If a list of cost functions is given,
+                      the wavelet packets are computed once and the costs of a node are
+                      computed together for all cost functions (see costs).
     @param wavelet:   Wavelet to use in the transform. 
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
@@ -35,20 +39,26 @@ def wp(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=None):
                       the given data and wavelet lengths is performed.
     @return:          A list containing the nodes of the 1D discrete wavelet packet transformation,
                       with the best basis according to the given cost function, for the given input signal. 
+                      If a list of cost functions is given, a list containing such a list for every
+                      cost function (the coefficients of the nodes are shared).
     '''
     if (level == None):
         level = pywt.dwt_max_level(S.shape[0], pywt.Wavelet(wavelet))
     
     #Data collection step
     Nodes = collect(S, wavelet=wavelet, mode=mode, level=level)
+    if isinstance(costf, (list, tuple)):
+        Bases = []
+        for Costs in costs(Nodes, costf):
+            mark(Nodes, None, Costs=Costs)
+            #The nodes are marked again for the next cost function
+            Bases.append([copy.copy(Node) for Node in best_basis(Nodes)])
+        return Bases
     #Dynamic programming upstream traversal
     mark(Nodes, costf)
     #node.print_nodes(Nodes)
     #Dynamic programming downstream traversal
-    Result = []
-    traverse(Nodes[0][0], Nodes, Result)
-    traverse(Nodes[0][1], Nodes, Result)
-    return sorted(Result, cmp=node.compare_low_level_first, reverse=False)
+    return best_basis(Nodes)
                      
 def collect(S, wavelet, mode, level):
     '''
@@ -67,42 +77,72 @@ def collect(S, wavelet, mode, level):
     @return:          The full binary tree of wavelet packets.
     '''
     Nodes = [[] for i in range(level)]
-    (Cl, Cr) = pywt.dwt(S, wavelet=wavelet, mode=mode)
-    Nodes[0] = [node.Node(Cl, 0, 0), node.Node(Cr, 0, 1)]
-    for l in range(0, level-1):
-        Parents = Nodes[l]
-        Childs = []
-        for p in range(len(Parents)):
-            (Cl, Cr) = pywt.dwt(Parents[p].C, wavelet=wavelet, mode=mode)
-            Childs.append(node.Node(Cl, l+1, 2*p))
-            Childs.append(node.Node(Cr, l+1, 2*p+1))
-        Nodes[l+1] = Childs 
+    #All nodes of one level are decomposed together and the coefficients
+    #of the nodes are views of the stacked coefficients of their level
+    Childs = np.asarray(S)[np.newaxis]
+    for l in range(0, level):
+        Childs = dwt.packets(Childs, wavelet=wavelet, mode=mode)
+        Nodes[l] = [node.Node(Childs[p], l, p) for p in range(len(Childs))]
     return Nodes
     
-def mark(Nodes, costf):
+def costs(Nodes, Costfs):
+    '''
+    Returns the costs of all nodes for all the given cost functions.
+    All cost functions are evaluated for a node before moving on to the
+    next node, so the coefficients of a node are read from memory once.
+    @param Nodes:     List containing the nodes of the 1D discrete wavelet packet
+                      transformation.
+    @param Costfs:    List containing the (single parameter) cost functions.
+    @return:          List containing for every cost function the list containing
+                      the list of the costs of the nodes of every level (see mark).
+    '''
+    Costs = [[[] for l in range(len(Nodes))] for costf in Costfs]
+    for l in range(len(Nodes)):
+        for Node in Nodes[l]:
+            for (k, costf) in enumerate(Costfs):
+                Costs[k][l].append(costf(Node.C))
+    return Costs
+
+def mark(Nodes, costf, Costs=None):
     '''
     Marks every node of nodes with the best cost seen so far. 
     @param Nodes:     List containing the nodes of the 1D discrete wavelet packet
                       transformation.
     @param costf:      The (single parameter) cost function that must be used while
                       searching for the best basis.
+    @param Costs:     List containing the list of the costs of the nodes of every level
+                      (see costs), which are used instead of the cost function (or None).
     '''
+    if Costs == None:
+        Costs = costs(Nodes, [costf])[0]
     for p in range(len(Nodes[-1])):
         Node = Nodes[-1][p]
-        cp = costf(Node.C)
+        cp = Costs[-1][p]
         Node.cost = cp
         Node.best = cp
     for l in range(len(Nodes)-2, -1, -1):
         for p in range(len(Nodes[l])):
             Node = Nodes[l][p]
             cc = Nodes[l+1][2*p].best + Nodes[l+1][2*p+1].best
-            cp = costf(Node.C)
+            cp = Costs[l][p]
             Node.cost = cp
             if cp <= cc:
                 Node.best = cp
             else:
                 Node.best = cc 
           
+def best_basis(Nodes):
+    '''
+    Returns a list containing the nodes of the best basis of the given marked
+    nodes (low levels first, low indices first), see mark.
+    @param Nodes:     List containing the nodes of the 1D discrete wavelet packet
+                      transformation.
+    '''
+    Result = []
+    traverse(Nodes[0][0], Nodes, Result)
+    traverse(Nodes[0][1], Nodes, Result)
+    return sorted(Result, cmp=node.compare_low_level_first, reverse=False)
+          
 def traverse(Node, Nodes, Result):
     '''
     Traverses the given node.
@@ -138,15 +178,15 @@ def iwp(Nodes, wavelet="db4", mode=pywt.MODES.ppd):
                       The default mode is periodic-padding.
     @return:          The inverse 1D discrete wavelet packet transformation for the given
                       list containing the nodes of the 1D discrete wavelet packet transformation.
+    @note:            The merge schedule of the basis of the given nodes is cached
+                      and the given list is not modified. All merges of one level
+                      are done together (see synthesis.run_levels).
     '''
-    heapq.heapify(Nodes)
-    while len(Nodes) != 1:
-        Node1 = heapq.heappop(Nodes)
-        Node2 = heapq.heappop(Nodes)
-        S = pywt.idwt(Node1.C, Node2.C, wavelet=wavelet, mode=mode, correct_size=True)
-        Merged = node.Node(S, (Node1.level-1), (Node1.index / 2))
-        heapq.heappush(Nodes, Merged)
-    return Nodes[0].C
+    Schedule = synthesis.get_schedule([(Node.level, Node.index) for Node in Nodes], n=2)
+    def merge(Childs):
+        (Cl, Cr) = Childs
+        return dwt.synthesis1(Cl, Cr, wavelet=wavelet, mode=mode)
+    return synthesis.run_levels(Nodes, Schedule, merge, n=2)
 
 ###############################################################################
 # TESTS
@@ -5,9 +5,15 @@
 @version    1.0
 '''
 import cost
+import dwt
+import itertools
+import magnitudes
+import node
 import numpy as np
+import plans
 import pywt
 import quadtree
+import strip as striptransform
 import utils
 import wsq
 
@@ -15,49 +21,186 @@ import wsq
 # COMPRESSION FUNCTIONS
 ############################################################################### 
 
-def compress_dwt2(S, fraction, wavelet="db4", mode=pywt.MODES.ppd, level=4, stats=[]):
+def compress_dwt2(S, fraction, wavelet="db4", mode=pywt.MODES.ppd, level=4, stats=[], plan=None, count=None, thresholds=[], strip=False):
     '''
     Computes the 2D discrete wavelet transformation for the given 2D input signal.
     Sets all coefficients with an absolute value below the threshold * maximum of the absolute
     values of the coefficients to zero.
     Returns the inverse 2D discrete wavelet transformation for the modified coefficients
     of the 2D discrete wavelet transformation.
-    @param S:         Input signal.
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D),
+                      whose signals are compressed independently.
                       Both single and double precision floating-point data types are supported
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
                       data format before performing computations.
-    @param fraction:  The fraction.
+    @param fraction:  The fraction (not used if the count is given).
     @param wavelet:   Wavelet to use in the transform. 
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodization.
     @param level:     Number of decomposition steps to perform.
+    @param stats:     Buffer to which the number of large coefficients is appended
+                      (for every signal).
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan),
+                      whose wavelet, mode and level are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param count:     The number of coefficients with the largest absolute values that are kept
+                      (for every signal) instead of the coefficients above the fraction of the
+                      maximum, or None to use the fraction (see utils.top_coeffs).
+    @param thresholds: Buffer to which the (implied) threshold is appended (for every signal).
+    @param strip:     True if the transformations must be streamed row by row in two passes
+                      (see maximum_strips and compress_strips), e.g. for a memory-mapped image
+                      (see pgm.read). Only the output is held in memory at once, not the
+                      coefficients. The count and stacks are not supported.
     @return:          The inverse 2D discrete wavelet transformation for the modified coefficients
                       of the 2D discrete wavelet transformation.
     '''
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=level)
+    plan.check(S)
+    if strip:
+        if count != None:
+            raise ValueError("The count is not supported by the strip transformation")
+        threshold = fraction * maximum_strips(S, plan)
+        thresholds.append(threshold)
+        return collect_strips(compress_strips(S, threshold, plan, stats=stats), plan)
+    
     # 2D discrete wavelet transform
-    A = pywt.wavedec2(S, wavelet=wavelet, mode=mode, level=level)
+    A = dwt.wavedec2(S, wavelet=plan.wavelet, mode=plan.mode, level=plan.level)
+    order = utils.order_coeffs(A[0])
+    B = pack_dwt2(A, plan, order=order)
     
     # Compression
-    maximum = np.amax(abs(A[0]))
-    for (CH, CV, CD) in A[1:]:
-        maximum = max(maximum, np.amax(abs(CH)), np.amax(abs(CV)), np.amax(abs(CD)))
-    threshold = fraction * maximum
-    B = [pywt.thresholding.hard(A[0], threshold, 0)]
-    for (CH, CV, CD) in A[1:]:
-        CCH = pywt.thresholding.hard(CH, threshold, 0)
-        CCV = pywt.thresholding.hard(CV, threshold, 0)
-        CCD = pywt.thresholding.hard(CD, threshold, 0)
-        B.append((CCH, CCV, CCD))
-        
-    n = utils.number_of_large_coeffs(utils.concat_coeffs2(B), threshold=threshold)
-    stats.append(n)
-        
+    for C in np.reshape(B, (-1, plan.size)):
+        if count == None:
+            (threshold, n) = utils.compress_coeffs([C], fraction)
+        else:
+            (threshold, n) = utils.top_coeffs([C], count)
+        stats.append(n)
+        thresholds.append(threshold)
+    
     # 2D inverse discrete wavelet transform
-    return pywt.waverec2(B, wavelet=wavelet, mode=mode)
+    return dwt.waverec2(unpack_dwt2(B, plan, order=order), wavelet=plan.wavelet, mode=plan.mode)
+    
+def compressor_dwt2(S, wavelet="db4", mode=pywt.MODES.ppd, level=4, plan=None, strip=False):
+    '''
+    Returns a compression function for the given 2D input signal, which computes
+    the 2D discrete wavelet transformation only once and reuses it for every fraction.
+    (see compress_dwt2)
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D),
+                      whose signals are compressed independently.
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodization.
+    @param level:     Number of decomposition steps to perform.
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan),
+                      whose wavelet, mode and level are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param strip:     True if the transformations must be streamed row by row (see compress_dwt2).
+                      The coefficients are not kept: the maximum is computed once and the
+                      transformations are streamed again for every fraction.
+    @return:          The compression function, which takes the fraction and (optionally)
+                      the statistics buffer.
+    '''
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=level)
+    plan.check(S)
+    if strip:
+        maximum = maximum_strips(S, plan)
+        def compress_fixed_strips(fraction, stats=[]):
+            '''
+            Returns the 2D input signal compressed according to the given fraction,
+            streamed row by row (see compress_strips).
+            @param fraction:  The fraction.
+            '''
+            return collect_strips(compress_strips(S, fraction * maximum, plan, stats=stats), plan)
+        return compress_fixed_strips
     
-def compress_wp2(S, fraction, costf=cost.cost_shannon, wavelet="db4", mode=pywt.MODES.ppd, level=4, stats=[]):
+    # 2D discrete wavelet transform
+    A = dwt.wavedec2(S, wavelet=plan.wavelet, mode=plan.mode, level=plan.level)
+    order = utils.order_coeffs(A[0])
+    B = pack_dwt2(A, plan, order=order)
+    Maxima = [utils.maximum_coeffs([C]) for C in np.reshape(B, (-1, plan.size))]
+    
+    def compress_fixed_dwt2(fraction, stats=[]):
+        '''
+        Returns the inverse 2D discrete wavelet transformation for the coefficients
+        of the 2D discrete wavelet transformation modified according to the given fraction.
+        The coefficients of the 2D discrete wavelet transformation itself are not modified.
+        @param fraction:  The fraction.
+        '''
+        # Compression
+        CB = np.copy(B)
+        for (C, maximum) in zip(np.reshape(CB, (-1, plan.size)), Maxima):
+            n = utils.hard_threshold_coeffs([C], fraction * maximum)
+            stats.append(n)
+            
+        # 2D inverse discrete wavelet transform
+        return dwt.waverec2(unpack_dwt2(CB, plan, order=order), wavelet=plan.wavelet, mode=plan.mode)
+    return compress_fixed_dwt2
+    
+def maximum_strips(S, plan):
+    '''
+    Returns the maximum of the absolute values of the coefficients of the multilevel
+    2D discrete wavelet transformation of the given 2D input signal, which is streamed
+    row by row (see strip.wavedec2) without keeping the coefficients.
+    @param S:         Input signal (2D), e.g. a memory-mapped image (see pgm.read).
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan).
+    '''
+    if np.ndim(S) != 2:
+        raise ValueError("The strip transformation only supports 2D signals: compress the signals of a stack one by one")
+    maximum = 0.0
+    for (l, k, CA, D) in striptransform.wavedec2(S, plan.shape, wavelet=plan.wavelet, mode=plan.mode, level=plan.level):
+        maximum = max(maximum, utils.maximum_coeffs(list(D) if CA is None else [CA] + list(D)))
+    return maximum
+
+def compress_strips(S, threshold, plan, stats=[]):
+    '''
+    Returns a generator of the rows of the compressed 2D input signal. The multilevel
+    2D discrete wavelet transformation of the given 2D input signal is streamed row by
+    row (see strip.wavedec2), all coefficients of every coefficient row with an absolute
+    value below the given threshold are set to zero and the coefficient rows are streamed
+    into the inverse transformation (see strip.waverec2_strips). Only the rows within
+    the reach of the filters are kept, so neither the coefficients nor the output are
+    held in memory at once (only the gather tables grow with the number of rows).
+    @param S:         Input signal (2D), e.g. a memory-mapped image (see pgm.read).
+    @param threshold: The threshold.
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan).
+    @param stats:     Buffer to which the number of large coefficients is appended
+                      once all rows are generated.
+    @return:          A generator of tuples (index, row), which are not necessarily
+                      generated in order (see collect_strips).
+    '''
+    if np.ndim(S) != 2:
+        raise ValueError("The strip transformation only supports 2D signals: compress the signals of a stack one by one")
+    Strips = striptransform.wavedec2(S, plan.shape, wavelet=plan.wavelet, mode=plan.mode, level=plan.level)
+    count = [0]
+    def hard_threshold_strips(Strips):
+        for (l, k, CA, D) in Strips:
+            count[0] += utils.hard_threshold_coeffs(list(D) if CA is None else [CA] + list(D), threshold)
+            yield (l, k, CA, D)
+    for R in striptransform.waverec2_strips(hard_threshold_strips(Strips), plan.shape, wavelet=plan.wavelet, mode=plan.mode, level=plan.level):
+        yield R
+    stats.append(count[0])
+
+def collect_strips(Rows, plan):
+    '''
+    Returns the 2D signal with the given rows (see compress_strips), which is the
+    only array of the size of the signal that is allocated.
+    @param Rows:      Iterable of tuples (index, row).
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan).
+    '''
+    #Shape of the inverse transformation (see pywt.waverec2)
+    R = plan.wavelet.rec_len
+    (rows, columns) = plan.Shapes[0]
+    S = np.zeros((2*rows - R + 2, 2*columns - R + 2))
+    for (i, Row) in Rows:
+        S[i] = Row
+    return S
+
+def compress_wp2(S, fraction, costf=cost.cost_shannon, wavelet="db4", mode=pywt.MODES.ppd, level=4, stats=[], plan=None, workers=1, Basis=None, count=None, thresholds=[]):
     '''
     Computes the 2D discrete wavelet packet transformation, with the best basis according
     to the given cost function, for the given 2D input signal.
@@ -70,7 +213,7 @@ def compress_wp2(S, fraction, costf=cost.cost_shannon, wavelet="db4", mode=pywt.
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
                       data format before performing computations.
-    @param fraction:  The fraction.
+    @param fraction:  The fraction (not used if the count is given).
     @param costf:      The (single parameter) cost function that must be used while
                       searching for the best basis.
     @param wavelet:   Wavelet to use in the transform. 
@@ -78,66 +221,329 @@ def compress_wp2(S, fraction, costf=cost.cost_shannon, wavelet="db4", mode=pywt.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodization.
     @param level:     Number of decomposition steps to perform.
+    @param stats:     Buffer to which the number of large coefficients is appended.
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan),
+                      whose wavelet, mode and level are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param workers:   The number of threads that process the subtrees of the first
+                      level (see quadtree.wp2 and wsq.sd).
+    @param Basis:     The positions (level, index) of the nodes of a fixed basis (e.g. a shared
+                      basis, see quadtree.shared_basis) or None to search the best basis.
+                      With a fixed basis, no costs are computed and stacks are supported.
+    @param count:     The number of coefficients with the largest absolute values that are kept
+                      (for every signal) instead of the coefficients above the fraction of the
+                      maximum, or None to use the fraction (see utils.top_coeffs).
+    @param thresholds: Buffer to which the (implied) threshold is appended (for every signal).
     @return:          The inverse 2D discrete wavelet packet transformation for the modified coefficients
                       of the 2D discrete wavelet packet transformation.
     '''
-    # 2D discrete wavelet packet transform
-    Nodes = quadtree.wp2(S, costf, wavelet=wavelet, mode=mode, level=level)
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=level)
+    plan.check(S)
+    if Basis is not None:
+        # 2D discrete wavelet packet transform (fixed basis)
+        Nodes = quadtree.wp2_basis(S, Basis, wavelet=plan.wavelet, mode=plan.mode, level=plan.level)
+    else:
+        if np.ndim(S) != 2:
+            raise ValueError("The best basis depends on the signal: compress the signals of a stack one by one")
+        # 2D discrete wavelet packet transform
+        Nodes = quadtree.wp2(S, costf, wavelet=plan.wavelet, mode=plan.mode, level=plan.level, workers=workers)
     
     # Compression
-    maximum = -1
-    for Node in Nodes:
-        maximum = max(maximum, np.amax(abs(Node.C)))
-    threshold = fraction * maximum
-    for Node in Nodes:
-        Node.C = pywt.thresholding.hard(Node.C, threshold, 0)
-
-    n = 0
-    for Node in Nodes:   
-        n = n + utils.number_of_large_coeffs(Node.C, threshold=threshold)
-    stats.append(n)
+    plan = plan_basis(plan, Nodes)
+    order = utils.order_coeffs(Nodes[0].C)
+    B = pack_nodes(Nodes, plan, order=order)
+    for C in np.reshape(B, (-1, plan.size)):
+        if count == None:
+            (threshold, n) = utils.compress_coeffs([C], fraction)
+        else:
+            (threshold, n) = utils.top_coeffs([C], count)
+        stats.append(n)
+        thresholds.append(threshold)
     
     # 2D inverse discrete wavelet packet transform
-    return quadtree.iwp2(Nodes, wavelet=wavelet, mode=mode)
+    return quadtree.iwp2(unpack_nodes(B, Nodes, plan, order=order), plan=plan)
+    
+def compressor_wp2(S, costf=cost.cost_shannon, wavelet="db4", mode=pywt.MODES.ppd, level=4, plan=None, workers=1, Basis=None):
+    '''
+    Returns a compression function for the given 2D input signal, which computes
+    the 2D discrete wavelet packet transformation (and its best basis) only once
+    and reuses it for every fraction.
+    (see compress_wp2)
+    @param S:         Input signal.
+    @param costf:      The (single parameter) cost function that must be used while
+                      searching for the best basis. If a list of cost functions is given,
+                      the best bases are searched with a single 2D discrete wavelet packet
+                      transformation (see quadtree.wp2).
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodization.
+    @param level:     Number of decomposition steps to perform.
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan),
+                      whose wavelet, mode and level are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param workers:   The number of threads that process the subtrees of the first
+                      level (see quadtree.wp2 and wsq.sd).
+    @param Basis:     The positions (level, index) of the nodes of a fixed basis (e.g. a shared
+                      basis, see quadtree.shared_basis) or None to search the best basis.
+                      With a fixed basis, no costs are computed and stacks are supported.
+    @return:          The compression function, which takes the fraction and (optionally)
+                      the statistics buffer. If a list of cost functions is given, a list
+                      containing the compression function of every cost function.
+    '''
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=level)
+    plan.check(S)
+    if Basis is not None:
+        # 2D discrete wavelet packet transform (fixed basis)
+        Nodes = quadtree.wp2_basis(S, Basis, wavelet=plan.wavelet, mode=plan.mode, level=plan.level)
+    else:
+        if np.ndim(S) != 2:
+            raise ValueError("The best basis depends on the signal: compress the signals of a stack one by one")
+        # 2D discrete wavelet packet transform
+        Nodes = quadtree.wp2(S, costf, wavelet=plan.wavelet, mode=plan.mode, level=plan.level, workers=workers)
+        if isinstance(costf, (list, tuple)):
+            return [compressor_nodes(Basis, quadtree.iwp2, plan=plan_basis(plan, Basis)) for Basis in Nodes]
+    return compressor_nodes(Nodes, quadtree.iwp2, plan=plan_basis(plan, Nodes))
     
-def compress_sd(S, fraction, wavelet="db4", mode=pywt.MODES.ppd, stats=[]):
+def compress_sd(S, fraction, wavelet="db4", mode=pywt.MODES.ppd, stats=[], plan=None, workers=1, count=None, thresholds=[]):
     '''
     Computes the subband decomposition for fingerprints for the given 2D input signal.
     Sets all coefficients with an absolute value below the threshold * maximum of the absolute
     values of the coefficients to zero.
     Returns the inverse subband decomposition for fingerprints for the modified coefficients
     of the subband decomposition for fingerprints.
-    @param S:         Input signal.
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D),
+                      whose signals are compressed independently.
                       Both single and double precision floating-point data types are supported
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
                       data format before performing computations.
-    @param fraction:  The fraction.
+    @param fraction:  The fraction (not used if the count is given).
     @param wavelet:   Wavelet to use in the transform. 
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodization.
+    @param stats:     Buffer to which the number of large coefficients is appended
+                      (for every signal).
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan and
+                      wsq.levels), whose wavelet and mode are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param workers:   The number of threads that process the subtrees of the first
+                      level (see quadtree.wp2 and wsq.sd).
+    @param count:     The number of coefficients with the largest absolute values that are kept
+                      (for every signal) instead of the coefficients above the fraction of the
+                      maximum, or None to use the fraction (see utils.top_coeffs).
+    @param thresholds: Buffer to which the (implied) threshold is appended (for every signal).
     @return:          The inverse subband decomposition for fingerprints for the modified coefficients
                       of the subband decomposition for fingerprints.
     '''
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=wsq.levels)
+    plan.check(S)
+    
     # 2D discrete wavelet packet transform
-    Nodes = wsq.sd(S, wavelet=wavelet, mode=mode)
+    Nodes = wsq.sd(S, wavelet=plan.wavelet, mode=plan.mode, workers=workers)
     
     # Compression
-    maximum = -1
-    for Node in Nodes:
-        maximum = max(maximum, np.amax(abs(Node.C)))
-    threshold = fraction * maximum
-    for Node in Nodes:
-        Node.C = pywt.thresholding.hard(Node.C, threshold, 0)
-     
-    n = 0
-    for Node in Nodes:   
-        n = n + utils.number_of_large_coeffs(Node.C, threshold=threshold)
-    stats.append(n)
+    plan = plan_basis(plan, Nodes)
+    order = utils.order_coeffs(Nodes[0].C)
+    B = pack_nodes(Nodes, plan, order=order)
+    for C in np.reshape(B, (-1, plan.size)):
+        if count == None:
+            (threshold, n) = utils.compress_coeffs([C], fraction)
+        else:
+            (threshold, n) = utils.top_coeffs([C], count)
+        stats.append(n)
+        thresholds.append(threshold)
     
     # 2D inverse discrete wavelet packet transform
-    return wsq.isd(Nodes, wavelet=wavelet, mode=mode)
+    return wsq.isd(unpack_nodes(B, Nodes, plan, order=order), plan=plan)
+    
+def compressor_sd(S, wavelet="db4", mode=pywt.MODES.ppd, plan=None, workers=1):
+    '''
+    Returns a compression function for the given 2D input signal, which computes
+    the subband decomposition for fingerprints only once and reuses it for every fraction.
+    (see compress_sd)
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D),
+                      whose signals are compressed independently.
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodization.
+    @param plan:      The plan for the shape of the input signal (see plans.get_plan and
+                      wsq.levels), whose wavelet and mode are used instead of the given ones.
+                      If the plan is None, the (cached) plan is looked up.
+    @param workers:   The number of threads that process the subtrees of the first
+                      level (see quadtree.wp2 and wsq.sd).
+    @return:          The compression function, which takes the fraction and (optionally)
+                      the statistics buffer.
+    '''
+    if plan == None:
+        plan = plans.get_plan(np.shape(S)[-2:], wavelet=wavelet, mode=mode, level=wsq.levels)
+    plan.check(S)
+    
+    # 2D discrete wavelet packet transform
+    Nodes = wsq.sd(S, wavelet=plan.wavelet, mode=plan.mode, workers=workers)
+    return compressor_nodes(Nodes, wsq.isd, plan=plan_basis(plan, Nodes))
+    
+def compressor_nodes(Nodes, synthesis, wavelet="db4", mode=pywt.MODES.ppd, plan=None):
+    '''
+    Returns a compression function for the given nodes of a 2D discrete wavelet
+    packet transformation.
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    @param synthesis: The synthesis function (e.g. quadtree.iwp2 or wsq.isd).
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodization.
+    @param plan:      The plan for the basis of the given nodes (see plan_basis), whose
+                      wavelet, mode and merge schedule are used instead of the given ones.
+    @return:          The compression function, which takes the fraction and (optionally)
+                      the statistics buffer.
+    '''
+    order = utils.order_coeffs(Nodes[0].C)
+    B = pack_nodes(Nodes, plan, order=order)
+    Maxima = [utils.maximum_coeffs([C]) for C in np.reshape(B, (-1, B.shape[-1]))]
+        
+    def compress_fixed_nodes(fraction, stats=[]):
+        '''
+        Returns the inverse 2D discrete wavelet packet transformation for the coefficients
+        of the nodes modified according to the given fraction.
+        The coefficients of the nodes themselves are not modified.
+        @param fraction:  The fraction.
+        '''
+        # Compression
+        CB = np.copy(B)
+        for (C, maximum) in zip(np.reshape(CB, (-1, CB.shape[-1])), Maxima):
+            n = utils.hard_threshold_coeffs([C], fraction * maximum)
+            stats.append(n)
+        
+        # 2D inverse discrete wavelet packet transform
+        return synthesis(unpack_nodes(CB, Nodes, plan, order=order), wavelet=wavelet, mode=mode, plan=plan)
+    return compress_fixed_nodes
+    
+def plan_basis(plan, Nodes):
+    '''
+    Returns the (cached) plan for the basis of the given nodes with the same
+    shape, wavelet, mode and level as the given plan.
+    @param plan:      The plan (see plans.get_plan).
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    '''
+    Basis = [(Node.level, Node.index) for Node in Nodes]
+    return plans.get_plan(plan.shape, wavelet=plan.name, mode=plan.mode, level=plan.level, Basis=Basis)
+
+def pack_dwt2(A, plan, order='C'):
+    '''
+    Returns a preallocated buffer containing the coefficients of the 2D discrete
+    wavelet transformation at the offsets stored in the given plan (see utils.pack_coeffs).
+    @param A:         List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    @param plan:      The plan (without basis) for the shape of the input signal.
+    @param order:     The memory order of the coefficients (see utils.order_coeffs).
+    '''
+    return utils.pack_coeffs(utils.flatten_coeffs2(A), [plan.Offsets[p] for p in plan.Nodes], plan.size, order=order)
+    
+def unpack_dwt2(B, plan, order='C'):
+    '''
+    Returns the coefficients of the 2D discrete wavelet transformation contained in
+    the given buffer (see pack_dwt2). The coefficients are views of the buffer.
+    @param B:         The buffer.
+    @param plan:      The plan (without basis) for the shape of the input signal.
+    @param order:     The memory order of the coefficients (see utils.order_coeffs).
+    @return:          List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    '''
+    Cs = utils.unpack_coeffs(B, [plan.Offsets[p] for p in plan.Nodes], utils.flatten_coeffs2(plan.Coefficients), order=order)
+    return [Cs[0]] + [tuple(Cs[i:i+3]) for i in range(1, len(Cs), 3)]
+    
+def node_offsets(Nodes, plan=None):
+    '''
+    Returns a tuple containing the offsets and the shapes of the coefficients of the
+    given nodes in the concatenation of their coefficients and the size of the
+    concatenation. The offsets and shapes stored in the given plan are used.
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    @param plan:      The plan for the basis of the given nodes (see plan_basis).
+                      If the plan is None, the offsets are computed.
+    '''
+    if plan == None:
+        Shapes = [np.shape(Node.C)[-2:] for Node in Nodes]
+        Offsets = np.cumsum([0] + [r * c for (r, c) in Shapes])
+        return (list(Offsets[:-1]), Shapes, Offsets[-1])
+    Offsets = [plan.Offsets[(Node.level, Node.index)] for Node in Nodes]
+    Shapes = [plan.Shapes[Node.level] for Node in Nodes]
+    return (Offsets, Shapes, plan.size)
+    
+def pack_nodes(Nodes, plan=None, order='C'):
+    '''
+    Returns a preallocated buffer containing the coefficients of the given nodes
+    (see node_offsets and utils.pack_coeffs).
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    @param plan:      The plan for the basis of the given nodes (see plan_basis).
+    @param order:     The memory order of the coefficients (see utils.order_coeffs).
+    '''
+    (Offsets, Shapes, size) = node_offsets(Nodes, plan)
+    return utils.pack_coeffs([Node.C for Node in Nodes], Offsets, size, order=order)
+    
+def unpack_nodes(B, Nodes, plan=None, order='C'):
+    '''
+    Returns a list containing new nodes at the positions of the given nodes, whose
+    coefficients are views of the given buffer (see pack_nodes).
+    @param B:         The buffer.
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    @param plan:      The plan for the basis of the given nodes (see plan_basis).
+    @param order:     The memory order of the coefficients (see utils.order_coeffs).
+    '''
+    (Offsets, Shapes, size) = node_offsets(Nodes, plan)
+    Cs = utils.unpack_coeffs(B, Offsets, Shapes, order=order)
+    return [node.Node(C, Node.level, Node.index) for (C, Node) in zip(Cs, Nodes)]
+
+def rate_distortion(Nodes, fractions):
+    '''
+    Returns the numbers of large coefficients and the squared errors of the
+    coefficients for all the given fractions (see compressor_nodes), without
+    thresholding the coefficients. The sorted-magnitude indices of the nodes
+    (see magnitudes) are used (and built for the nodes without an index).
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation of a 2D input signal.
+    @param fractions: The fractions.
+    @return:          A tuple containing the array of the numbers of large coefficients
+                      and the array of the squared errors of the coefficients.
+    '''
+    for Node in Nodes:
+        if Node.magnitudes == None:
+            Node.magnitudes = magnitudes.index(Node.C)
+    Indices = [Node.magnitudes for Node in Nodes]
+    Thresholds = np.asarray(fractions, dtype=float) * max([M.maximum() for M in Indices])
+    return (magnitudes.count(Indices, Thresholds, inclusive=True), magnitudes.error(Indices, Thresholds, inclusive=True))
+
+def sweep(S, fractions, compressf, crop=4, callback=None):
+    '''
+    Evaluates the given compression function for all the given fractions.
+    Both the original 2D input signal and the compressed 2D signals are cropped
+    and aligned (see best_fit) before computing the mean squared error.
+    @param S:         The original 2D input signal.
+    @param fractions: The fractions.
+    @param compressf: The compression function (see compressor_dwt2, compressor_wp2
+                      and compressor_sd).
+    @param crop:      The number of rows and columns to crop at each side.
+    @param callback:  Optional function which is called as callback(i, fraction, R, error)
+                      with the aligned compressed 2D signal R of every fraction.
+    @return:          A tuple containing the mean squared errors and the numbers of
+                      large coefficients for all the given fractions.
+    '''
+    stats = []
+    E = np.zeros(np.shape(fractions))
+    R = S[crop:-crop,crop:-crop]
+    for i in range(len(fractions)):
+        (RC, E[i]) = best_fit(R, compressf(fractions[i], stats=stats)[crop:-crop,crop:-crop])
+        if callback != None:
+            callback(i, fractions[i], RC, E[i])
+    return (E, np.array(stats))
 
 ###############################################################################
 # COMPRESSION UTILITIES
@@ -153,18 +559,50 @@ def mse(S1, S2):
     D = S1-S2
     return (float(np.sum(np.multiply(D, D)))) / (D.shape[0]*D.shape[1])
     
+# Maximum number of offsets for which best_fit evaluates the errors directly
+max_direct_offsets = 64
+
 def best_fit(S1, S2):
+    '''
+    Returns the part of the 2D signal S2 with the same shape as the 2D signal S1,
+    that has the smallest mean squared error against S1, together with this
+    mean squared error.
+    If there are many offsets, the squared errors for all offsets are computed at once
+    by expanding sum((S1-W)^2) = sum(S1^2) - 2*sum(S1*W) + sum(W^2) for every window W
+    of S2. The cross-correlation term is computed with the FFT and the energy term with
+    cumulative sums. Only the offsets with an error within the rounding tolerance
+    of the smallest error are verified with mse.
+    @param S1:        The original 2D signal
+    @param S2:        The compressed 2D signal (at least as large as S1)
+    @return:          A tuple containing the best fitting part of S2 and
+                      its mean squared error against S1.
+    '''
     (m, n) = S1.shape
     (p, q) = S2.shape
+    if (p - m + 1) * (q - n + 1) <= max_direct_offsets:
+        Offsets = itertools.product(range(p - m + 1), range(q - n + 1))
+    else:
+        F1 = np.asarray(S1, dtype=float)
+        F2 = np.asarray(S2, dtype=float)
+        # Energy of every window
+        I = np.zeros((p+1, q+1))
+        I[1:,1:] = np.cumsum(np.cumsum(F2*F2, axis=0), axis=1)
+        W = I[m:,n:] - I[:p-m+1,n:] - I[m:,:q-n+1] + I[:p-m+1,:q-n+1]
+        # Cross-correlation of S1 with every window
+        X = np.fft.irfft2(np.conj(np.fft.rfft2(F1, s=(p, q))) * np.fft.rfft2(F2), s=(p, q))[:p-m+1,:q-n+1]
+        energy = np.sum(F1*F1)
+        E = energy - 2*X + W
+        tolerance = 1e-9 * (energy + np.amax(W))
+        Offsets = zip(*np.nonzero(E <= np.amin(E) + tolerance))
+    
     bi = bj = -1
     best = np.inf
-    for i in range(p - m + 1):
-        for j in range(q - n + 1):
-            error = mse(S1, S2[i:i+m,j:j+n])
-            if error < best:
-                best = error
-                bi = i
-                bj = j
+    for (i, j) in Offsets:
+        error = mse(S1, S2[i:i+m,j:j+n])
+        if error < best:
+            best = error
+            bi = i
+            bj = j
     return (S2[bi:bi+m,bj:bj+n], best)
 
 ###############################################################################
@@ -173,44 +611,28 @@ def best_fit(S1, S2):
 
 import configuration as c
 import cv2
+import pgm
 import pylab
 
 write_intermediate_results = True
 
-# Note that it would of course be cleaner to change the fraction
-# multiple times between the analysis and the synthesis
-# but this is just a test method
-def compare(fname, fractions, wavelet="db4", mode=pywt.MODES.ppd, level=4):
-    stats_dwt2 = []   
-    stats_wp2_s = []
-    stats_wp2_t = []
-    
-    S = 255 - cv2.imread(fname, 0)
-    E1 = np.zeros(fractions.shape)
-    E2 = np.zeros(fractions.shape)
-    E3 = np.zeros(fractions.shape)
-    i = 0
-    for f in fractions:
-        R1 = compress_dwt2(S, f, wavelet=wavelet, mode=mode, level=level, stats=stats_dwt2)[level:-level,level:-level]
-        R2 = compress_wp2(S, f, costf=cost.cost_shannon, wavelet=wavelet, mode=mode, level=level, stats=stats_wp2_s)[level:-level,level:-level]
-        R3 = compress_wp2(S, f, costf=cost.cost_threshold(0.01), wavelet=wavelet, mode=mode, level=level, stats=stats_wp2_t)[level:-level,level:-level]
-        R = S[level:-level,level:-level]
-        (R1, e1) = best_fit(R, R1)
-        (R2, e2) = best_fit(R, R2)
-        (R3, e3) = best_fit(R, R3)
-        
+def writer(tag):
+    '''
+    Returns a sweep callback which writes the aligned compressed 2D signals
+    to image files if write_intermediate_results is enabled.
+    @param tag:       The tag to include in the file names.
+    '''
+    def write(i, f, R, e):
         if write_intermediate_results:
-            S1 = 255 - np.array(R1, dtype=np.uint8)
-            S2 = 255 - np.array(R2, dtype=np.uint8)
-            S3 = 255 - np.array(R3, dtype=np.uint8)   
-            cv2.imwrite(str(i) + "_dwt_" + str(f) + " " + str(e1) + ".png", S1)
-            cv2.imwrite(str(i) + "_wp_s_" + str(f) + " " + str(e2) + ".png", S2)
-            cv2.imwrite(str(i) + "_wp_t_" + str(f) + " " + str(e3) + ".png", S3)
+            cv2.imwrite(str(i) + "_" + tag + "_" + str(f) + " " + str(e) + ".png", 255 - np.array(R, dtype=np.uint8))
+    return write
 
-        E1[i] = e1
-        E2[i] = e2
-        E3[i] = e3
-        i = i + 1
+def compare(fname, fractions, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    S = pgm.image(fname, invert=True)
+    (E1, stats_dwt2) = sweep(S, fractions, compressor_dwt2(S, wavelet=wavelet, mode=mode, level=level), crop=level, callback=writer("dwt"))
+    (compress_s, compress_t) = compressor_wp2(S, costf=[cost.cost_shannon, cost.cost_threshold(0.01)], wavelet=wavelet, mode=mode, level=level)
+    (E2, stats_wp2_s) = sweep(S, fractions, compress_s, crop=level, callback=writer("wp_s"))
+    (E3, stats_wp2_t) = sweep(S, fractions, compress_t, crop=level, callback=writer("wp_t"))
     
     pylab.figure()
     pylab.loglog(fractions, E1, label='DWT')
@@ -231,37 +653,12 @@ def compare(fname, fractions, wavelet="db4", mode=pywt.MODES.ppd, level=4):
     pylab.show()
     
 def compare2(fname, fractions, costf=cost.cost_shannon, wavelet="db4", mode=pywt.MODES.ppd):  
-    stats_sd = []
-    stats_wp2_s = []
-    stats_wp2_t = []
-    
     level = 5
-    S = 255 - cv2.imread(fname, 0)
-    E1 = np.zeros(fractions.shape)
-    E2 = np.zeros(fractions.shape)
-    E3 = np.zeros(fractions.shape)
-    i = 0
-    for f in fractions:
-        R1 = compress_sd(S, f, wavelet=wavelet, mode=mode, stats=stats_sd)[level:-level,level:-level]
-        R2 = compress_wp2(S, f, costf=cost.cost_shannon, wavelet=wavelet, mode=mode, level=level, stats=stats_wp2_s)[level:-level,level:-level]
-        R3 = compress_wp2(S, f, costf=cost.cost_threshold(0.01), wavelet=wavelet, mode=mode, level=level, stats=stats_wp2_t)[level:-level,level:-level]
-        R = S[level:-level,level:-level]
-        (R1, e1) = best_fit(R, R1)
-        (R2, e2) = best_fit(R, R2)
-        (R3, e3) = best_fit(R, R3)
-        
-        if write_intermediate_results:
-            S1 = 255 - np.array(R1, dtype=np.uint8)
-            S2 = 255 - np.array(R2, dtype=np.uint8)
-            S3 = 255 - np.array(R3, dtype=np.uint8)   
-            cv2.imwrite(str(i) + "_sd_" + str(f) + " " + str(e1) + ".png", S1)
-            cv2.imwrite(str(i) + "_wp_s_" + str(f) + " " + str(e2) + ".png", S2)
-            cv2.imwrite(str(i) + "_wp_t_" + str(f) + " " + str(e3) + ".png", S3)
-
-        E1[i] = e1
-        E2[i] = e2
-        E3[i] = e3
-        i = i + 1
+    S = pgm.image(fname, invert=True)
+    (E1, stats_sd) = sweep(S, fractions, compressor_sd(S, wavelet=wavelet, mode=mode), crop=level, callback=writer("sd"))
+    (compress_s, compress_t) = compressor_wp2(S, costf=[cost.cost_shannon, cost.cost_threshold(0.01)], wavelet=wavelet, mode=mode, level=level)
+    (E2, stats_wp2_s) = sweep(S, fractions, compress_s, crop=level, callback=writer("wp_s"))
+    (E3, stats_wp2_t) = sweep(S, fractions, compress_t, crop=level, callback=writer("wp_t"))
     
     pylab.figure()
     pylab.loglog(fractions, E1, label='SD')
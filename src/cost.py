@@ -5,6 +5,7 @@
 @version    1.0
 '''
 
+import inspect
 import numpy as np
 import pylab
 
@@ -12,35 +13,100 @@ import pylab
 # COST FUNCTIONS
 ############################################################################### 
 
+# All cost functions are additive and accept an optional axis argument
+# (similar to the NumPy reductions), which allows to compute the costs
+# of a stack of nodes with a single call.
+
 def cost_threshold(threshold):
     '''
     Returns a cost function for computing the number of entries
-    of a 1D input signal higher (in absolute value) than the given threshold.
+    of an input signal higher (in absolute value) than the given threshold.
     @param threshold:     The threshold value.
     '''
-    def cost_fixed_threshold(C):
+    def cost_fixed_threshold(C, axis=None):
         '''
-        Computes the number of entries of a 2D input signal
+        Computes the number of entries of an input signal
         higher (in absolute value) than the threshold.
         @param C:         Input signal.
+        @param axis:      Axis or axes along which the cost is computed.
+                          The default is to compute the cost of the whole input signal.
         '''
-        cost = 0
-        for c in C.flatten():
-           if (abs(c) > threshold):
-                cost = cost + 1
-        return cost
+        return np.sum(np.abs(C) > threshold, axis=axis)
+    #The cost of an indexed node is a binary search (see packettree.PacketTree.index)
+    cost_fixed_threshold.threshold = threshold
     return cost_fixed_threshold
         
-def cost_shannon(C):
+def cost_shannon(C, axis=None):
+    '''
+    Computes the Shannon entropy of an input signal.
+    @param C:         Input signal.
+    @param axis:      Axis or axes along which the cost is computed.
+                      The default is to compute the cost of the whole input signal.
+    '''
+    C2 = np.square(np.asarray(C, dtype=float))
+    L = np.log2(C2, out=np.zeros_like(C2), where=(C2 != 0))
+    # c*c*log2(abs(c)) = c*c*log2(c*c) / 2
+    return -0.5 * np.sum(C2 * L, axis=axis)
+    
+def cost_log_energy(C, axis=None):
     '''
-    Computes the Shannen entropy of a 2D input signal
+    Computes the log energy entropy of an input signal.
+    (zero entries do not contribute to the cost)
     @param C:         Input signal.
+    @param axis:      Axis or axes along which the cost is computed.
+                      The default is to compute the cost of the whole input signal.
+    '''
+    C2 = np.square(np.asarray(C, dtype=float))
+    L = np.log(C2, out=np.zeros_like(C2), where=(C2 != 0))
+    return np.sum(L, axis=axis)
+    
+def cost_norm(p):
+    '''
+    Returns a cost function for computing the p-th power of the
+    l^p norm of an input signal.
+    @param p:         The exponent (0 < p < 2 favours sparse representations).
+    '''
+    def cost_fixed_norm(C, axis=None):
+        '''
+        Computes the sum of the absolute values of the entries
+        of an input signal raised to the power p.
+        @param C:         Input signal.
+        @param axis:      Axis or axes along which the cost is computed.
+                          The default is to compute the cost of the whole input signal.
+        '''
+        return np.sum(np.power(np.abs(np.asarray(C, dtype=float)), p), axis=axis)
+    return cost_fixed_norm
+
+def accepts_axis(costf):
+    '''
+    Checks whether the given cost function accepts an axis argument. Cost functions
+    without an axis argument are called for one node at a time (see packettree).
+    @param costf:     The cost function.
+    '''
+    try:
+        Spec = inspect.getargspec(costf)
+    except TypeError:
+        #Not a Python function (e.g. a functools.partial), assume a single parameter
+        return False
+    return "axis" in Spec.args or Spec.keywords != None
+
+def cost_function(name, parameter=None):
+    '''
+    Returns the cost function with the given name.
+    @param name:      The name of the cost function:
+                      "shannon", "log_energy", "threshold" or "norm".
+    @param parameter: The threshold value (for "threshold", default 0.01)
+                      or the exponent (for "norm", default 1).
     '''
-    cost = 0
-    for c in C.flatten():
-        if (c != 0):
-            cost = cost - c*c*np.log2(abs(c))
-    return cost
+    if name == "shannon":
+        return cost_shannon
+    if name == "log_energy":
+        return cost_log_energy
+    if name == "threshold":
+        return cost_threshold(0.01 if parameter == None else parameter)
+    if name == "norm":
+        return cost_norm(1 if parameter == None else parameter)
+    raise ValueError("Unknown cost function: " + str(name))
 
 ###############################################################################
 # VISUALIZATIONS
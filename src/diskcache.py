@@ -0,0 +1,252 @@
+'''
+3 Fingerprint compression
+Persistent cache of decompositions and best bases
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+import compression
+import cost
+import hashlib
+import node
+import numpy as np
+import os
+import packettree
+import plans
+import pywt
+import quadtree
+import shutil
+import tempfile
+import wsq
+
+###############################################################################
+# DISK CACHE
+###############################################################################
+
+class DiskCache:
+    def __init__(self, directory, max_bytes=2**30):
+        '''
+        Creates a new (or opens an existing) cache in the given directory.
+        Every entry is a directory containing arrays in the .npy format, which are
+        memory-mapped when they are loaded. If the entries take more than the given
+        number of bytes, the least recently used entries are removed.
+        Multiple processes can share a cache: an entry is written to a temporary
+        directory and renamed when it is complete.
+        @param directory: The directory of the cache.
+        @param max_bytes: The maximum number of bytes of all entries.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                #Created by another process in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+    def path(self, key):
+        '''
+        Returns the directory of the entry with the given key.
+        @param key:       The key (see key).
+        '''
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        '''
+        Returns the arrays of the entry with the given key or None if there is no
+        such entry. The arrays are memory-mapped copy-on-write: they are not read
+        before they are used and modifications are not written to the cache.
+        Loading an entry marks it as most recently used.
+        @param key:       The key (see key).
+        @return:          Dictionary containing the arrays by name (or None).
+        '''
+        path = self.path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            Arrays = {}
+            for fname in os.listdir(path):
+                if fname.endswith(".npy"):
+                    Arrays[fname[:-len(".npy")]] = np.load(os.path.join(path, fname), mmap_mode='c')
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            #Removed by another process in the meantime
+            return None
+        return Arrays
+
+    def save(self, key, Arrays):
+        '''
+        Saves the given arrays as the entry with the given key and removes the
+        least recently used entries if the cache is too large.
+        @param key:       The key (see key).
+        @param Arrays:    Dictionary containing the arrays by name.
+        '''
+        temp = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        for (name, A) in Arrays.items():
+            np.save(os.path.join(temp, name + ".npy"), A)
+        try:
+            os.rename(temp, self.path(key))
+        except OSError:
+            #Saved by another process in the meantime
+            shutil.rmtree(temp, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        '''
+        Returns a list containing a tuple (time of the last use, number of bytes,
+        directory) for every (complete) entry, least recently used first.
+        '''
+        Entries = []
+        for fname in os.listdir(self.directory):
+            path = os.path.join(self.directory, fname)
+            if fname.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum([os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)])
+                Entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                #Removed by another process in the meantime
+                continue
+        return sorted(Entries)
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until the entries take
+        at most the maximum number of bytes.
+        '''
+        Entries = self.entries()
+        size = sum([s for (t, s, path) in Entries])
+        for (t, s, path) in Entries:
+            if size <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            size = size - s
+
+def digest(S):
+    '''
+    Returns the hash of the content (data type, shape and values) of the given array.
+    @param S:         The array.
+    '''
+    S = np.ascontiguousarray(S)
+    h = hashlib.sha1(str(S.dtype) + str(S.shape))
+    h.update(S.data)
+    return h.hexdigest()
+
+def key(*Fields):
+    '''
+    Returns the key of the entry for the given fields (e.g. the hash of the image,
+    the wavelet, the mode and the level).
+    @param Fields:    The fields.
+    '''
+    return "-".join([str(field) for field in Fields])
+
+###############################################################################
+# CACHED DECOMPOSITIONS
+###############################################################################
+
+def wp2(S, costname="shannon", parameter=None, wavelet="db4", mode=pywt.MODES.ppd, level=4, cache=None):
+    '''
+    Returns the 2D discrete wavelet packet transformation, with the best basis according
+    to the given cost function, for the given 2D input signal (see quadtree.wp2).
+    The coefficients of all levels are cached by image content, wavelet, mode and level
+    and the best basis by image content, wavelet, mode, level and cost function, so a
+    best basis for another cost function reuses the cached coefficients.
+    @param S:         Input signal.
+    @param costname:  The name of the cost function (see cost.cost_function).
+    @param parameter: The parameter of the cost function (see cost.cost_function).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @param cache:     The cache (see DiskCache).
+    @return:          A list containing the nodes of the best basis (low levels first,
+                      low indices first), whose coefficients are views of the
+                      (memory-mapped) coefficients of their level.
+    @note:            The costs of the nodes are not set.
+    '''
+    h = digest(S)
+    packets = key("packets", h, wavelet, mode, level)
+    Arrays = cache.load(packets)
+    if Arrays == None:
+        Tree = packettree.PacketTree(S, wavelet=wavelet, mode=mode, level=level)
+        cache.save(packets, dict([("level" + str(l), C) for (l, C) in enumerate(Tree.Levels)]))
+    else:
+        Levels = [Arrays["level" + str(l)] for l in range(level)]
+        Tree = packettree.PacketTree(S, wavelet=wavelet, mode=mode, level=level, Levels=Levels)
+
+    basis = key("basis", h, wavelet, mode, level, costname, parameter)
+    Arrays = cache.load(basis)
+    if Arrays == None:
+        Tree.mark(cost.cost_function(costname, parameter))
+        Positions = Tree.basis()
+        cache.save(basis, {"basis" : np.array(Positions, dtype=int).reshape(-1, 2)})
+    else:
+        Positions = [(int(l), int(i)) for (l, i) in Arrays["basis"]]
+    return [node.Node(Tree.Levels[l][i], l, i) for (l, i) in Positions]
+
+def sd(S, wavelet="db4", mode=pywt.MODES.ppd, cache=None):
+    '''
+    Returns the subband decomposition for fingerprints for the given 2D input signal
+    (see wsq.sd). The nodes are cached by image content, wavelet and mode.
+    @param S:         Input signal.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param cache:     The cache (see DiskCache).
+    @return:          A list containing the nodes of the subband decomposition for fingerprints
+                      (low levels first, low indices first).
+    '''
+    subbands = key("sd", digest(S), wavelet, mode)
+    Arrays = cache.load(subbands)
+    if Arrays == None:
+        Nodes = wsq.sd(S, wavelet=wavelet, mode=mode)
+        #The nodes of one level are stacked in the order of the basis
+        Arrays = {"basis" : np.array([(Node.level, Node.index) for Node in Nodes], dtype=int)}
+        for l in set([Node.level for Node in Nodes]):
+            Arrays["level" + str(l)] = np.array([Node.C for Node in Nodes if Node.level == l])
+        cache.save(subbands, Arrays)
+        return Nodes
+    Nodes = []
+    Counts = {}
+    for (l, i) in Arrays["basis"]:
+        (l, i) = (int(l), int(i))
+        Nodes.append(node.Node(Arrays["level" + str(l)][Counts.get(l, 0)], l, i))
+        Counts[l] = Counts.get(l, 0) + 1
+    return Nodes
+
+###############################################################################
+# CACHED COMPRESSORS
+###############################################################################
+
+def compressor_wp2(S, costname="shannon", parameter=None, wavelet="db4", mode=pywt.MODES.ppd, level=4, cache=None):
+    '''
+    Returns a compression function for the given 2D input signal with the
+    (cached) best basis (see compression.compressor_wp2 and wp2).
+    @param S:         Input signal.
+    @param costname:  The name of the cost function (see cost.cost_function).
+    @param parameter: The parameter of the cost function (see cost.cost_function).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param level:     Number of decomposition steps to perform.
+    @param cache:     The cache (see DiskCache).
+    '''
+    plan = plans.get_plan(np.shape(S), wavelet=wavelet, mode=mode, level=level)
+    Nodes = wp2(S, costname=costname, parameter=parameter, wavelet=wavelet, mode=mode, level=level, cache=cache)
+    return compression.compressor_nodes(Nodes, quadtree.iwp2, plan=compression.plan_basis(plan, Nodes))
+
+def compressor_sd(S, wavelet="db4", mode=pywt.MODES.ppd, cache=None):
+    '''
+    Returns a compression function for the given 2D input signal with the
+    (cached) subband decomposition for fingerprints (see compression.compressor_sd and sd).
+    @param S:         Input signal.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param cache:     The cache (see DiskCache).
+    '''
+    plan = plans.get_plan(np.shape(S), wavelet=wavelet, mode=mode, level=wsq.levels)
+    Nodes = sd(S, wavelet=wavelet, mode=mode, cache=cache)
+    return compression.compressor_nodes(Nodes, wsq.isd, plan=compression.plan_basis(plan, Nodes))
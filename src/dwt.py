@@ -0,0 +1,501 @@
+'''
+2 Wavelet packets
+Batched discrete wavelet transform (2D)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import numpy as np
+import pywt
+
+###############################################################################
+# FILTERS AND EXTENSIONS
+###############################################################################
+
+def filters(wavelet):
+    '''
+    Returns the decomposition and reconstruction filters of the given wavelet.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list
+                      (or a pywt.Wavelet).
+    @return:          A tuple containing the lowpass and highpass decomposition filters
+                      and the lowpass and highpass reconstruction filters.
+    '''
+    if not isinstance(wavelet, pywt.Wavelet):
+        wavelet = pywt.Wavelet(wavelet)
+    return tuple([np.asarray(F, dtype=float) for F in (wavelet.dec_lo, wavelet.dec_hi, wavelet.rec_lo, wavelet.rec_hi)])
+
+# Supported signal extension modes
+modes = (pywt.MODES.zpd, pywt.MODES.cpd, pywt.MODES.sym, pywt.MODES.ppd)
+
+def extension(i, n, mode):
+    '''
+    Returns the index of the sample of a signal of the given length that
+    equals the sample at the given index of the extended signal.
+    @param i:         The index of the sample of the extended signal.
+    @param n:         The length of the signal.
+    @param mode:      Signal extension mode (zpd, cpd, sym or ppd).
+    @return:          The index of the sample of the signal (None for a zero).
+    '''
+    if 0 <= i < n:
+        return i
+    if mode == pywt.MODES.ppd:
+        return i % n
+    if mode == pywt.MODES.sym:
+        i = i % (2 * n)
+        return i if i < n else 2 * n - 1 - i
+    if mode == pywt.MODES.cpd:
+        return 0 if i < 0 else n - 1
+    if mode == pywt.MODES.zpd:
+        return None
+    raise ValueError("Unsupported signal extension mode: " + str(mode))
+
+###############################################################################
+# GATHER TABLES
+###############################################################################
+
+# Cache containing the gather tables of the transforms
+Tables = {}
+
+def analysis_table(n, F, mode):
+    '''
+    Returns the (cached) gather table of the 1D discrete wavelet transformation
+    with the given filter of a signal of the given length: coefficient k is the
+    sum over t of F[t] * x[2k+1-t] of the extended signal x.
+    The terms are summed in the same order as pywt (first the samples inside the
+    signal and then the samples of the extension, both for increasing t), so the
+    results are identical for signals that are not shorter than the filter.
+    @param n:         The length of the signal.
+    @param F:         The decomposition filter.
+    @param mode:      Signal extension mode.
+    @return:          A tuple containing the indices and the weights of the terms
+                      (two arrays with one row per coefficient).
+    '''
+    key = ("analysis", n, tuple(F), mode)
+    if key not in Tables:
+        K = pywt.dwt_coeff_len(n, len(F), mode)
+        Indices = np.zeros((K, len(F)), dtype=int)
+        Weights = np.zeros((K, len(F)))
+        for k in range(K):
+            Taps = [t for t in range(len(F)) if 0 <= 2*k + 1 - t < n]
+            Taps += [t for t in range(len(F)) if not (0 <= 2*k + 1 - t < n)]
+            for (s, t) in enumerate(Taps):
+                i = extension(2*k + 1 - t, n, mode)
+                if i != None:
+                    (Indices[k, s], Weights[k, s]) = (i, F[t])
+        Tables[key] = (Indices, Weights)
+    return Tables[key]
+
+def synthesis_table(K, F):
+    '''
+    Returns the (cached) gather table of the 1D inverse discrete wavelet
+    transformation with the given filter of K coefficients: sample n is the sum
+    over k of F[n+R-2-2k] * c[k] (R is the length of the filter).
+    The terms are summed in the same order as pywt (for increasing n+R-2-2k),
+    so the results are identical.
+    @param K:         The number of coefficients.
+    @param F:         The reconstruction filter.
+    @return:          A tuple containing the indices and the weights of the terms
+                      (two arrays with one row per sample).
+    '''
+    key = ("synthesis", K, tuple(F))
+    if key not in Tables:
+        R = len(F)
+        n = 2*K - R + 2
+        if n < 1:
+            raise ValueError("Too few coefficients for the reconstruction filter")
+        Indices = np.zeros((n, (R + 1) / 2), dtype=int)
+        Weights = np.zeros((n, (R + 1) / 2))
+        for m in range(n):
+            Terms = [k for k in range(K - 1, -1, -1) if 0 <= m + R - 2 - 2*k < R]
+            for (s, k) in enumerate(Terms):
+                (Indices[m, s], Weights[m, s]) = (k, F[m + R - 2 - 2*k])
+        Tables[key] = (Indices, Weights)
+    return Tables[key]
+
+def gather(X, Table, axis):
+    '''
+    Returns the outputs of the given gather table applied along the given axis.
+    The terms are summed in the order of the table.
+    @param X:         The input array.
+    @param Table:     The gather table (indices and weights).
+    @param axis:      The axis.
+    '''
+    (Indices, Weights) = Table
+    shape = [1] * X.ndim
+    shape[axis] = Indices.shape[0]
+    Y = np.zeros(1, dtype=X.dtype)
+    for t in range(Indices.shape[1]):
+        Y = Y + np.take(X, Indices[:, t], axis=axis) * Weights[:, t].reshape(shape).astype(X.dtype)
+    return Y
+
+def strided(X, start, count, step, axis):
+    '''
+    Returns a view of count elements along the given axis of the given array
+    starting at the given index with the given step.
+    @param X:         The array.
+    @param start:     The first index.
+    @param count:     The number of elements.
+    @param step:      The step.
+    @param axis:      The axis.
+    '''
+    Slices = [slice(None)] * X.ndim
+    Slices[axis] = slice(start, start + step * (count - 1) + 1, step)
+    return X[tuple(Slices)]
+
+def accumulate(Terms, dtype):
+    '''
+    Returns the sum of the given terms, added in the given order.
+    @param Terms:     List of tuples (array, weight).
+    @param dtype:     The data type of the weights.
+    '''
+    (X, w) = Terms[0]
+    Y = X * dtype.type(w)
+    for (X, w) in Terms[1:]:
+        Y += X * dtype.type(w)
+    return Y
+
+def analysis(X, F, mode, axis):
+    '''
+    Returns the coefficients of the 1D discrete wavelet transformation with the
+    given filter along the given axis (see analysis_table). The coefficients that
+    only depend on samples inside the signal are computed with strided views.
+    @param X:         The array.
+    @param F:         The decomposition filter.
+    @param mode:      Signal extension mode.
+    @param axis:      The axis.
+    '''
+    n = X.shape[axis]
+    (Indices, Weights) = analysis_table(n, F, mode)
+    #Coefficients k0 <= k < k1 only depend on samples inside the signal
+    (k0, k1) = ((len(F) - 1) / 2, (n - 2) / 2 + 1)
+    if k1 - k0 < 2:
+        return gather(X, (Indices, Weights), axis)
+    Parts = [gather(X, (Indices[:k0], Weights[:k0]), axis)] if k0 > 0 else []
+    Parts.append(accumulate([(strided(X, 2*k0 + 1 - t, k1 - k0, 2, axis), F[t]) for t in range(len(F))], X.dtype))
+    if k1 < Indices.shape[0]:
+        Parts.append(gather(X, (Indices[k1:], Weights[k1:]), axis))
+    return np.concatenate(Parts, axis=axis)
+
+def synthesis(C, F, axis):
+    '''
+    Returns the samples of the 1D inverse discrete wavelet transformation with the
+    given filter along the given axis (see synthesis_table). The samples that depend
+    on (R+1)/2 coefficients are computed with strided views.
+    @param C:         The coefficients.
+    @param F:         The reconstruction filter.
+    @param axis:      The axis.
+    '''
+    K = C.shape[axis]
+    R = len(F)
+    (Indices, Weights) = synthesis_table(K, F)
+    #Sample m depends on the coefficients (m+R-2-t)/2 for the taps t of the parity of m+R-2,
+    #which are all inside for m0 <= m < m1
+    (m0, m1) = (R - 2 + (R % 2), 2*K - R + 2 - (R % 2))
+    if m1 - m0 < 4:
+        return gather(C, (Indices, Weights), axis)
+    Parts = [gather(C, (Indices[:m0], Weights[:m0]), axis)] if m0 > 0 else []
+    shape = list(C.shape)
+    shape[axis] = m1 - m0
+    Y = np.empty(shape, dtype=C.dtype)
+    for q in range(2):
+        (m, count) = (m0 + q, (m1 - m0 - q + 1) / 2)
+        p = (m + R - 2) % 2
+        Terms = [(strided(C, (m + R - 2 - t) / 2, count, 1, axis), F[t]) for t in range(p, R, 2)]
+        strided(Y, q, count, 2, axis)[...] = accumulate(Terms, C.dtype)
+    Parts.append(Y)
+    if m1 < Indices.shape[0]:
+        Parts.append(gather(C, (Indices[m1:], Weights[m1:]), axis))
+    return np.concatenate(Parts, axis=axis)
+
+###############################################################################
+# TRANSFORMS
+###############################################################################
+
+def as_float_array(X):
+    '''
+    Returns the given array as a single or double precision floating-point array
+    (see pywt).
+    @param X:         The array.
+    '''
+    X = np.asarray(X)
+    if X.dtype == np.float32 or X.dtype == np.float64:
+        return X
+    return X.astype(np.float64)
+
+def dwt(X, Filters, mode, axis=-1):
+    '''
+    Returns the 1D discrete wavelet transformation along the given axis of the
+    given array. The results are identical to those of pywt.dwt for every 1D slice.
+    @param X:         The array.
+    @param Filters:   The filters (see filters).
+    @param mode:      Signal extension mode.
+    @param axis:      The axis.
+    @return:          A tuple containing the approximation and detail coefficients.
+    '''
+    X = as_float_array(X)
+    n = X.shape[axis]
+    if n < len(Filters[0]):
+        #pywt handles signals shorter than the filter differently
+        wavelet = pywt.Wavelet(filter_bank=[list(F) for F in Filters])
+        Y = np.apply_along_axis(lambda x: np.concatenate(pywt.dwt(x, wavelet, mode=mode)), axis, X)
+        K = Y.shape[axis] / 2
+        return (np.take(Y, range(K), axis=axis), np.take(Y, range(K, 2*K), axis=axis))
+    return (analysis(X, Filters[0], mode, axis), analysis(X, Filters[1], mode, axis))
+
+def idwt(a, d, Filters, axis=-1):
+    '''
+    Returns the 1D inverse discrete wavelet transformation along the given axis
+    of the given coefficients. The approximation coefficients are cropped to the
+    size of the detail coefficients. The results are identical to those of pywt.idwt
+    (with correct_size) for every 1D slice.
+    @param a:         The approximation coefficients.
+    @param d:         The detail coefficients.
+    @param Filters:   The filters (see filters).
+    @param axis:      The axis.
+    '''
+    a = as_float_array(a)
+    d = as_float_array(d)
+    K = d.shape[axis]
+    if a.shape[axis] != K:
+        a = np.take(a, range(K), axis=axis)
+    return synthesis(a, Filters[2], axis) + synthesis(d, Filters[3], axis)
+
+def dwt2(S, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the 2D discrete wavelet transformation of the given 2D signal or of
+    every 2D signal of the given (N, H, W) stack in one call. The results are
+    identical to those of pywt.dwt2 for every 2D signal.
+    @param S:         Input signal (2D) or stack of input signals (3D).
+                      Both single and double precision floating-point data types are supported
+                      and the output type depends on the input type. If the input data is not
+                      in one of these types it will be converted to the default double precision
+                      data format before performing computations.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @return:          The coefficients (CA, (CH, CV, CD)) ordered like the
+                      coefficients of pywt.dwt2 (with the same leading axis as S).
+    '''
+    if mode not in modes:
+        raise ValueError("Unsupported signal extension mode: " + str(mode))
+    Filters = filters(wavelet)
+    #The rows are filtered before the columns, in double precision (see pywt.dwt2)
+    (L, H) = dwt(S, Filters, mode, axis=-1)
+    (CA, CH) = dwt(L.astype(np.float64), Filters, mode, axis=-2)
+    (CV, CD) = dwt(H.astype(np.float64), Filters, mode, axis=-2)
+    return (CA, (CH, CV, CD))
+
+def idwt2(A, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the inverse 2D discrete wavelet transformation of the given coefficients
+    of one 2D signal or of a stack of 2D signals. The results are identical to
+    those of pywt.idwt2 for every 2D signal.
+    @param A:         The coefficients (CA, (CH, CV, CD)) (see dwt2).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    '''
+    if mode not in modes:
+        raise ValueError("Unsupported signal extension mode: " + str(mode))
+    Filters = filters(wavelet)
+    (CA, (CH, CV, CD)) = A
+    CA = CA[..., :np.shape(CH)[-2], :np.shape(CH)[-1]]
+    #The columns are reconstructed before the rows (see pywt.idwt2)
+    L = idwt(CA, CH, Filters, axis=-2)
+    H = idwt(CV, CD, Filters, axis=-2)
+    return idwt(L, H, Filters, axis=-1)
+
+def wavedec2(S, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    '''
+    Returns the multilevel 2D discrete wavelet transformation of the given 2D signal
+    or of every 2D signal of the given (N, H, W) stack (see pywt.wavedec2 and analysis2).
+    @param S:         Input signal (2D) or stack of input signals (3D).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @return:          List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    '''
+    A = []
+    CA = S
+    for l in range(level):
+        (CA, D) = analysis2(CA, wavelet=wavelet, mode=mode)
+        A.append(D)
+    A.append(CA)
+    return A[::-1]
+
+def waverec2(A, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the multilevel inverse 2D discrete wavelet transformation of the given
+    coefficients (see pywt.waverec2 and synthesis2).
+    @param A:         List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    '''
+    CA = A[0]
+    for D in A[1:]:
+        CA = synthesis2((CA, D), wavelet=wavelet, mode=mode)
+    return CA
+
+# Maximum number of samples of the 2D signals of a stack that are transformed
+# in one call (pywt is faster for larger signals, which are transformed one by one)
+max_samples = 2**15
+
+# Minimum number of 1D signals of a stack that are transformed in one call
+# (pywt is faster for fewer signals, which are transformed one by one)
+min_signals = 64
+
+def unstack(Xs, shape):
+    '''
+    Returns the given list of arrays as one array with the given leading shape.
+    @param Xs:        The list of arrays (of the same shape).
+    @param shape:     The leading shape.
+    '''
+    X = Xs[0][np.newaxis] if len(Xs) == 1 else np.array(Xs)
+    return X.reshape(tuple(shape) + X.shape[1:])
+
+def analysis2(S, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the 2D discrete wavelet transformation of the given 2D signal or of every
+    2D signal of the given (..., H, W) stack. Stacks of small signals are transformed in
+    one call (with dwt2), large signals and signals with a signal extension mode that is not
+    supported by dwt2 (see modes) one by one (with pywt.dwt2). The results are identical.
+    @param S:         Input signal (2D) or stack of input signals (3D or more).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @return:          The coefficients (CA, (CH, CV, CD)).
+    '''
+    if np.ndim(S) == 2:
+        return pywt.dwt2(S, wavelet=wavelet, mode=mode)
+    shape = np.shape(S)
+    if np.prod(shape[-2:]) <= max_samples and mode in modes:
+        return dwt2(S, wavelet=wavelet, mode=mode)
+    Cs = [pywt.dwt2(X, wavelet=wavelet, mode=mode) for X in np.reshape(S, (-1,) + shape[-2:])]
+    return (unstack([CA for (CA, D) in Cs], shape[:-2]), tuple([unstack([D[k] for (CA, D) in Cs], shape[:-2]) for k in range(3)]))
+
+def synthesis2(A, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the inverse 2D discrete wavelet transformation of the given coefficients
+    of one 2D signal or of a stack of 2D signals (see analysis2).
+    @param A:         The coefficients (CA, (CH, CV, CD)).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    '''
+    (CA, (CH, CV, CD)) = A
+    if np.ndim(CH) == 2:
+        return pywt.idwt2(A, wavelet=wavelet, mode=mode)
+    shape = np.shape(CH)
+    if 4 * np.prod(shape[-2:]) <= max_samples and mode in modes:
+        return idwt2(A, wavelet=wavelet, mode=mode)
+    (CA, CH, CV, CD) = [np.reshape(C, (-1,) + np.shape(C)[-2:]) for C in (CA, CH, CV, CD)]
+    return unstack([pywt.idwt2((CA[i], (CH[i], CV[i], CD[i])), wavelet=wavelet, mode=mode) for i in range(len(CH))], shape[:-2])
+
+def analysis1(X, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the 1D discrete wavelet transformation of the given 1D signal or of every
+    1D signal of the given (..., n) stack. Stacks of many signals are transformed in
+    one call (with dwt), few signals and signals with a signal extension mode that is not
+    supported by dwt (see modes) one by one (with pywt.dwt). The results are identical.
+    @param X:         Input signal (1D) or stack of input signals (2D or more).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @return:          A tuple containing the approximation and detail coefficients.
+    '''
+    if np.ndim(X) == 1:
+        return pywt.dwt(X, wavelet=wavelet, mode=mode)
+    shape = np.shape(X)
+    Filters = filters(wavelet)
+    if np.prod(shape[:-1]) >= min_signals and shape[-1] >= len(Filters[0]) and mode in modes:
+        return dwt(X, Filters, mode, axis=-1)
+    Cs = [pywt.dwt(x, wavelet=wavelet, mode=mode) for x in np.reshape(X, (-1, shape[-1]))]
+    return (unstack([a for (a, d) in Cs], shape[:-1]), unstack([d for (a, d) in Cs], shape[:-1]))
+
+def synthesis1(a, d, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the inverse 1D discrete wavelet transformation of the given coefficients
+    of one 1D signal or of a stack of 1D signals (see analysis1).
+    The approximation coefficients may have one additional trailing entry.
+    @param a:         The approximation coefficients.
+    @param d:         The detail coefficients.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    '''
+    if np.ndim(d) == 1:
+        return pywt.idwt(a, d, wavelet=wavelet, mode=mode, correct_size=True)
+    shape = np.shape(d)
+    if np.prod(shape[:-1]) >= min_signals and mode in modes:
+        return idwt(a, d, filters(wavelet), axis=-1)
+    (a, d) = (np.reshape(a, (-1, np.shape(a)[-1])), np.reshape(d, (-1, shape[-1])))
+    return unstack([pywt.idwt(a[i], d[i], wavelet=wavelet, mode=mode, correct_size=True) for i in range(len(d))], shape[:-1])
+
+###############################################################################
+# PACKETS
+###############################################################################
+
+def packets2(Parents, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the childs of all the given nodes of one level of a quad tree of
+    wavelet packets, which are decomposed together (see analysis2).
+    @param Parents:   The coefficients of the nodes, stacked along the leading axis
+                      (node index first).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @return:          The coefficients of the childs, stacked along the leading axis
+                      (the childs of parent p have the indices 4p, 4p+1, 4p+2 and 4p+3).
+    '''
+    (CA, (CH, CV, CD)) = analysis2(Parents, wavelet=wavelet, mode=mode)
+    Childs = np.empty((CA.shape[0], 4) + CA.shape[1:], dtype=CA.dtype)
+    (Childs[:, 0], Childs[:, 1], Childs[:, 2], Childs[:, 3]) = (CA, CH, CV, CD)
+    return Childs.reshape((4 * CA.shape[0],) + CA.shape[1:])
+
+def packets(Parents, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the childs of all the given nodes of one level of a binary tree of
+    wavelet packets, which are decomposed together (see analysis1).
+    @param Parents:   The coefficients of the nodes, stacked along the leading axis
+                      (node index first).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @return:          The coefficients of the childs, stacked along the leading axis
+                      (the childs of parent p have the indices 2p and 2p+1).
+    '''
+    (Cl, Cr) = analysis1(Parents, wavelet=wavelet, mode=mode)
+    Childs = np.empty((Cl.shape[0], 2) + Cl.shape[1:], dtype=Cl.dtype)
+    (Childs[:, 0], Childs[:, 1]) = (Cl, Cr)
+    return Childs.reshape((2 * Cl.shape[0],) + Cl.shape[1:])
+
+###############################################################################
+# TESTS
+###############################################################################
+
+if __name__ == "__main__":
+    #All modes of pywt, including those that are transformed one by one (per and sp1)
+    for mode in (pywt.MODES.zpd, pywt.MODES.cpd, pywt.MODES.sym, pywt.MODES.ppd, pywt.MODES.sp1, pywt.MODES.per):
+        for shape in ((3, 64, 64), (2, 200, 200)):
+            S = np.random.rand(*shape)
+            A = analysis2(S, mode=mode)
+            B = [pywt.dwt2(X, "db4", mode=mode) for X in S]
+            a = max([np.max(np.abs(C[i] - D)) for i in range(len(S)) for (C, D) in zip((A[0],) + A[1], (B[i][0],) + B[i][1])])
+            s = max([np.max(np.abs(synthesis2(A, mode=mode)[i] - pywt.idwt2(B[i], "db4", mode=mode))) for i in range(len(S))])
+            Childs = packets2(S, mode=mode)
+            p = max([np.max(np.abs(Childs[4*i+k] - C)) for i in range(len(S)) for (k, C) in enumerate((B[i][0],) + B[i][1])])
+            print("2D mode " + str(mode) + " " + str(shape) + ": analysis " + str(a) + ", synthesis " + str(s) + ", packets " + str(p))
+        X = np.random.rand(min_signals, 100)
+        (L, H) = analysis1(X, mode=mode)
+        B = [pywt.dwt(x, "db4", mode=mode) for x in X]
+        a = max([max(np.max(np.abs(L[i] - B[i][0])), np.max(np.abs(H[i] - B[i][1]))) for i in range(len(X))])
+        s = max([np.max(np.abs(synthesis1(L, H, mode=mode)[i] - pywt.idwt(B[i][0], B[i][1], "db4", mode=mode, correct_size=True))) for i in range(len(X))])
+        p = np.max(np.abs(packets(X, mode=mode)[1::2] - H))
+        print("1D mode " + str(mode) + ": analysis " + str(a) + ", synthesis " + str(s) + ", packets " + str(p))
@@ -0,0 +1,192 @@
+'''
+3 Wavelet packets
+Huffman coding (WSQ/JPEG style tables)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import array
+import heapq
+import numpy as np
+
+###############################################################################
+# TABLE SPECIFICATION
+###############################################################################
+
+max_code_size = 16
+
+def specification(Counts):
+    '''
+    Returns the Huffman table specification for the given symbol counts.
+    The code words are limited to 16 bits and the all-1-bit code word is
+    reserved as a prefix for longer code words (see WSQ Annex C).
+    @param Counts:    Array containing the number of occurrences of every symbol
+                      (8-bit symbols).
+    @return:          A tuple containing the list BITS (the number of code words
+                      of every code size 1..16) and the list HUFFVAL (the symbols
+                      in order of increasing code size).
+    '''
+    Symbols = [s for s in range(len(Counts)) if Counts[s] > 0]
+    if len(Symbols) == 0:
+        return ([0] * max_code_size, [])
+    #The reserved symbol (len(Counts)) occurs once and is merged first,
+    #so it receives (one of) the longest code words.
+    reserved = len(Counts)
+    Sizes = dict([(s, 0) for s in Symbols + [reserved]])
+    Heap = [(1, -1, [reserved])] + [(int(Counts[s]), s, [s]) for s in Symbols]
+    heapq.heapify(Heap)
+    while len(Heap) > 1:
+        (c1, o1, S1) = heapq.heappop(Heap)
+        (c2, o2, S2) = heapq.heappop(Heap)
+        for s in S1 + S2:
+            Sizes[s] += 1
+        heapq.heappush(Heap, (c1+c2, min(o1, o2), S1 + S2))
+    Ordered = sorted(Sizes.keys(), key=lambda s: (Sizes[s], s))
+
+    #Limit the code sizes (see JPEG Annex K.3)
+    BITS = [0] * (max(Sizes.values()) + 1)
+    for s in Ordered:
+        BITS[Sizes[s]] += 1
+    i = len(BITS) - 1
+    while i > max_code_size:
+        if BITS[i] > 0:
+            j = i - 2
+            while BITS[j] == 0:
+                j -= 1
+            BITS[i] -= 2
+            BITS[i-1] += 1
+            BITS[j+1] += 2
+            BITS[j] -= 1
+        else:
+            i -= 1
+    while BITS[i] == 0:
+        i -= 1
+    #Remove the reserved code word
+    BITS[i] -= 1
+    BITS = (BITS[1:] + [0] * max_code_size)[:max_code_size]
+    return (BITS, Ordered[:-1])
+
+def codes(BITS, HUFFVAL):
+    '''
+    Returns the Huffman code words for the given table specification
+    (see WSQ Annex C.2).
+    @param BITS:      List containing the number of code words of every code size 1..16.
+    @param HUFFVAL:   List containing the symbols in order of increasing code size.
+    @return:          A tuple containing the list HUFFSIZE (the code size of every symbol of
+                      HUFFVAL) and the list HUFFCODE (the code word of every symbol of HUFFVAL).
+    '''
+    HUFFSIZE = []
+    for i in range(len(BITS)):
+        HUFFSIZE.extend([i+1] * BITS[i])
+    HUFFCODE = []
+    code = 0
+    si = HUFFSIZE[0] if len(HUFFSIZE) > 0 else 0
+    for size in HUFFSIZE:
+        while size > si:
+            code <<= 1
+            si += 1
+        HUFFCODE.append(code)
+        code += 1
+    return (HUFFSIZE, HUFFCODE)
+
+def encoding_table(BITS, HUFFVAL, n=256):
+    '''
+    Returns the encoding tables EHUFCO and EHUFSI for the given table specification
+    (see WSQ Annex C.2). The code size of symbols without code word is 0.
+    @param BITS:      List containing the number of code words of every code size 1..16.
+    @param HUFFVAL:   List containing the symbols in order of increasing code size.
+    @param n:         The number of symbols.
+    @return:          A tuple containing the list EHUFCO (the code word of every symbol)
+                      and the list EHUFSI (the code size of every symbol).
+    '''
+    (HUFFSIZE, HUFFCODE) = codes(BITS, HUFFVAL)
+    EHUFCO = [0] * n
+    EHUFSI = [0] * n
+    for (s, size, code) in zip(HUFFVAL, HUFFSIZE, HUFFCODE):
+        EHUFCO[s] = code
+        EHUFSI[s] = size
+    return (EHUFCO, EHUFSI)
+
+###############################################################################
+# BIT STREAMS
+###############################################################################
+
+class BitWriter:
+    def __init__(self):
+        '''
+        Creates a new bit writer for entropy-coded data.
+        Bits are written from the MSB to the LSB of every byte and
+        a zero byte is stuffed after every 0xFF byte.
+        '''
+        self.Bytes = bytearray()
+        self.Bits = np.zeros(0, dtype=np.uint8)
+
+    def write(self, Values, Sizes):
+        '''
+        Writes the given number of least significant bits of every given value.
+        All values are expanded to bits and packed into bytes at once.
+        @param Values:    Array containing the values (at most 32 bits).
+        @param Sizes:     Array containing the number of bits of every value.
+        '''
+        Values = np.asarray(Values, dtype=np.int64)
+        Sizes = np.asarray(Sizes, dtype=np.int64)
+        Offsets = np.arange(np.sum(Sizes)) - np.repeat(np.cumsum(Sizes) - Sizes, Sizes)
+        Bits = (np.repeat(Values, Sizes) >> (np.repeat(Sizes, Sizes) - 1 - Offsets)) & 1
+        Bits = np.concatenate((self.Bits, Bits.astype(np.uint8)))
+        n = len(Bits) - len(Bits) % 8
+        Bytes = np.packbits(Bits[:n])
+        self.Bits = Bits[n:]
+        Bytes = np.insert(Bytes, np.flatnonzero(Bytes == 0xFF) + 1, 0)
+        self.Bytes.extend(Bytes.tostring())
+
+    def pad(self):
+        '''
+        Pads the written bits with 1-bits up to the next byte boundary.
+        '''
+        if len(self.Bits) > 0:
+            n = 8 - len(self.Bits)
+            self.write([(1 << n) - 1], [n])
+
+    def take(self):
+        '''
+        Returns and removes the complete bytes written so far.
+        '''
+        Bytes = self.Bytes
+        self.Bytes = bytearray()
+        return Bytes
+
+def decoding_table(BITS, HUFFVAL):
+    '''
+    Returns the lookup tables for decoding with the given table specification.
+    Both tables are indexed by the next 16 bits of the entropy-coded data.
+    @param BITS:      List containing the number of code words of every code size 1..16.
+    @param HUFFVAL:   List containing the symbols in order of increasing code size.
+    @return:          A tuple containing the list of the decoded symbols and
+                      the list of the code sizes (0 for invalid code words).
+    '''
+    (HUFFSIZE, HUFFCODE) = codes(BITS, HUFFVAL)
+    Symbols = np.zeros(1 << max_code_size, dtype=int)
+    Sizes = np.zeros(1 << max_code_size, dtype=int)
+    for (s, size, code) in zip(HUFFVAL, HUFFSIZE, HUFFCODE):
+        shift = max_code_size - size
+        Symbols[code << shift:(code + 1) << shift] = s
+        Sizes[code << shift:(code + 1) << shift] = size
+    return (Symbols.tolist(), Sizes.tolist())
+
+def windows(Bytes):
+    '''
+    Returns the 16-bit windows of the given entropy-coded data.
+    The stuffed zero bytes are removed and the data is padded with 1-bits.
+    @param Bytes:     The entropy-coded data (without markers).
+    @return:          An array containing, for every bit position, the value
+                      of the 16 bits starting at that position (MSB first).
+    '''
+    Bytes = np.frombuffer(bytes(Bytes), dtype=np.uint8)
+    Stuffed = np.flatnonzero((Bytes[:-1] == 0xFF) & (Bytes[1:] == 0)) + 1
+    Bytes = np.delete(Bytes, Stuffed)
+    Bits = np.concatenate((np.unpackbits(Bytes), np.ones(2 * max_code_size, dtype=np.uint8)))
+    n = len(Bits) - max_code_size
+    Windows = np.zeros(n, dtype=np.uint16)
+    for i in range(max_code_size):
+        Windows |= Bits[i:i+n].astype(np.uint16) << (max_code_size - 1 - i)
+    return array.array('H', Windows.tostring())
@@ -0,0 +1,83 @@
+'''
+1 Point discontinuities and edges
+Coefficient layout
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import numpy as np
+
+###############################################################################
+# LAYOUT FUNCTIONS
+###############################################################################
+
+def shape(C):
+    '''
+    Returns the shape of the given coefficients or the given shape itself.
+    @param C:         The coefficients or their shape (a tuple).
+    '''
+    return C if isinstance(C, tuple) else np.shape(C)
+
+def layout2(A):
+    '''
+    Returns the layout of the mosaic of the given coefficients of the 2D
+    discrete wavelet transformation. The approximation coefficients are placed
+    in the upper left corner and the horizontal, vertical and diagonal detail
+    coefficients of every level are placed respectively below, to the right
+    and diagonally below to the right of the coefficients of the coarser levels.
+    @param A:         List containing the coefficients of the 2D discrete wavelet
+                      transformation [CA, (CH, CV, CD), ..., (CH, CV, CD)]
+                      or the shapes of these coefficients.
+    @return:          A tuple containing the shape of the mosaic and a list,
+                      structured like the given list, containing the regions
+                      (tuples of slices) of the coefficients in the mosaic.
+    '''
+    (Sx, Sy) = shape(A[0])
+    Regions = [(slice(0, Sx), slice(0, Sy))]
+    for (H, V, D) in A[1:]:
+        (Hx, Hy) = shape(H)
+        (Vx, Vy) = shape(V)
+        (Dx, Dy) = shape(D)
+        RH = (slice(Sx, Sx+Hx), slice(0, Hy))
+        RV = (slice(0, Vx), slice(Sy, Sy+Vy))
+        RD = (slice(Sx, Sx+Dx), slice(Sy, Sy+Dy))
+        Regions.append((RH, RV, RD))
+        (Sx, Sy) = (Sx+Dx, Sy+Dy)
+    return ((Sx, Sy), Regions)
+
+def concat2(A, Layout=None):
+    '''
+    Returns the mosaic of the given coefficients of the 2D discrete wavelet
+    transformation. Every subband is written with a single slice assignment
+    into one preallocated array.
+    @param A:         List containing the coefficients of the 2D discrete wavelet
+                      transformation [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    @param Layout:    The layout of the mosaic (see layout2).
+                      If the layout is None, the layout is computed.
+    @return:          The mosaic of the given coefficients.
+    '''
+    if (Layout == None):
+        Layout = layout2(A)
+    (shape, Regions) = Layout
+    M = np.zeros(shape)
+    M[Regions[0]] = A[0]
+    for ((H, V, D), (RH, RV, RD)) in zip(A[1:], Regions[1:]):
+        M[RH] = H
+        M[RV] = V
+        M[RD] = D
+    return M
+
+def split2(M, Layout):
+    '''
+    Returns the coefficients of the 2D discrete wavelet transformation
+    contained in the given mosaic. The coefficients are views of the mosaic.
+    @param M:         The mosaic.
+    @param Layout:    The layout of the mosaic (see layout2).
+    @return:          List containing the coefficients of the 2D discrete wavelet
+                      transformation [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    '''
+    (shape, Regions) = Layout
+    A = [M[Regions[0]]]
+    for (RH, RV, RD) in Regions[1:]:
+        A.append((M[RH], M[RV], M[RD]))
+    return A
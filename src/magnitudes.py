@@ -0,0 +1,113 @@
+'''
+2 Wavelet packets
+Sorted-magnitude index of coefficients
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import numpy as np
+
+###############################################################################
+# SORTED MAGNITUDES
+###############################################################################
+
+class Magnitudes:
+    def __init__(self, A, E):
+        '''
+        Creates a new sorted-magnitude index (see index and index_nodes).
+        All queries accept a single threshold or an array of thresholds and
+        are answered by a binary search (without a pass over the coefficients).
+        @param A:         The magnitudes (absolute values) of the coefficients
+                          in ascending order.
+        @param E:         The prefix sums of the energies (squares) of the sorted
+                          magnitudes (starting with 0, one more element than A).
+        '''
+        self.A = A
+        self.E = E
+
+    def __len__(self):
+        return self.A.shape[0]
+
+    def maximum(self):
+        '''
+        Returns the maximum of the absolute values of the coefficients.
+        '''
+        return self.A[-1] if self.A.shape[0] > 0 else 0.0
+
+    def rank(self, threshold, inclusive=False):
+        '''
+        Returns the number of small coefficients for the given threshold(s).
+        @param threshold: The threshold(s).
+        @param inclusive: True if coefficients with an absolute value equal to the
+                          threshold are large (see utils.hard_threshold_coeffs), False
+                          if they are small (see cost.cost_threshold).
+        '''
+        return np.searchsorted(self.A, threshold, side='left' if inclusive else 'right')
+
+    def count(self, threshold, inclusive=False):
+        '''
+        Returns the number of large coefficients for the given threshold(s) (see rank).
+        @param threshold: The threshold(s).
+        @param inclusive: True if coefficients with an absolute value equal to the
+                          threshold are large.
+        '''
+        return self.A.shape[0] - self.rank(threshold, inclusive=inclusive)
+
+    def energy(self, threshold, inclusive=False):
+        '''
+        Returns the energy of the large coefficients for the given threshold(s) (see rank).
+        @param threshold: The threshold(s).
+        @param inclusive: True if coefficients with an absolute value equal to the
+                          threshold are large.
+        '''
+        return self.E[-1] - self.E[self.rank(threshold, inclusive=inclusive)]
+
+    def error(self, threshold, inclusive=False):
+        '''
+        Returns the squared error of setting the small coefficients for the given
+        threshold(s) to zero, which is the energy of the small coefficients (see rank).
+        @param threshold: The threshold(s).
+        @param inclusive: True if coefficients with an absolute value equal to the
+                          threshold are large.
+        '''
+        return self.E[self.rank(threshold, inclusive=inclusive)]
+
+def index(C):
+    '''
+    Returns the sorted-magnitude index of the given coefficients.
+    @param C:         The coefficients.
+    '''
+    return index_nodes(np.reshape(C, (1, -1)))[0]
+
+def index_nodes(C):
+    '''
+    Returns a list containing the sorted-magnitude index of every node of the
+    given stack of nodes. The magnitudes of all nodes are sorted with a single call.
+    @param C:         The coefficients of the nodes (node index first).
+    '''
+    A = np.sort(np.abs(np.reshape(C, (np.shape(C)[0], -1))), axis=1)
+    E = np.zeros((A.shape[0], A.shape[1] + 1))
+    np.cumsum(np.square(A, dtype=float), axis=1, out=E[:, 1:])
+    return [Magnitudes(A[p], E[p]) for p in range(A.shape[0])]
+
+def count(Indices, threshold, inclusive=False):
+    '''
+    Returns the number of large coefficients of all the given indices
+    for the given threshold(s) (see Magnitudes.count).
+    @param Indices:   The sorted-magnitude indices.
+    @param threshold: The threshold(s).
+    @param inclusive: True if coefficients with an absolute value equal to the
+                      threshold are large.
+    '''
+    return sum([M.count(threshold, inclusive=inclusive) for M in Indices])
+
+def error(Indices, threshold, inclusive=False):
+    '''
+    Returns the squared error of setting the small coefficients of all the given
+    indices for the given threshold(s) to zero (see Magnitudes.error).
+    @param Indices:   The sorted-magnitude indices.
+    @param threshold: The threshold(s).
+    @param inclusive: True if coefficients with an absolute value equal to the
+                      threshold are large.
+    '''
+    return sum([M.error(threshold, inclusive=inclusive) for M in Indices])
@@ -59,6 +59,8 @@ class Node:
         self.index = index
         self.cost = -1
         self.best = -1
+        #Optional sorted-magnitude index of the coefficients (see magnitudes)
+        self.magnitudes = None
     
     def __cmp__(self, other):
         '''
@@ -0,0 +1,198 @@
+'''
+2 Wavelet packets
+Array-backed packet tree (2D)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import cost
+import dwt
+import magnitudes
+import node
+import numpy as np
+import parallel
+import pywt
+
+###############################################################################
+# PACKET TREE
+###############################################################################
+
+class PacketTree:
+    def __init__(self, S, wavelet="db4", mode=pywt.MODES.ppd, level=4, workers=1, Levels=None):
+        '''
+        Creates the full quad tree of wavelet packets for the given 2D input signal.
+        All nodes of one level have the same shape and their coefficients are stored
+        in a single contiguous array of that level (node index first). The costs and
+        the best costs of the nodes of one level are stored in parallel arrays.
+        @param S:         Input signal.
+                          Both single and double precision floating-point data types are supported
+                          and the output type depends on the input type. If the input data is not
+                          in one of these types it will be converted to the default double precision
+                          data format before performing computations.
+        @param wavelet:   Wavelet to use in the transform.
+                          This must be a name of the wavelet from the wavelist() list.
+        @param mode:      Signal extension mode to deal with the border distortion problem.
+        @param level:     Number of decomposition steps to perform.
+        @param workers:   The number of threads that decompose the four (independent)
+                          subtrees of the first level (see parallel.map).
+        @param Levels:    List containing the coefficients of all levels of the given input
+                          signal (e.g. loaded from a cache, see diskcache), which are used
+                          instead of decomposing the input signal (or None).
+        @note:            level 0 corresponds with the first
+                          decomposition in this implementation.
+        '''
+        self.wavelet = wavelet
+        self.mode = mode
+        self.level = level
+        self.workers = workers
+        #All nodes of one level (of one subtree) are decomposed together (see dwt.packets2)
+        def decompose(Childs, levels):
+            Levels = []
+            for l in range(levels):
+                Childs = dwt.packets2(Childs, wavelet=wavelet, mode=mode)
+                Levels.append(Childs)
+            return Levels
+        if Levels != None:
+            self.Levels = list(Levels)
+        elif parallel.workers_count(workers) == 1:
+            self.Levels = decompose(np.asarray(S)[np.newaxis], level)
+        else:
+            #The descendants of node k of the first level at level l have the
+            #indices k*4**l up to (k+1)*4**l
+            Childs = dwt.packets2(np.asarray(S)[np.newaxis], wavelet=wavelet, mode=mode)
+            Subtrees = parallel.map(lambda k: decompose(Childs[k:k+1], level-1), range(4), workers=workers)
+            self.Levels = [Childs] + [np.concatenate([Levels[l] for Levels in Subtrees]) for l in range(level-1)]
+        self.Costs = [np.zeros(C.shape[0]) for C in self.Levels]
+        self.Bests = [np.zeros(C.shape[0]) for C in self.Levels]
+        self.Indices = None
+
+    def node(self, level, index):
+        '''
+        Returns the node at the given level and index.
+        The coefficients of the node are a view of the coefficients of the level.
+        @param level:     The level of the node.
+        @param index:     The index of the node.
+        '''
+        Node = node.Node(self.Levels[level][index], level, index)
+        Node.cost = self.Costs[level][index]
+        Node.best = self.Bests[level][index]
+        if self.Indices != None:
+            Node.magnitudes = self.Indices[level][index]
+        return Node
+
+    def index(self):
+        '''
+        Builds the sorted-magnitude index of every node of this packet tree
+        (see magnitudes.index_nodes), which is attached to the nodes (see node).
+        The costs of threshold cost functions (see cost.cost_threshold) are then
+        computed with a binary search per node instead of a pass over the coefficients.
+        '''
+        if self.Indices == None:
+            self.Indices = [magnitudes.index_nodes(C) for C in self.Levels]
+
+    def nodes(self):
+        '''
+        Returns the (non-flattened) nodes of this packet tree
+        (see quadtree.collect).
+        '''
+        return [[self.node(l, p) for p in range(C.shape[0])] for (l, C) in enumerate(self.Levels)]
+
+    def costs(self, costf):
+        '''
+        Returns the costs of all nodes of this packet tree. The costs of all
+        nodes of a level are computed with a single call (or with one call for
+        every worker, see PacketTree).
+        @param costf:      The cost function. Cost functions with an axis
+                           argument (see cost) are called for a stack of nodes.
+        @return:          List containing the array of the costs of the nodes of every level.
+        '''
+        return self.multi_costs([costf])[0]
+
+    def multi_costs(self, Costfs, block=2**18):
+        '''
+        Returns the costs of all nodes of this packet tree for all the given cost
+        functions. The nodes of a level are visited in blocks of (about) the given
+        number of bytes and all cost functions are evaluated for a block before
+        moving on to the next block, so the coefficients are read from memory once
+        (instead of once for every cost function). If this packet tree is indexed,
+        the costs of threshold cost functions are looked up in the index (see index).
+        @param Costfs:    List containing the cost functions. Cost functions with an axis
+                          argument (see cost) are called for a stack of nodes, those
+                          without one for every node (see cost.accepts_axis).
+        @param block:     The number of bytes of a block (at least one node).
+        @return:          List containing for every cost function the list containing
+                          the array of the costs of the nodes of every level (see costs).
+        '''
+        workers = parallel.workers_count(self.workers)
+        #The costs of threshold cost functions are looked up in the index (if any)
+        Indexed = [k for (k, costf) in enumerate(Costfs) if self.Indices != None and hasattr(costf, "threshold")]
+        Passes = [k for k in range(len(Costfs)) if k not in Indexed]
+        #Cost functions without an axis argument are called for every node
+        Axes = [cost.accepts_axis(costf) for costf in Costfs]
+        def evaluate(C):
+            step = max(1, block // max(1, C[0].nbytes)) if C.shape[0] > 0 else 1
+            Costs = [np.empty(C.shape[0]) for k in Passes]
+            for i in range(0, C.shape[0], step):
+                for (j, k) in enumerate(Passes):
+                    if Axes[k]:
+                        Costs[j][i:i+step] = np.asarray(Costfs[k](C[i:i+step], axis=(1,2)), dtype=float).reshape(-1)
+                    else:
+                        Costs[j][i:i+step] = [Costfs[k](X) for X in C[i:i+step]]
+            return Costs
+        Costs = [[] for costf in Costfs]
+        for (l, C) in enumerate(self.Levels):
+            if len(Passes) > 0:
+                Chunks = np.array_split(C, min(workers, C.shape[0]))
+                Results = parallel.map(evaluate, Chunks, workers=workers)
+                for (j, k) in enumerate(Passes):
+                    Costs[k].append(np.concatenate([Result[j] for Result in Results]))
+            if len(Indexed) > 0:
+                #All thresholds of a node are looked up with a single call
+                Thresholds = [Costfs[k].threshold for k in Indexed]
+                Counts = np.array([M.count(Thresholds) for M in self.Indices[l]], dtype=float)
+                for (j, k) in enumerate(Indexed):
+                    Costs[k].append(Counts[:, j])
+        return Costs
+
+    def mark(self, costf, Costs=None):
+        '''
+        Marks every node of this packet tree with the best cost seen so far.
+        @param costf:      The cost function that must be used while searching
+                           for the best basis (see costs).
+        @param Costs:     List containing the array of the costs of the nodes of every
+                          level (e.g. summed over multiple packet trees, see costs), which
+                          are used instead of the costs of this packet tree (or None).
+        '''
+        if Costs == None:
+            Costs = self.costs(costf)
+        for l in range(self.level-1, -1, -1):
+            cp = Costs[l]
+            self.Costs[l] = cp
+            if l == self.level-1:
+                self.Bests[l] = cp
+            else:
+                B = self.Bests[l+1]
+                cc = B[0::4] + B[1::4] + B[2::4] + B[3::4]
+                self.Bests[l] = np.where(cp <= cc, cp, cc)
+
+    def basis(self):
+        '''
+        Returns the positions (level, index) of the nodes of the best basis
+        (low levels first, low indices first).
+        '''
+        Positions = []
+        Active = np.ones(4, dtype=bool)
+        for l in range(self.level):
+            Take = Active & (self.Bests[l] == self.Costs[l])
+            if l == self.level-1:
+                Take = Active
+            Positions.extend([(l, int(p)) for p in np.nonzero(Take)[0]])
+            Active = np.repeat(Active & ~Take, 4)
+        return Positions
+
+    def best_basis(self):
+        '''
+        Returns a list containing the nodes of the best basis
+        (low levels first, low indices first).
+        '''
+        return [self.node(l, p) for (l, p) in self.basis()]
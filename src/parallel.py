@@ -0,0 +1,76 @@
+'''
+2 Wavelet packets
+Thread pools
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import multiprocessing
+import multiprocessing.pool
+import os
+import threading
+
+###############################################################################
+# THREAD POOLS
+###############################################################################
+
+# Cache containing the thread pools (one for every process and number of workers,
+# since the threads of a pool do not survive a fork)
+Pools = {}
+lock = threading.Lock()
+# Thread-local state which marks the threads of the pools
+local = threading.local()
+
+def workers_count(workers):
+    '''
+    Returns the number of workers for the given number of workers.
+    @param workers:   The number of workers. If the number of workers is None,
+                      the number of CPUs is used.
+    '''
+    if workers == None:
+        return multiprocessing.cpu_count()
+    return max(1, int(workers))
+
+def get_pool(workers):
+    '''
+    Returns the (cached) pool with the given number of threads.
+    The pool is created the first time it is needed.
+    @param workers:   The number of threads.
+    '''
+    key = (os.getpid(), workers)
+    with lock:
+        if key not in Pools:
+            Pools[key] = multiprocessing.pool.ThreadPool(processes=workers)
+        return Pools[key]
+
+def call((function, item)):
+    '''
+    Calls the given function with the given item in a thread of a pool.
+    @param function:  The function.
+    @param item:      The item.
+    '''
+    local.worker = True
+    try:
+        return function(item)
+    finally:
+        local.worker = False
+
+def map(function, Items, workers=1):
+    '''
+    Returns the list containing the results of the given function for all
+    the given items (in the order of the items), computed with a pool of
+    the given number of threads. The computations only run in parallel as far
+    as NumPy and pywt release the GIL.
+    The items are processed in the calling thread if there is only one worker
+    or one item, or if the calling thread is itself a thread of a pool
+    (which would otherwise wait for a thread of a pool).
+    @param function:  The function, which is called with one item.
+    @param Items:     The items.
+    @param workers:   The number of threads. If the number of threads is None,
+                      the number of CPUs is used.
+    '''
+    Items = list(Items)
+    workers = workers_count(workers)
+    if workers == 1 or len(Items) <= 1 or getattr(local, "worker", False):
+        return [function(item) for item in Items]
+    return get_pool(workers).map(call, [(function, item) for item in Items], chunksize=1)
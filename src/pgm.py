@@ -0,0 +1,169 @@
+'''
+3 Fingerprint compression
+PGM files
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import glob
+import numpy as np
+import os
+
+###############################################################################
+# READER
+###############################################################################
+
+def header(f):
+    '''
+    Reads the header of the given binary (P5) PGM file. The header is read token
+    by token (comments are skipped) and exactly one whitespace character follows
+    the maximum gray value, so the pixel data may start on any line.
+    @param f:         The file, positioned at the start of the file.
+    @return:          A tuple containing the shape (height, width) of the image,
+                      the maximum gray value and the offset of the pixel data.
+                      The file is positioned at the start of the pixel data.
+    '''
+    Fields = []
+    while len(Fields) < 4:
+        c = f.read(1)
+        if c == "":
+            raise ValueError("Incomplete PGM header")
+        if c == "#":
+            #A comment runs until the end of the line
+            while c not in ("", "\n", "\r"):
+                c = f.read(1)
+            continue
+        if c.isspace():
+            continue
+        field = c
+        c = f.read(1)
+        while c != "" and not c.isspace() and c != "#":
+            field += c
+            c = f.read(1)
+        Fields.append(field)
+        if c == "#":
+            f.seek(-1, 1)
+        elif len(Fields) == 4 and c == "":
+            raise ValueError("Incomplete PGM header")
+    #The single whitespace character after the maximum gray value has been read
+    if Fields[0] != "P5":
+        raise ValueError("Not a binary PGM file (P5)")
+    (width, height, maxval) = [int(field) for field in Fields[1:4]]
+    return ((height, width), maxval, f.tell())
+
+def dtype(maxval):
+    '''
+    Returns the data type of the pixels for the given maximum gray value
+    (1 byte or 2 bytes, most significant byte first).
+    @param maxval:    The maximum gray value.
+    '''
+    return np.dtype(np.uint8) if maxval < 256 else np.dtype('>u2')
+
+def memmap(fname):
+    '''
+    Memory-maps (read-only) the pixel data of the given binary (P5) PGM file.
+    @param fname:     The file name.
+    @return:          A tuple containing the memory-mapped image and the maximum gray value.
+    '''
+    f = open(fname, 'rb')
+    try:
+        (shape, maxval, offset) = header(f)
+    finally:
+        f.close()
+    return (np.memmap(fname, dtype=dtype(maxval), mode='r', offset=offset, shape=shape), maxval)
+
+def read(fname):
+    '''
+    Returns the image of the given binary (P5) PGM file.
+    The pixel data is memory-mapped (read-only) and not copied.
+    @param fname:     The file name.
+    '''
+    return memmap(fname)[0]
+
+def convert(M, maxval=255, invert=False, dtype=float, out=None):
+    '''
+    Returns the given image converted to the given data type. The inversion
+    (maxval - M) is fused with the conversion, so only one array is written.
+    @param M:         The image (e.g. a memory-mapped image, see read).
+    @param maxval:    The maximum gray value.
+    @param invert:    True if the gray values must be inverted.
+    @param dtype:     The data type of the result.
+    @param out:       The array to write the result to (or None to allocate the result).
+    '''
+    if out is None:
+        out = np.empty(np.shape(M), dtype=dtype)
+    if invert:
+        return np.subtract(maxval, M, out=out, dtype=out.dtype)
+    out[...] = M
+    return out
+
+def image(fname, invert=False, dtype=float):
+    '''
+    Returns the image of the given binary (P5) PGM file converted to the given
+    data type (see convert).
+    @param fname:     The file name.
+    @param invert:    True if the gray values must be inverted.
+    @param dtype:     The data type of the result.
+    '''
+    (M, maxval) = memmap(fname)
+    return convert(M, maxval=maxval, invert=invert, dtype=dtype)
+
+def batch(fnames, invert=False, dtype=float):
+    '''
+    Returns the images of the given binary (P5) PGM files as one (N, H, W) array.
+    The array is allocated once and every image is converted directly into it.
+    @param fnames:    The file names. All images must have the same shape.
+    @param invert:    True if the gray values must be inverted.
+    @param dtype:     The data type of the result.
+    '''
+    Images = [memmap(fname) for fname in fnames]
+    Shapes = set([M.shape for (M, maxval) in Images])
+    if len(Shapes) > 1:
+        raise ValueError("The images do not have the same shape: " + str(sorted(Shapes)))
+    shape = Shapes.pop() if len(Shapes) > 0 else (0, 0)
+    B = np.empty((len(Images),) + shape, dtype=dtype)
+    for (i, (M, maxval)) in enumerate(Images):
+        convert(M, maxval=maxval, invert=invert, out=B[i])
+    return B
+
+def directory(dname, invert=False, dtype=float, pattern="*.pgm"):
+    '''
+    Returns the images of the binary (P5) PGM files in the given directory
+    as one (N, H, W) array (see batch).
+    @param dname:     The directory name.
+    @param invert:    True if the gray values must be inverted.
+    @param dtype:     The data type of the result.
+    @param pattern:   The pattern of the file names.
+    @return:          A tuple containing the sorted list of the file names and the images.
+    '''
+    fnames = sorted(glob.glob(os.path.join(dname, pattern)))
+    return (fnames, batch(fnames, invert=invert, dtype=dtype))
+
+def rows(fname):
+    '''
+    Returns a generator of the rows of the given binary (P5) PGM file.
+    Only one row is read from the file at a time.
+    @param fname:     The file name.
+    '''
+    f = open(fname, 'rb')
+    try:
+        ((height, width), maxval, offset) = header(f)
+        t = dtype(maxval)
+        for i in range(height):
+            Data = f.read(width * t.itemsize)
+            if len(Data) < width * t.itemsize:
+                raise ValueError("Incomplete PGM pixel data: " + fname)
+            yield np.frombuffer(Data, dtype=t)
+    finally:
+        f.close()
+
+def shape(fname):
+    '''
+    Returns the shape (height, width) of the image of the given binary (P5) PGM file.
+    @param fname:     The file name.
+    '''
+    f = open(fname, 'rb')
+    try:
+        return header(f)[0]
+    finally:
+        f.close()
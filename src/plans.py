@@ -0,0 +1,112 @@
+'''
+2 Wavelet packets
+Transform plans
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import collections
+import layout
+import numpy as np
+import pywt
+import synthesis
+
+###############################################################################
+# PLANS
+###############################################################################
+
+class Plan:
+    def __init__(self, shape, wavelet="db4", mode=pywt.MODES.ppd, level=4, Basis=None):
+        '''
+        Creates a new plan for the 2D discrete wavelet (packet) transformation
+        of 2D input signals with the given shape. The wavelet is resolved and the
+        shapes and offsets of all subbands and the merge schedule of the basis are
+        computed once.
+        @param shape:     The shape of the input signals.
+        @param wavelet:   Wavelet to use in the transform.
+                          This must be a name of the wavelet from the wavelist() list.
+        @param mode:      Signal extension mode to deal with the border distortion problem.
+                          The default mode is periodic-padding.
+        @param level:     Number of decomposition steps to perform.
+        @param Basis:     List containing the positions (level, index) of the nodes
+                          of the basis (or None if the plan has no basis).
+        @note:            level 0 corresponds with the first
+                          decomposition in this implementation.
+        '''
+        self.shape = tuple(shape)
+        self.name = wavelet
+        self.wavelet = pywt.Wavelet(wavelet)
+        self.mode = mode
+        self.level = level
+
+        #All nodes of one level have the same shape
+        self.Shapes = []
+        (rows, columns) = self.shape
+        for l in range(level):
+            rows = pywt.dwt_coeff_len(rows, self.wavelet.dec_len, mode)
+            columns = pywt.dwt_coeff_len(columns, self.wavelet.dec_len, mode)
+            self.Shapes.append((rows, columns))
+
+        #Shapes and regions of the coefficients of the 2D discrete wavelet transformation
+        #[CA, (CH, CV, CD), ..., (CH, CV, CD)] (see pywt.wavedec2 and layout.layout2)
+        self.Coefficients = [self.Shapes[-1]] + [(s, s, s) for s in reversed(self.Shapes)]
+        self.Layout = layout.layout2(self.Coefficients)
+
+        #Nodes of the concatenation of the coefficients (see utils.pack_coeffs): the nodes
+        #of the basis, or the subbands of the 2D discrete wavelet transformation in the
+        #order of utils.flatten_coeffs2 if the plan has no basis
+        if Basis == None:
+            self.Basis = None
+            self.Nodes = [(level-1, 0)] + [(l, i) for l in reversed(range(level)) for i in (1, 2, 3)]
+            self.Schedule = None
+        else:
+            self.Basis = tuple(Basis)
+            for (l, i) in self.Basis:
+                if l < 0 or l >= level:
+                    raise ValueError("The basis contains the node " + str((l, i)) + " beyond the level")
+            self.Nodes = list(self.Basis)
+            self.Schedule = synthesis.schedule(list(self.Basis), n=4)
+
+        #Offsets of the nodes in the concatenation of their coefficients
+        self.Offsets = {}
+        self.size = 0
+        for (l, i) in self.Nodes:
+            self.Offsets[(l, i)] = self.size
+            self.size += self.Shapes[l][0] * self.Shapes[l][1]
+
+    def check(self, S):
+        '''
+        Checks whether this plan can be used for the given 2D input signal
+        or (N, H, W) stack of 2D input signals.
+        @param S:         Input signal (2D) or stack of input signals (3D).
+        '''
+        if np.ndim(S) not in (2, 3) or np.shape(S)[-2:] != self.shape:
+            raise ValueError("The plan is for signals of shape " + str(self.shape) + " and not " + str(np.shape(S)))
+
+# Cache containing the most recently used plans
+Plans = collections.OrderedDict()
+max_plans = 32
+
+def get_plan(shape, wavelet="db4", mode=pywt.MODES.ppd, level=4, Basis=None):
+    '''
+    Returns the (cached) plan for the given shape, wavelet, mode, level and basis.
+    The least recently used plan is removed if the cache is full.
+    (see Plan)
+    @param shape:     The shape of the input signals.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @param Basis:     List containing the positions (level, index) of the nodes
+                      of the basis (or None if the plan has no basis).
+    '''
+    key = (tuple(shape), wavelet, mode, level, None if Basis == None else tuple(sorted(Basis)))
+    if key in Plans:
+        plan = Plans.pop(key)
+    else:
+        plan = Plan(shape, wavelet=wavelet, mode=mode, level=level, Basis=Basis)
+        if len(Plans) >= max_plans:
+            Plans.popitem(last=False)
+    Plans[key] = plan
+    return plan
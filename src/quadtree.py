@@ -5,16 +5,20 @@
 @version    1.0
 '''
 import cost
-import heapq
+import dwt
 import node
 import numpy as np
+import packettree
+import parallel
 import pywt
+import synthesis
+import threading
 
 ###############################################################################
 # ANALYSIS ALGORITHM FUNCTIONS
 ###############################################################################        
 
-def wp2(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+def wp2(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=4, workers=1, index=False):
     '''
     Returns the 2D discrete wavelet packet transformation, with the best basis according
     to the given cost function, for the given 2D input signal.
@@ -23,33 +27,216 @@ def wp2(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=4):
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
                       data format before performing computations.
-    @param costf:      The (single parameter) cost function that must be used while
-                      searching for the best basis.
+    @param costf:     The cost function that must be used while searching for the
+                      best basis. Cost functions with an axis argument (see cost) are called
+                      for all nodes of a level at once, others for every node.
+                      If a list of cost functions is given, the wavelet packets are computed
+                      once and the costs of a node are computed together for all cost functions
+                      (see packettree.PacketTree.multi_costs).
     @param wavelet:   Wavelet to use in the transform. 
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodic-padding.
     @param level:     Number of decomposition steps to perform.
+    @param workers:   The number of threads that process the four (independent) subtrees
+                      of the first level and the costs of every level (see packettree.PacketTree).
+    @param index:     True if the sorted-magnitude index of every node must be built (see
+                      packettree.PacketTree.index), e.g. for the best bases of many threshold
+                      cost functions. The index is attached to the returned nodes.
     @return:          A list containing the nodes of the 2D discrete wavelet packet transformation,
                       with the best basis according to the given cost function, for the given input signal. 
+                      If a list of cost functions is given, a list containing such a list for every
+                      cost function (the coefficients of the nodes are shared).
     '''
     #Data collection step
-    Nodes = collect(S, wavelet=wavelet, mode=mode, level=level)
+    Tree = packettree.PacketTree(S, wavelet=wavelet, mode=mode, level=level, workers=workers)
+    if index:
+        Tree.index()
+    if isinstance(costf, (list, tuple)):
+        Bases = []
+        for Costs in Tree.multi_costs(costf):
+            Tree.mark(None, Costs=Costs)
+            Bases.append(Tree.best_basis())
+        return Bases
     #Dynamic programming upstream traversal
-    mark(Nodes, costf)
-    #node.print_nodes(Nodes)
+    Tree.mark(costf)
+    #node.print_nodes(Tree.nodes())
     #Dynamic programming downstream traversal
-    Result = []
-    traverse(Nodes[0][0], Nodes, Result)
-    traverse(Nodes[0][1], Nodes, Result)
-    traverse(Nodes[0][2], Nodes, Result)
-    traverse(Nodes[0][3], Nodes, Result)
-    return sorted(Result, cmp=node.compare_low_level_first, reverse=False)
+    return Tree.best_basis()
+                     
+def shared_basis(Images, costf, wavelet="db4", mode=pywt.MODES.ppd, level=4, workers=1):
+    '''
+    Returns the best basis according to the given (additive) cost function jointly
+    for all the given 2D input signals: the cost of a node is the sum of the costs
+    of that node of all signals (see wp2). The signals are decomposed one at a time.
+    @param Images:    The input signals of the same shape, e.g. a list of 2D signals
+                      or a (N, H, W) stack (see pgm.batch).
+    @param costf:     The cost function that must be used while searching for the
+                      best basis. Cost functions with an axis argument (see cost) are called
+                      for all nodes of a level at once, others for every node.
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @param workers:   The number of threads (see packettree.PacketTree).
+    @return:          List containing the positions (level, index) of the nodes of the basis
+                      (low levels first, low indices first), see wp2_basis.
+    '''
+    Costs = None
+    for S in Images:
+        Tree = packettree.PacketTree(S, wavelet=wavelet, mode=mode, level=level, workers=workers)
+        C = Tree.costs(costf)
+        Costs = C if Costs == None else [A + B for (A, B) in zip(Costs, C)]
+    if Costs == None:
+        raise ValueError("No input signals")
+    Tree.mark(costf, Costs=Costs)
+    return Tree.basis()
+
+def wp2_basis(S, Basis, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    '''
+    Returns the 2D discrete wavelet packet transformation, with the given basis, for the
+    given 2D input signal. No costs are computed and only the nodes of the basis and their
+    ancestors are computed (see collect_lazy).
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D).
+    @param Basis:     List or (n, 2) array containing the positions (level, index) of the nodes
+                      of the basis (e.g. a shared basis, see shared_basis).
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @return:          A list containing the nodes of the 2D discrete wavelet packet transformation,
+                      with the given basis (low levels first, low indices first), see wp2.
+    '''
+    Nodes = collect_lazy(S, wavelet=wavelet, mode=mode, level=level)
+    return [Nodes[l][i] for (l, i) in sorted([(int(l), int(i)) for (l, i) in Basis])]
+
+def save_basis(fname, Basis):
+    '''
+    Saves the given basis to the file with the given file name (.npy format).
+    @param fname:     The file name.
+    @param Basis:     List containing the positions (level, index) of the nodes of the basis.
+    '''
+    np.save(fname, np.array(Basis, dtype=int).reshape(-1, 2))
+
+def load_basis(fname):
+    '''
+    Returns the basis saved in the file with the given file name (see save_basis).
+    @param fname:     The file name.
+    @return:          List containing the positions (level, index) of the nodes of the basis.
+    '''
+    return [(int(l), int(i)) for (l, i) in np.load(fname)]
                      
+def wp2_pruned(S, costf, wavelet="db4", mode=pywt.MODES.ppd, level=4, stop=None, stats=[], workers=1):
+    '''
+    Returns the 2D discrete wavelet packet transformation, with a basis according
+    to the given cost function, for the given 2D input signal.
+    As opposed to wp2, the basis is searched top-down: the childs of a node are only
+    traversed if the node cannot be kept according to the given stopping rule, so the
+    search is greedy. Only the nodes that are visited are computed.
+    @param S:         Input signal.
+                      Both single and double precision floating-point data types are supported
+                      and the output type depends on the input type. If the input data is not
+                      in one of these types it will be converted to the default double precision
+                      data format before performing computations.
+    @param costf:      The (single parameter) cost function that must be used while
+                      searching for the basis.
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @param stop:      The stopping rule, which is called as stop(cp, cc) with the cost cp
+                      of a node and the sum cc of the costs of its childs, and which returns
+                      True if the node must be kept (and its childs must not be traversed).
+                      If the stopping rule is None, no stopping rule is used and all nodes
+                      are traversed (see stop_no_improvement and stop_tolerance).
+    @param stats:     Buffer to which the number of decomposed nodes is appended.
+    @param workers:   The number of threads that search the four (independent) subtrees
+                      of the first level (see parallel.map).
+    @return:          A list containing the nodes of the 2D discrete wavelet packet transformation,
+                      with the basis according to the given cost function, for the given input signal.
+    @note:            Without stopping rule, the result equals the best basis of wp2
+                      (and all nodes are computed).
+    '''
+    #Data collection step
+    Nodes = collect_lazy(S, wavelet=wavelet, mode=mode, level=level)
+    #Downstream traversal
+    #(the first level is computed before the subtrees are searched)
+    Roots = [Nodes[0][0], Nodes[0][1], Nodes[0][2], Nodes[0][3]]
+    def search_subtree(Node):
+        Buffer = []
+        Node.cost = costf(Node.C)
+        search(Node, Nodes, costf, stop, Buffer)
+        return Buffer
+    Result = sum(parallel.map(search_subtree, Roots, workers=workers), [])
+    stats.append(Nodes.decompositions)
+    return sorted(Result, cmp=node.compare_low_level_first, reverse=False)
+    
+def search(Node, Nodes, costf, stop, Result):
+    '''
+    Searches the basis for the subtree of the given node top-down
+    and marks the given node with the best cost seen so far.
+    The cost of the given node must already be computed.
+    The nodes that belong to the basis will be added to the result.
+    @param Node:      The current node to search.
+    @param Nodes:     The (lazy) quad tree of wavelet packets.
+    @param costf:      The (single parameter) cost function.
+    @param stop:      The stopping rule (or None).
+    @param Result:    Buffer containing the nodes traversed so far that belong
+                      to the basis.
+    '''
+    isBottom = (Node.level == len(Nodes)-1)
+    if not isBottom:
+        i = Node.level + 1
+        j = 4 * Node.index
+        Childs = [Nodes[i][j], Nodes[i][j+1], Nodes[i][j+2], Nodes[i][j+3]]
+        for Child in Childs:
+            Child.cost = costf(Child.C)
+        if stop != None:
+            isBottom = stop(Node.cost, Childs[0].cost + Childs[1].cost + Childs[2].cost + Childs[3].cost)
+    
+    if isBottom:
+        Node.best = Node.cost
+        Result.append(Node)
+    else:
+        Buffer = []
+        for Child in Childs:
+            search(Child, Nodes, costf, stop, Buffer)
+        cc = Childs[0].best + Childs[1].best + Childs[2].best + Childs[3].best
+        if Node.cost <= cc:
+            Node.best = Node.cost
+            Result.append(Node)
+        else:
+            Node.best = cc
+            Result.extend(Buffer)
+        
+def stop_no_improvement(cp, cc):
+    '''
+    Stopping rule which keeps a node if the sum of the costs
+    of its childs does not improve its cost.
+    @param cp:        The cost of the node.
+    @param cc:        The sum of the costs of the childs of the node.
+    '''
+    return cp <= cc
+    
+def stop_tolerance(tolerance):
+    '''
+    Returns a stopping rule which keeps a node if the sum of the costs
+    of its childs does not improve its cost by more than the given tolerance.
+    @param tolerance: The tolerance.
+    '''
+    def stop_fixed_tolerance(cp, cc):
+        return cp <= cc + tolerance
+    return stop_fixed_tolerance
+    
 def collect(S, wavelet, mode, level):
     '''
     Returns the full quad tree of wavelet packets.
-    @param S:         Input signal.
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D).
+                      The nodes of a stack contain the coefficients of all signals
+                      (see dwt.analysis2).
                       Both single and double precision floating-point data types are supported
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
@@ -63,20 +250,104 @@ def collect(S, wavelet, mode, level):
     @return:          The full quad tree of wavelet packets.
     '''
     Nodes = [[] for i in range(level)]
-    (CA, (CH, CV, CD)) = pywt.dwt2(S, wavelet=wavelet, mode=mode)
-    Nodes[0] = [node.Node(CA, 0, 0), node.Node(CH, 0, 1), node.Node(CV, 0, 2), node.Node(CD, 0, 3)]
-    for l in range(0, level-1):
-        Parents = Nodes[l]
-        Childs = []
-        for p in range(len(Parents)):
-            (CA, (CH, CV, CD)) = pywt.dwt2(Parents[p].C, wavelet=wavelet, mode=mode)
-            Childs.append(node.Node(CA, l+1, 4*p))
-            Childs.append(node.Node(CH, l+1, 4*p+1))
-            Childs.append(node.Node(CV, l+1, 4*p+2))
-            Childs.append(node.Node(CD, l+1, 4*p+3))
-        Nodes[l+1] = Childs 
+    #All nodes of one level are decomposed together and the coefficients
+    #of the nodes are views of the stacked coefficients of their level
+    Childs = np.asarray(S)[np.newaxis]
+    for l in range(0, level):
+        Childs = dwt.packets2(Childs, wavelet=wavelet, mode=mode)
+        Nodes[l] = [node.Node(Childs[p], l, p) for p in range(len(Childs))]
     return Nodes
     
+def collect_lazy(S, wavelet, mode, level):
+    '''
+    Returns the lazy quad tree of wavelet packets.
+    The childs of a node are only computed when one of them is accessed
+    for the first time. (see collect)
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D).
+                      Both single and double precision floating-point data types are supported
+                      and the output type depends on the input type. If the input data is not
+                      in one of these types it will be converted to the default double precision
+                      data format before performing computations.
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+    @param level:     Number of decomposition steps to perform.
+    @return:          The lazy quad tree of wavelet packets, which can be indexed
+                      as the full quad tree of wavelet packets (Nodes[level][index]).
+    '''
+    return LazyNodes(S, wavelet=wavelet, mode=mode, level=level)
+    
+class LazyNodes:
+    def __init__(self, S, wavelet, mode, level):
+        '''
+        Creates a new lazy quad tree of wavelet packets.
+        @param S:         Input signal (2D) or stack of input signals of the same shape (3D).
+        @param wavelet:   Wavelet to use in the transform. 
+                          This must be a name of the wavelet from the wavelist() list.
+        @param mode:      Signal extension mode to deal with the border distortion problem.
+        @param level:     Number of decomposition steps to perform.
+        '''
+        self.S = S
+        self.wavelet = wavelet
+        self.mode = mode
+        self.level = level
+        self.Cache = {}
+        self.decompositions = 0
+        #The subtrees of the first level may be computed by multiple threads
+        self.lock = threading.Lock()
+        
+    def __len__(self):
+        return self.level
+        
+    def __getitem__(self, level):
+        if level < 0:
+            level = level + self.level
+        if level < 0 or level >= self.level:
+            raise IndexError("level out of range")
+        return LazyLevel(self, level)
+        
+    def get(self, level, index):
+        '''
+        Returns the node at the given level and index.
+        The node and its siblings are computed if necessary.
+        @param level:     The level of the node.
+        @param index:     The index of the node.
+        '''
+        if (level, index) not in self.Cache:
+            p = index / 4
+            if level == 0:
+                C = self.S
+            else:
+                C = self.get(level-1, p).C
+            (CA, (CH, CV, CD)) = dwt.analysis2(C, wavelet=self.wavelet, mode=self.mode)
+            with self.lock:
+                self.decompositions = self.decompositions + 1
+            self.Cache[(level, 4*p)] = node.Node(CA, level, 4*p)
+            self.Cache[(level, 4*p+1)] = node.Node(CH, level, 4*p+1)
+            self.Cache[(level, 4*p+2)] = node.Node(CV, level, 4*p+2)
+            self.Cache[(level, 4*p+3)] = node.Node(CD, level, 4*p+3)
+        return self.Cache[(level, index)]
+        
+class LazyLevel:
+    def __init__(self, Nodes, level):
+        '''
+        Creates a new view of one level of a lazy quad tree of wavelet packets.
+        @param Nodes:     The lazy quad tree of wavelet packets.
+        @param level:     The level.
+        '''
+        self.Nodes = Nodes
+        self.level = level
+        
+    def __len__(self):
+        return 4**(self.level+1)
+        
+    def __getitem__(self, index):
+        if index < 0:
+            index = index + len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("index out of range")
+        return self.Nodes.get(self.level, index)
+    
 def mark(Nodes, costf):
     '''
     Marks every node of nodes with the best cost seen so far. 
@@ -126,7 +397,7 @@ def traverse(Node, Nodes, Result):
 # SYNTHESIS ALGORITHM FUNCTIONS
 ###############################################################################
         
-def iwp2(Nodes, wavelet="db4", mode=pywt.MODES.ppd):
+def iwp2(Nodes, wavelet="db4", mode=pywt.MODES.ppd, root=(-1, 0), plan=None):
     '''
     Returns the inverse 2D discrete wavelet packet transformation for the given
     list containing the nodes of the 2D discrete wavelet packet transformation.
@@ -136,32 +407,56 @@ def iwp2(Nodes, wavelet="db4", mode=pywt.MODES.ppd):
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodic-padding.
+    @param root:      The position (level, index) of the node to synthesize. The given
+                      nodes must be the nodes of the basis of the subtree of this node.
+                      The default root (-1, 0) corresponds with the original signal.
+    @param plan:      The plan for the basis of the given nodes (see plans.Plan), whose
+                      wavelet, mode and merge schedule are used instead of the given ones.
+                      If the plan is None, the merge schedule is looked up.
     @return:          The inverse 2D discrete wavelet packet transformation for the given
                       list containing the nodes of the 2D discrete wavelet packet transformation.
+    @note:            The merge schedule of the basis of the given nodes is cached
+                      and the given list is not modified. All merges of one level
+                      are done together (see synthesis.run_levels).
     '''
-    heapq.heapify(Nodes)
-    while len(Nodes) != 1:
-        Node1 = heapq.heappop(Nodes)
-        Node2 = heapq.heappop(Nodes)
-        Node3 = heapq.heappop(Nodes)
-        Node4 = heapq.heappop(Nodes) 
-        
-        try:
-            S = pywt.idwt2((Node1.C, (Node2.C, Node3.C, Node4.C)), wavelet=wavelet, mode=mode)
-        except ValueError:
-            print("Id: " + str(Node1.level) + "," + str(Node1.index))
-            print(Node1.C.shape)
-            print("Id: " + str(Node2.level) + "," + str(Node2.index))
-            print(Node2.C.shape)
-            print("Id: " + str(Node3.level) + "," + str(Node3.index))
-            print(Node3.C.shape)
-            print("Id: " + str(Node4.level) + "," + str(Node4.index))
-            print(Node4.C.shape)
-            raise ValueError
-          
-        Merged = node.Node(S, (Node1.level-1), (Node1.index / 4))
-        heapq.heappush(Nodes, Merged)
-    return Nodes[0].C
+    if plan == None:
+        Schedule = synthesis.get_schedule([(Node.level, Node.index) for Node in Nodes], n=4, root=root)
+    else:
+        (Schedule, wavelet, mode) = (plan.Schedule, plan.wavelet, plan.mode)
+    def merge(Childs):
+        (CA, CH, CV, CD) = Childs
+        return dwt.synthesis2((CA, (CH, CV, CD)), wavelet=wavelet, mode=mode)
+    return synthesis.run_levels(Nodes, Schedule, merge, n=4)
+
+def iwp2_region(Nodes, region, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the given region of the inverse 2D discrete wavelet packet transformation
+    for the given list containing the nodes of the 2D discrete wavelet packet transformation.
+    Only the coefficients that affect the region are synthesized.
+    @param Nodes:     List containing the nodes of the 2D discrete wavelet packet
+                      transformation.
+    @param region:    The region ((row start, row stop), (column start, column stop)).
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @return:          The given region of the inverse 2D discrete wavelet packet transformation.
+    @note:            Sample n of the synthesis (without wrap-around) depends on the
+                      coefficients k with (n-1)/2 <= k <= (n+F-2)/2 of the childs
+                      (F is the length of the reconstruction filters).
+    '''
+    Schedule = synthesis.get_schedule([(Node.level, Node.index) for Node in Nodes], n=4)
+    F = pywt.Wavelet(wavelet).rec_len
+    def support(position, Region, k):
+        return tuple([(start / 2, (stop + F - 3) / 2 + 1) for (start, stop) in Region])
+    Regions = synthesis.regions(Schedule, region, support, n=4)
+    def merge(position, Region, Childs, Subregions):
+        (CA, CH, CV, CD) = synthesis.crop(Childs)
+        C = dwt.synthesis2((CA, (CH, CV, CD)), wavelet=wavelet, mode=mode)
+        ((r0, r1), (c0, c1)) = Region
+        ((k0, k1), (l0, l1)) = Subregions[0]
+        return C[..., r0 - 2*k0:r1 - 2*k0, c0 - 2*l0:c1 - 2*l0]
+    return synthesis.run_region(Nodes, Schedule, Regions, merge, n=4)
         
 ###############################################################################
 # TESTS
@@ -193,13 +488,14 @@ def matrix3(size = 100):
 
 import configuration as c
 import cv2
+import pgm
 def house():
     fname = c.get_dir_fingerprints() + "house.tif"
     return cv2.imread(fname, 0)
 
 def fingerprint():
     fname = c.get_dir_fingerprints() + "cmp00001.pgm"
-    return cv2.imread(fname, 0)   
+    return pgm.read(fname)   
       
 if __name__ == "__main__":
     S = matrix(64)
@@ -0,0 +1,406 @@
+'''
+2 Wavelet packets
+Strip-based wavelet transform (2D)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import collections
+import dwt
+import numpy as np
+import pywt
+
+###############################################################################
+# 1D TRANSFORMS
+###############################################################################
+
+def row_dwt(x, Filters, mode):
+    '''
+    Returns the 1D discrete wavelet transformation of the given signal.
+    The result equals pywt.dwt for the supported modes (see dwt.modes).
+    @param x:         The signal.
+    @param Filters:   The filters (see dwt.filters).
+    @param mode:      Signal extension mode.
+    @return:          A tuple containing the approximation and detail coefficients.
+    '''
+    n = len(x)
+    return (dwt.gather(x, dwt.analysis_table(n, Filters[0], mode), 0), dwt.gather(x, dwt.analysis_table(n, Filters[1], mode), 0))
+
+def row_idwt(a, d, Filters):
+    '''
+    Returns the 1D inverse discrete wavelet transformation of the given coefficients.
+    The result equals pywt.idwt for the supported modes.
+    @param a:         The approximation coefficients.
+    @param d:         The detail coefficients.
+    @param Filters:   The filters (see dwt.filters).
+    '''
+    (K, R) = (len(a), len(Filters[2]))
+    U = np.zeros(2*K - 1)
+    V = np.zeros(2*K - 1)
+    U[::2] = a
+    V[::2] = d
+    return (np.convolve(U, Filters[2]) + np.convolve(V, Filters[3]))[R-2:2*K]
+
+###############################################################################
+# ANALYSIS
+###############################################################################
+
+def users(Indices, Mask, n):
+    '''
+    Returns the rows of the given gather table that use every input, as one array
+    of the rows sorted by input and the start of the rows of every input in that array.
+    @param Indices:   The indices of the terms of the gather table (one row per output).
+    @param Mask:      True for the terms with a weight.
+    @param n:         The number of inputs.
+    '''
+    (Rows, Terms) = np.nonzero(Mask)
+    Inputs = Indices[Rows, Terms]
+    Order = np.argsort(Inputs, kind='mergesort')
+    return (Rows[Order], np.searchsorted(Inputs[Order], np.arange(n + 1)))
+
+class ColumnAnalysis:
+    def __init__(self, n, Filters, mode):
+        '''
+        Creates a new line-buffered 1D discrete wavelet transformation along the columns
+        of a 2D signal with the given number of rows. Only the rows that are still needed
+        by a coefficient row that is not final are kept. The bookkeeping consists of the
+        (cached) gather tables and a few integers for every row.
+        @param n:         The number of rows.
+        @param Filters:   The filters (see dwt.filters).
+        @param mode:      Signal extension mode.
+        '''
+        #The terms of both filters have the same order (see dwt.analysis_table),
+        #the terms of zeros of the extension have no weight
+        (self.Indices, self.Low) = dwt.analysis_table(n, Filters[0], mode)
+        self.High = dwt.analysis_table(n, Filters[1], mode)[1]
+        Mask = (self.Low != 0) | (self.High != 0)
+        (self.Users, self.Starts) = users(self.Indices, Mask, n)
+        self.Missing = np.count_nonzero(Mask, axis=1)
+        self.Pending = np.bincount(self.Indices[Mask], minlength=n)
+        self.Rows = {}
+
+    def push(self, i, Row):
+        '''
+        Adds the given row and returns the coefficient rows that became final.
+        The rows may be added in any order.
+        @param i:         The index of the row.
+        @param Row:       The row.
+        @return:          A list containing tuples (index, approximation row, detail row).
+        '''
+        self.Rows[i] = Row
+        Result = []
+        for k in self.Users[self.Starts[i]:self.Starts[i+1]]:
+            self.Missing[k] -= 1
+            if self.Missing[k] > 0:
+                continue
+            L = np.zeros(Row.shape)
+            H = np.zeros(Row.shape)
+            for (j, wl, wh) in zip(self.Indices[k], self.Low[k], self.High[k]):
+                if wl == 0 and wh == 0:
+                    continue
+                L += wl * self.Rows[j]
+                H += wh * self.Rows[j]
+                self.Pending[j] -= 1
+                if self.Pending[j] == 0:
+                    del self.Rows[j]
+            Result.append((k, L, H))
+        return Result
+
+class LevelAnalysis:
+    def __init__(self, shape, Filters, mode):
+        '''
+        Creates a new line-buffered 2D discrete wavelet transformation of one level.
+        @param shape:     The shape of the 2D signal.
+        @param Filters:   The filters (see dwt.filters).
+        @param mode:      Signal extension mode.
+        '''
+        self.Filters = Filters
+        self.mode = mode
+        self.columns = pywt.dwt_coeff_len(shape[1], len(Filters[0]), mode)
+        self.Columns = ColumnAnalysis(shape[0], Filters, mode)
+        self.shape = (pywt.dwt_coeff_len(shape[0], len(Filters[0]), mode), self.columns)
+
+    def push(self, i, Row):
+        '''
+        Adds the given row and returns the coefficient rows that became final.
+        @param i:         The index of the row.
+        @param Row:       The row.
+        @return:          A list containing tuples (index, (CA, CH, CV, CD))
+                          of coefficient rows ordered like the coefficients of pywt.dwt2.
+        '''
+        (L, H) = row_dwt(Row, self.Filters, self.mode)
+        Result = []
+        for (k, Low, High) in self.Columns.push(i, np.concatenate((L, H))):
+            c = self.columns
+            Result.append((k, (Low[:c], High[:c], Low[c:], High[c:])))
+        return Result
+
+def wavedec2(Rows, shape, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    '''
+    Returns a generator of the coefficient rows of the 2D discrete wavelet
+    transformation of the 2D signal with the given rows. The rows are read one
+    at a time and only the rows within the reach of the filters are kept for
+    every level, so only the gather tables (a few integers for every row, see
+    ColumnAnalysis) grow with the number of rows.
+    @param Rows:      Iterable of the rows of the 2D signal (e.g. pgm.rows).
+    @param shape:     The shape of the 2D signal.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @return:          A generator of tuples (level, index, CA, (CH, CV, CD)) containing
+                      the coefficient rows as soon as they are final. CA is None for all
+                      levels but the last one. The rows of one level are not necessarily
+                      generated in order (e.g. the first rows of ppd are generated last).
+    @note:            level 0 corresponds with the first
+                      decomposition in this implementation.
+    '''
+    Filters = dwt.filters(wavelet)
+    Levels = []
+    for l in range(level):
+        Levels.append(LevelAnalysis(shape, Filters, mode))
+        shape = Levels[-1].shape
+    def push(l, i, Row, Result):
+        for (k, (CA, CH, CV, CD)) in Levels[l].push(i, Row):
+            Result.append((l, k, CA if l == level-1 else None, (CH, CV, CD)))
+            if l < level-1:
+                push(l+1, k, CA, Result)
+    n = 0
+    for Row in Rows:
+        Result = []
+        push(0, n, np.asarray(Row, dtype=float), Result)
+        n += 1
+        for R in Result:
+            yield R
+    if n != len(Levels[0].Columns.Starts) - 1:
+        raise ValueError("The signal does not contain the given number of rows")
+
+def coefficients(Strips, shape, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    '''
+    Returns the coefficients of the 2D discrete wavelet transformation
+    assembled from the given coefficient rows.
+    @param Strips:    Iterable of the coefficient rows (see wavedec2).
+    @param shape:     The shape of the 2D signal.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @return:          List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)]
+                      ordered like the coefficients of pywt.wavedec2.
+    '''
+    length = len(dwt.filters(wavelet)[0])
+    Details = []
+    for l in range(level):
+        shape = (pywt.dwt_coeff_len(shape[0], length, mode), pywt.dwt_coeff_len(shape[1], length, mode))
+        Details.append((np.zeros(shape), np.zeros(shape), np.zeros(shape)))
+    CA = np.zeros(shape)
+    for (l, k, A, D) in Strips:
+        if A is not None:
+            CA[k] = A
+        for (C, Row) in zip(Details[l], D):
+            C[k] = Row
+    return [CA] + Details[::-1]
+
+###############################################################################
+# SYNTHESIS
+###############################################################################
+
+def level_synthesis(Rows, CH, CV, CD, Filters):
+    '''
+    Returns a generator of the rows of the 2D inverse discrete wavelet transformation
+    of one level. Only the coefficient rows within the reach of the filters are kept.
+    @param Rows:      Iterator of the rows of the approximation coefficients, which may
+                      contain more rows and columns than the detail coefficients.
+    @param CH:        The horizontal detail coefficients.
+    @param CV:        The vertical detail coefficients.
+    @param CD:        The diagonal detail coefficients.
+    @param Filters:   The filters (see dwt.filters).
+    '''
+    (K, c) = np.shape(CH)
+    R = len(Filters[2])
+    Window = collections.deque()
+    k = 0
+    for n in range(2*K - R + 2):
+        #Output row n depends on the coefficient rows (n-1)/2 <= k <= (n+R-2)/2
+        while k <= min((n + R - 2) / 2, K - 1):
+            CA = next(Rows)[:c]
+            Window.append((k, np.concatenate((CA, CV[k])), np.concatenate((CH[k], CD[k]))))
+            k += 1
+        while Window[0][0] < n / 2:
+            Window.popleft()
+        LH = np.zeros(2 * c)
+        for (j, Low, High) in Window:
+            LH += Filters[2][n + R - 2 - 2*j] * Low + Filters[3][n + R - 2 - 2*j] * High
+        yield row_idwt(LH[:c], LH[c:], Filters)
+
+def waverec2(A, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns a generator of the rows of the 2D inverse discrete wavelet transformation
+    of the given coefficients. The rows are computed one at a time and only the
+    coefficient rows within the reach of the filters are kept for every level.
+    The rows equal the rows of pywt.waverec2 for the supported modes.
+    @param A:         List containing the coefficients [CA, (CH, CV, CD), ..., (CH, CV, CD)]
+                      (see pywt.wavedec2), which can be memory-mapped arrays.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    '''
+    if mode not in dwt.modes:
+        raise ValueError("Unsupported signal extension mode: " + str(mode))
+    Filters = dwt.filters(wavelet)
+    Rows = iter(A[0])
+    for (CH, CV, CD) in A[1:]:
+        Rows = level_synthesis(Rows, CH, CV, CD, Filters)
+    return Rows
+
+class ColumnSynthesis:
+    def __init__(self, K, Filters):
+        '''
+        Creates a new line-buffered 1D inverse discrete wavelet transformation along
+        the columns of 2D coefficients with the given number of rows. Only the coefficient
+        rows that are still needed by an output row that is not final are kept
+        (see ColumnAnalysis).
+        @param K:         The number of coefficient rows.
+        @param Filters:   The filters (see dwt.filters).
+        '''
+        #The terms of both filters have the same order (see dwt.synthesis_table),
+        #the unused terms have no weight
+        (self.Indices, self.Low) = dwt.synthesis_table(K, Filters[2])
+        self.High = dwt.synthesis_table(K, Filters[3])[1]
+        Mask = (self.Low != 0) | (self.High != 0)
+        (self.Users, self.Starts) = users(self.Indices, Mask, K)
+        self.Missing = np.count_nonzero(Mask, axis=1)
+        self.Pending = np.bincount(self.Indices[Mask], minlength=K)
+        self.Rows = {}
+
+    def push(self, k, Low, High):
+        '''
+        Adds the given coefficient rows and returns the output rows that became final.
+        The coefficient rows may be added in any order.
+        @param k:         The index of the coefficient rows.
+        @param Low:       The coefficient row of the reconstruction low-pass filter.
+        @param High:      The coefficient row of the reconstruction high-pass filter.
+        @return:          A list containing tuples (index, row).
+        '''
+        self.Rows[k] = (Low, High)
+        Result = []
+        for n in self.Users[self.Starts[k]:self.Starts[k+1]]:
+            self.Missing[n] -= 1
+            if self.Missing[n] > 0:
+                continue
+            Row = np.zeros(Low.shape)
+            for (j, wl, wh) in zip(self.Indices[n], self.Low[n], self.High[n]):
+                if wl == 0 and wh == 0:
+                    continue
+                Row += wl * self.Rows[j][0] + wh * self.Rows[j][1]
+                self.Pending[j] -= 1
+                if self.Pending[j] == 0:
+                    del self.Rows[j]
+            Result.append((n, Row))
+        return Result
+
+class LevelSynthesis:
+    def __init__(self, shape, Filters):
+        '''
+        Creates a new line-buffered 2D inverse discrete wavelet transformation of one level.
+        @param shape:     The shape of the detail coefficients.
+        @param Filters:   The filters (see dwt.filters).
+        '''
+        self.Filters = Filters
+        self.shape = tuple(shape)
+        self.Columns = ColumnSynthesis(shape[0], Filters)
+        self.Approximations = {}
+        self.Details = {}
+
+    def push(self, k, CA=None, D=None):
+        '''
+        Adds the given approximation and/or detail coefficient rows and returns the
+        rows that became final. The coefficient rows may be added in any order.
+        @param k:         The index of the coefficient rows.
+        @param CA:        The approximation coefficient row (or None), which may contain
+                          more columns than the detail coefficients. Rows beyond the
+                          detail coefficients are ignored (see pywt.waverec2).
+        @param D:         The detail coefficient rows (CH, CV, CD) (or None).
+        @return:          A list containing tuples (index, row).
+        '''
+        (K, c) = self.shape
+        if k >= K:
+            return []
+        if CA is not None:
+            self.Approximations[k] = CA[:c]
+        if D is not None:
+            self.Details[k] = D
+        if k not in self.Approximations or k not in self.Details:
+            return []
+        CA = self.Approximations.pop(k)
+        (CH, CV, CD) = self.Details.pop(k)
+        Result = []
+        for (n, LH) in self.Columns.push(k, np.concatenate((CA, CV)), np.concatenate((CH, CD))):
+            Result.append((n, row_idwt(LH[:c], LH[c:], self.Filters)))
+        return Result
+
+def waverec2_strips(Strips, shape, wavelet="db4", mode=pywt.MODES.ppd, level=4):
+    '''
+    Returns a generator of the rows of the 2D inverse discrete wavelet transformation
+    of the given coefficient rows, which are read one at a time (see wavedec2). Only
+    the coefficient rows within the reach of the filters and the coefficient rows
+    waiting for the rows of the coarser level are kept for every level, so only the
+    gather tables grow with the number of rows (see wavedec2). The rows equal the
+    rows of pywt.waverec2 for the supported modes.
+    @param Strips:    Iterable of tuples (level, index, CA, (CH, CV, CD)) containing the
+                      coefficient rows in any order (see wavedec2).
+    @param shape:     The shape of the 2D signal of the analysis.
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @param level:     Number of decomposition steps to perform.
+    @return:          A generator of tuples (index, row) containing the rows as soon
+                      as they are final. The rows are not necessarily generated in order.
+    '''
+    if mode not in dwt.modes:
+        raise ValueError("Unsupported signal extension mode: " + str(mode))
+    Filters = dwt.filters(wavelet)
+    length = len(Filters[0])
+    Levels = []
+    for l in range(level):
+        shape = (pywt.dwt_coeff_len(shape[0], length, mode), pywt.dwt_coeff_len(shape[1], length, mode))
+        Levels.append(LevelSynthesis(shape, Filters))
+    def push(l, k, CA, D, Result):
+        for (n, Row) in Levels[l].push(k, CA, D):
+            if l == 0:
+                Result.append((n, Row))
+            else:
+                push(l-1, n, Row, None, Result)
+    for (l, k, CA, D) in Strips:
+        Result = []
+        push(l, k, CA, D, Result)
+        for R in Result:
+            yield R
+
+###############################################################################
+# TESTS
+###############################################################################
+
+import os
+import pgm
+
+if __name__ == "__main__":
+    #Streams the rows of a fingerprint of the data directory for every supported mode
+    fname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data", "cmp00001.pgm")
+    shape = pgm.shape(fname)
+    S = np.vstack(list(pgm.rows(fname))).astype(float)
+    for mode in dwt.modes:
+        A = coefficients(wavedec2(pgm.rows(fname), shape, mode=mode), shape, mode=mode)
+        B = pywt.wavedec2(S, "db4", mode=mode, level=4)
+        a = max([np.max(np.abs(x - y)) for (x, y) in zip(A[0:1] + list(sum(A[1:], ())), B[0:1] + list(sum(B[1:], ())))])
+        W = pywt.waverec2(B, "db4", mode=mode)
+        s = np.max(np.abs(np.vstack(list(waverec2(A, mode=mode))) - W))
+        T = np.zeros(W.shape)
+        for (n, Row) in waverec2_strips(wavedec2(pgm.rows(fname), shape, mode=mode), shape, mode=mode):
+            T[n] = Row
+        t = np.max(np.abs(T - W))
+        print("mode " + str(mode) + ": analysis " + str(a) + ", synthesis " + str(s) + ", streamed synthesis " + str(t))
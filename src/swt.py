@@ -0,0 +1,305 @@
+'''
+3 Wavelet packets
+Symmetric wavelet transform (WSQ Annex A.2)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import numpy as np
+
+###############################################################################
+# FILTERS
+###############################################################################
+
+def filters(H0, H1, wss):
+    '''
+    Returns the analysis filters for the given right halves of the analysis filters
+    (see WSQ Annex A.2.1.1). Odd-length filters are whole-sample symmetric (WSS)
+    filters, even-length filters are half-sample symmetric/antisymmetric (HS) filters.
+    @param H0:        The right half of the lowpass analysis filter,
+                      starting at the center of the filter.
+    @param H1:        The right half of the highpass analysis filter,
+                      starting at the center of the filter.
+    @param wss:       True for WSS filters (odd lengths), False for HS filters (even lengths).
+    @return:          A tuple containing a boolean (True for WSS filters) and the
+                      lowpass and highpass analysis filters as tuples (first index,
+                      coefficients).
+    '''
+    H0 = np.asarray(H0, dtype=float)
+    H1 = np.asarray(H1, dtype=float)
+    if len(H0) < 1 or len(H1) < 1:
+        raise ValueError("The filters must contain at least one coefficient")
+    #The WSS filters h0 and h1 are symmetric about 0 and -1.
+    #The HS filters h0 and h1 are symmetric and antisymmetric about -1/2.
+    if wss:
+        h0 = (1 - len(H0), np.concatenate((H0[:0:-1], H0)))
+        h1 = (-len(H1), np.concatenate((H1[:0:-1], H1)))
+    else:
+        h0 = (-len(H0), np.concatenate((H0[::-1], H0)))
+        h1 = (-len(H1), np.concatenate((-H1[::-1], H1)))
+    return (wss, h0, h1)
+
+def synthesis_filters(Filters):
+    '''
+    Returns the synthesis filters f0 and f1 of the given analysis filters
+    as tuples (first index, coefficients):
+    f0(n) = (-1)^n h1(n-1) and f1(n) = (-1)^(n-1) h0(n-1).
+    @param Filters:   The analysis filters (see filters).
+    '''
+    (wss, (s0, h0), (s1, h1)) = Filters
+    f0 = (s1 + 1, h1 * (-1.0)**np.arange(s1 + 1, s1 + 1 + len(h1)))
+    f1 = (s0 + 1, h0 * (-1.0)**np.arange(s0, s0 + len(h0)))
+    return (f0, f1)
+
+###############################################################################
+# SYMMETRIC EXTENSIONS
+###############################################################################
+
+def ranks(n):
+    '''
+    Returns the number of transmitted lowpass and highpass coefficients
+    of a signal of the given length for both WSS and HS filters (see WSQ Table A.1).
+    @param n:         The length of the signal.
+    '''
+    return ((n + 1) / 2, n / 2)
+
+def extension(wss, n, highpass):
+    '''
+    Returns the symmetric extension of the transmitted coefficients of one subband
+    over one period (see WSQ Annex A.2.2.1).
+    @param wss:       True for WSS filters, False for HS filters.
+    @param n:         The length of the signal.
+    @param highpass:  True for the highpass subband, False for the lowpass subband.
+    @return:          A list containing, for every coefficient of the period,
+                      a tuple (transmitted coefficient, sign) or None for a zero.
+    '''
+    #Symmetry centers (doubled) and sign of the subband
+    if wss:
+        (period, left, right, sign) = (n - 1, -1 if highpass else 0, n - 2 if highpass else n - 1, 1)
+    else:
+        (period, left, right, sign) = (n, -1, n - 1, -1 if highpass else 1)
+    rank = ranks(n)[1 if highpass else 0]
+    Extension = [(k, 1) for k in range(rank)] + [None] * (period - rank)
+    Known = [True] * rank + [False] * (period - rank)
+    changed = True
+    while changed:
+        changed = False
+        for k in range(rank, period):
+            if Known[k]:
+                continue
+            for center in (left, right):
+                r = (center - k) % period
+                if r == k and sign < 0:
+                    (Extension[k], Known[k], changed) = (None, True, True)
+                    break
+                if Known[r] and r != k:
+                    if Extension[r] != None:
+                        Extension[k] = (Extension[r][0], sign * Extension[r][1])
+                    (Known[k], changed) = (True, True)
+                    break
+    return Extension
+
+###############################################################################
+# TRANSFORMS
+###############################################################################
+
+# Cache containing the gather tables of the transforms
+Tables = {}
+
+def key_filters(Filters):
+    '''
+    Returns a hashable key for the given analysis filters.
+    @param Filters:   The analysis filters (see filters).
+    '''
+    (wss, (s0, h0), (s1, h1)) = Filters
+    return (wss, s0, tuple(h0), s1, tuple(h1))
+
+def table(Contributions):
+    '''
+    Returns the gather table (indices and weights) of the given contributions.
+    @param Contributions: List containing, for every output, the list of tuples
+                      (input index, weight) contributing to that output.
+    '''
+    T = max([len(C) for C in Contributions] + [1])
+    Indices = np.zeros((len(Contributions), T), dtype=int)
+    Weights = np.zeros((len(Contributions), T))
+    for (i, C) in enumerate(Contributions):
+        for (t, (j, w)) in enumerate(C):
+            Indices[i, t] = j
+            Weights[i, t] = w
+    return (Indices, Weights)
+
+def analysis_table(Filters, n):
+    '''
+    Returns the (cached) gather table of the SWT of a signal of the given length.
+    The outputs are the transmitted lowpass coefficients followed by the
+    transmitted highpass coefficients.
+    @param Filters:   The analysis filters (see filters).
+    @param n:         The length of the signal.
+    '''
+    key = ("analysis", key_filters(Filters), n)
+    if key not in Tables:
+        (wss, h0, h1) = Filters
+        if n < 2:
+            raise ValueError("The signal must contain at least two samples")
+        period = 2 * n - 2 if wss else 2 * n
+        def signal(m):
+            m = m % period
+            return m if m < n else period - m - (0 if wss else 1)
+        Contributions = []
+        for ((s, h), rank) in zip((h0, h1), ranks(n)):
+            for k in range(rank):
+                Contributions.append([(signal(2 * k - (s + t)), h[t]) for t in range(len(h))])
+        Tables[key] = table(Contributions)
+    return Tables[key]
+
+def synthesis_table(Filters, n):
+    '''
+    Returns the (cached) gather table of the inverse SWT of a signal of the given length.
+    The inputs are the transmitted lowpass coefficients followed by the
+    transmitted highpass coefficients.
+    @param Filters:   The analysis filters (see filters).
+    @param n:         The length of the signal.
+    '''
+    key = ("synthesis", key_filters(Filters), n)
+    if key not in Tables:
+        (wss, h0, h1) = Filters
+        if n < 2:
+            raise ValueError("The signal must contain at least two samples")
+        Contributions = [{} for m in range(n)]
+        offset = 0
+        for ((s, f), highpass) in zip(synthesis_filters(Filters), (False, True)):
+            Extension = extension(wss, n, highpass)
+            for m in range(n):
+                for t in range(len(f)):
+                    if (m - s - t) % 2 == 0:
+                        e = Extension[((m - s - t) / 2) % len(Extension)]
+                        if e != None:
+                            j = offset + e[0]
+                            Contributions[m][j] = Contributions[m].get(j, 0.0) + e[1] * f[t]
+            offset += ranks(n)[0]
+        Tables[key] = table([C.items() for C in Contributions])
+    return Tables[key]
+
+def gather(X, Table, axis):
+    '''
+    Returns the outputs of the given gather table applied along the given axis.
+    @param X:         The input array.
+    @param Table:     The gather table (indices and weights).
+    @param axis:      The axis.
+    '''
+    (Indices, Weights) = Table
+    X = np.asarray(X, dtype=float)
+    shape = [1] * X.ndim
+    shape[axis] = Indices.shape[0]
+    Y = np.take(X, Indices[:, 0], axis=axis) * Weights[:, 0].reshape(shape)
+    for t in range(1, Indices.shape[1]):
+        Y += np.take(X, Indices[:, t], axis=axis) * Weights[:, t].reshape(shape)
+    return Y
+
+def support(Filters, n, window):
+    '''
+    Returns the lowpass and highpass coefficients needed by the inverse SWT
+    to synthesize the given window of a signal of the given length.
+    @param Filters:   The analysis filters (see filters).
+    @param n:         The length of the signal.
+    @param window:    The window (start, stop) of the signal.
+    @return:          A tuple containing the windows (start, stop) of the lowpass
+                      and highpass coefficients.
+    '''
+    (Indices, Weights) = synthesis_table(Filters, n)
+    (start, stop) = window
+    Needed = Indices[start:stop][Weights[start:stop] != 0]
+    rank = ranks(n)[0]
+    Windows = []
+    for (Band, offset) in ((Needed[Needed < rank], 0), (Needed[Needed >= rank], rank)):
+        Windows.append((np.min(Band) - offset, np.max(Band) + 1 - offset) if len(Band) > 0 else (0, 0))
+    return tuple(Windows)
+
+def swt(x, Filters, axis=-1):
+    '''
+    Returns the symmetric wavelet transform of the given signal along the given axis.
+    @param x:         The signal.
+    @param Filters:   The analysis filters (see filters).
+    @param axis:      The axis.
+    @return:          A tuple containing the lowpass and highpass coefficients.
+    '''
+    n = np.shape(x)[axis]
+    Y = gather(x, analysis_table(Filters, n), axis)
+    rank = ranks(n)[0]
+    return (np.take(Y, range(rank), axis=axis), np.take(Y, range(rank, n), axis=axis))
+
+def iswt(a0, a1, Filters, axis=-1):
+    '''
+    Returns the inverse symmetric wavelet transform along the given axis.
+    @param a0:        The lowpass coefficients.
+    @param a1:        The highpass coefficients.
+    @param Filters:   The analysis filters (see filters).
+    @param axis:      The axis.
+    '''
+    A = np.concatenate((a0, a1), axis=axis)
+    return gather(A, synthesis_table(Filters, A.shape[axis]), axis)
+
+def iswt_region(a0, a1, Filters, n, window, Windows, axis=-1):
+    '''
+    Returns the given window of the inverse symmetric wavelet transform along the given axis.
+    @param a0:        The window of the lowpass coefficients.
+    @param a1:        The window of the highpass coefficients.
+    @param Filters:   The analysis filters (see filters).
+    @param n:         The length of the signal.
+    @param window:    The window (start, stop) of the signal.
+    @param Windows:   The windows of the lowpass and highpass coefficients,
+                      which must contain the support of the window of the signal (see support).
+    @param axis:      The axis.
+    '''
+    (Indices, Weights) = synthesis_table(Filters, n)
+    (start, stop) = window
+    ((l0, l1), (h0, h1)) = Windows
+    rank = ranks(n)[0]
+    (Indices, Weights) = (Indices[start:stop], Weights[start:stop])
+    Indices = np.where(Indices < rank, Indices - l0, Indices - rank - h0 + (l1 - l0))
+    Indices = np.where(Weights != 0, Indices, 0)
+    return gather(np.concatenate((a0, a1), axis=axis), (Indices, Weights), axis)
+
+def swt2(S, Filters):
+    '''
+    Returns the 2D symmetric wavelet transform of the given 2D signal.
+    The rows are filtered before the columns (see WSQ Annex A.2.3).
+    @param S:         The 2D signal.
+    @param Filters:   The analysis filters (see filters).
+    @return:          The coefficients (CA, (CH, CV, CD)) ordered like the
+                      coefficients of pywt.dwt2.
+    '''
+    (L, H) = swt(S, Filters, axis=1)
+    (CA, CH) = swt(L, Filters, axis=0)
+    (CV, CD) = swt(H, Filters, axis=0)
+    return (CA, (CH, CV, CD))
+
+def iswt2(A, Filters):
+    '''
+    Returns the inverse 2D symmetric wavelet transform.
+    @param A:         The coefficients (CA, (CH, CV, CD)) (see swt2).
+    @param Filters:   The analysis filters (see filters).
+    '''
+    (CA, (CH, CV, CD)) = A
+    L = iswt(CA, CH, Filters, axis=0)
+    H = iswt(CV, CD, Filters, axis=0)
+    return iswt(L, H, Filters, axis=1)
+
+def iswt2_region(A, Filters, shape, Region, Subregions):
+    '''
+    Returns the given region of the inverse 2D symmetric wavelet transform.
+    @param A:         The regions of the coefficients (CA, (CH, CV, CD)) (see swt2).
+    @param Filters:   The analysis filters (see filters).
+    @param shape:     The shape of the 2D signal.
+    @param Region:    The region ((row start, row stop), (column start, column stop))
+                      of the 2D signal.
+    @param Subregions: List containing the regions of CA, CH, CV and CD, which must
+                      contain the support of the region of the 2D signal (see support).
+    '''
+    (CA, (CH, CV, CD)) = A
+    Rows = (Subregions[0][0], Subregions[1][0])
+    Columns = (Subregions[0][1], Subregions[2][1])
+    L = iswt_region(CA, CH, Filters, shape[0], Region[0], Rows, axis=0)
+    H = iswt_region(CV, CD, Filters, shape[0], Region[0], Rows, axis=0)
+    return iswt_region(L, H, Filters, shape[1], Region[1], Columns, axis=1)
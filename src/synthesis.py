@@ -0,0 +1,208 @@
+'''
+2 Wavelet packets
+Synthesis schedules (1D and 2D)
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+
+import collections
+import numpy as np
+
+###############################################################################
+# SCHEDULES
+###############################################################################
+
+# Cache containing the most recently used schedules
+Schedules = collections.OrderedDict()
+max_schedules = 128
+
+def schedule(Basis, n=4, root=(-1, 0)):
+    '''
+    Returns the merge schedule for the given basis.
+    @param Basis:     List containing the positions (level, index) of the nodes
+                      of the basis.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    @param root:      The position (level, index) of the node to synthesize.
+                      The basis must be a basis of the subtree of this node.
+    @return:          A tuple containing the positions (level, index) of the merged
+                      nodes in the order they must be computed (high levels first,
+                      low indices first). The childs of the merged node (level, index)
+                      are the nodes (level+1, n*index+k) for k in range(n). The last
+                      merged node is the root; the root (-1, 0) corresponds to the
+                      original signal.
+    '''
+    Positions = set(Basis)
+    if len(Positions) != len(Basis):
+        raise ValueError("The basis contains duplicate nodes")
+    Merges = []
+    while len(Positions) > 1 or root not in Positions:
+        level = max([l for (l, i) in Positions])
+        if level <= root[0]:
+            raise ValueError("The basis is not a valid basis")
+        Parents = sorted(set([i / n for (l, i) in Positions if l == level]))
+        for p in Parents:
+            for k in range(n):
+                if (level, n*p+k) not in Positions:
+                    raise ValueError("The basis does not contain the node " + str((level, n*p+k)))
+                Positions.remove((level, n*p+k))
+            if (level-1, p) in Positions:
+                raise ValueError("The basis contains the overlapping node " + str((level-1, p)))
+            Positions.add((level-1, p))
+            Merges.append((level-1, p))
+    return tuple(Merges)
+
+def get_schedule(Basis, n=4, root=(-1, 0)):
+    '''
+    Returns the (cached) merge schedule for the given basis.
+    (see schedule)
+    @param Basis:     List containing the positions (level, index) of the nodes
+                      of the basis.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    @param root:      The position (level, index) of the node to synthesize.
+    '''
+    key = (n, root, tuple(sorted(Basis)))
+    if key in Schedules:
+        Schedule = Schedules.pop(key)
+    else:
+        Schedule = schedule(Basis, n=n, root=root)
+        if len(Schedules) >= max_schedules:
+            Schedules.popitem(last=False)
+    Schedules[key] = Schedule
+    return Schedule
+
+###############################################################################
+# SYNTHESIS
+###############################################################################
+
+def subtree(Basis, root, n=4):
+    '''
+    Returns the positions of the given basis that belong to the subtree
+    of the given root.
+    @param Basis:     List containing the positions (level, index) of the nodes
+                      of the basis.
+    @param root:      The position (level, index) of the root.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    '''
+    (level, index) = root
+    return [(l, i) for (l, i) in Basis if l > level and (level < 0 or i / n**(l - level) == index)]
+
+def regions(Schedule, region, support, n=4):
+    '''
+    Returns the regions of the merged nodes and the nodes of the basis that are
+    needed to synthesize the given region of the root of the given schedule.
+    @param Schedule:  The merge schedule (see schedule).
+    @param region:    The region of the root as a tuple containing a range
+                      (start, stop) for every axis.
+    @param support:   The support function, which is called with the position and the
+                      region of a merged node and the number k of a child and returns the
+                      region of that child that is needed to synthesize the region of the
+                      merged node.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    @return:          Dictionary containing the region of every position.
+    '''
+    Regions = {Schedule[-1] : region}
+    for (level, index) in reversed(Schedule):
+        for k in range(n):
+            Regions[(level+1, n*index+k)] = support((level, index), Regions[(level, index)], k)
+    return Regions
+
+def run(Nodes, Schedule, merge, n=4):
+    '''
+    Returns the signal synthesized from the given nodes according to the given
+    merge schedule. The given nodes are not modified.
+    @param Nodes:     List containing the nodes of the basis.
+    @param Schedule:  The merge schedule for the basis of the given nodes
+                      (see schedule).
+    @param merge:     The merge function, which is called with the list containing the
+                      coefficients of the n childs and returns the coefficients of their parent.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    '''
+    Coefficients = {}
+    for Node in Nodes:
+        Coefficients[(Node.level, Node.index)] = Node.C
+    for (level, index) in Schedule:
+        Childs = [Coefficients.pop((level+1, n*index+k)) for k in range(n)]
+        Coefficients[(level, index)] = merge(Childs)
+    return Coefficients[Schedule[-1]]
+
+def run_levels(Nodes, Schedule, merge, n=4):
+    '''
+    Returns the signal synthesized from the given nodes according to the given
+    merge schedule (see run). All merges of one level are done with a single call
+    of the merge function on the stacked coefficients of their childs (merges whose
+    childs are cropped to different shapes are done with separate calls).
+    The given nodes are not modified.
+    @param Nodes:     List containing the nodes of the basis.
+    @param Schedule:  The merge schedule for the basis of the given nodes
+                      (see schedule).
+    @param merge:     The merge function, which is called with the list containing the
+                      stacked coefficients of the n childs of every merged node (node first)
+                      and returns the stacked coefficients of the merged nodes.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    '''
+    Coefficients = {}
+    for Node in Nodes:
+        Coefficients[(Node.level, Node.index)] = Node.C
+    Levels = {}
+    for (level, index) in Schedule:
+        Levels.setdefault(level, []).append(index)
+    for level in sorted(Levels.keys(), reverse=True):
+        Groups = {}
+        for index in Levels[level]:
+            Childs = crop([Coefficients.pop((level+1, n*index+k)) for k in range(n)])
+            Groups.setdefault(Childs[0].shape, []).append((index, Childs))
+        for Group in Groups.values():
+            C = merge([stack([Childs[k] for (index, Childs) in Group]) for k in range(n)])
+            for (i, (index, Childs)) in enumerate(Group):
+                Coefficients[(level, index)] = C[i]
+    return Coefficients[Schedule[-1]]
+
+def run_region(Nodes, Schedule, Regions, merge, n=4):
+    '''
+    Returns the region of the root of the given merge schedule synthesized from the
+    given nodes. Only the regions of the nodes that are needed are synthesized.
+    The given nodes are not modified.
+    @param Nodes:     List containing the nodes of the basis.
+    @param Schedule:  The merge schedule for the basis of the given nodes
+                      (see schedule).
+    @param Regions:   Dictionary containing the region of every position (see regions).
+    @param merge:     The merge function, which is called with the position and the region
+                      of a merged node, the list containing the coefficients of the regions
+                      of its n childs and the list containing the regions of its n childs
+                      and returns the coefficients of the region of the merged node.
+    @param n:         The number of childs of every node
+                      (2 for binary trees and 4 for quad trees).
+    '''
+    Coefficients = {}
+    for Node in Nodes:
+        Region = Regions[(Node.level, Node.index)]
+        Coefficients[(Node.level, Node.index)] = Node.C[(Ellipsis,) + tuple([slice(a, b) for (a, b) in Region])]
+    for (level, index) in Schedule:
+        Positions = [(level+1, n*index+k) for k in range(n)]
+        Childs = [Coefficients.pop(p) for p in Positions]
+        Coefficients[(level, index)] = merge((level, index), Regions[(level, index)], Childs, [Regions[p] for p in Positions])
+    return Coefficients[Schedule[-1]]
+
+def stack(Cs):
+    '''
+    Returns the given coefficient arrays (of the same shape) stacked along
+    a new leading axis. A single coefficient array is not copied.
+    @param Cs:        List containing the coefficient arrays.
+    '''
+    return Cs[0][np.newaxis] if len(Cs) == 1 else np.array(Cs)
+
+def crop(Cs):
+    '''
+    Returns the given coefficient arrays cropped to their common shape.
+    The synthesis of a node with an odd length along some axis results in
+    coefficients with one additional trailing entry along that axis.
+    @param Cs:        List containing the coefficient arrays of the childs of a node.
+    '''
+    shape = tuple([min(s) for s in zip(*[C.shape for C in Cs])])
+    return [C[tuple([slice(0, s) for s in shape])] for C in Cs]
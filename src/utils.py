@@ -5,42 +5,149 @@ Utilities
 @version    1.0
 '''
 
+import layout
+import magnitudes
 import numpy as np
 import pylab
 
 def number_of_large_coeffs(C, threshold=0.1):
+    '''
+    Returns the number of coefficients with an absolute value of at least the
+    given threshold. If a sorted-magnitude index (see magnitudes) is given instead
+    of the coefficients, the threshold can be an array of thresholds.
+    '''
+    if isinstance(C, magnitudes.Magnitudes):
+        return C.count(threshold, inclusive=True)
+    return np.count_nonzero(np.abs(C) >= threshold)
+    
+def flatten_coeffs2(A):
+    '''
+    Returns a flat list containing the (non-copied) coefficient arrays of the
+    2D discrete wavelet transformation [CA, (CH, CV, CD), ..., (CH, CV, CD)].
+    '''
+    return [A[0]] + [C for Cs in A[1:] for C in Cs]
+    
+def split_coeffs(Cs):
+    '''
+    Returns a list containing, for every signal, a list containing the (non-copied)
+    coefficient arrays of that signal. The given coefficient arrays of a stack of
+    signals (3D) are split along the leading axis, those of one signal (2D) are not.
+    '''
+    if np.ndim(Cs[0]) == 2:
+        return [Cs]
+    return [[C[i] for C in Cs] for i in range(np.shape(Cs[0])[0])]
+    
+def order_coeffs(C):
+    '''
+    Returns the memory order of the last two axes of the given coefficient array:
+    'F' if the columns are contiguous (e.g. the coefficients of pywt.dwt2),
+    'C' otherwise (see pack_coeffs).
+    '''
+    return 'F' if C.strides[-2] < C.strides[-1] else 'C'
+    
+def pack_coeffs(Cs, Offsets, size, order='C'):
+    '''
+    Returns a preallocated buffer containing the flattened coefficients of the given
+    coefficient arrays at the given offsets (see plans.Plan). The buffer of the
+    coefficient arrays of a stack of signals (3D) has one row for every signal.
+    @param Cs:        List containing the coefficient arrays.
+    @param Offsets:   List containing the offsets of the coefficient arrays.
+    @param size:      The number of coefficients (of one signal).
+    @param order:     The order in which the last two axes are flattened (see order_coeffs).
+    '''
+    shape = np.shape(Cs[0])[:-2]
+    B = np.empty(shape + (size,), dtype=np.result_type(*Cs))
+    for (C, offset) in zip(Cs, Offsets):
+        if order == 'F':
+            C = np.swapaxes(C, -1, -2)
+        B[..., offset:offset + C.shape[-2] * C.shape[-1]] = np.reshape(C, shape + (-1,))
+    return B
+    
+def unpack_coeffs(B, Offsets, Shapes, order='C'):
+    '''
+    Returns a list containing the coefficient arrays contained in the given
+    buffer (see pack_coeffs). The coefficient arrays are views of the buffer.
+    @param B:         The buffer.
+    @param Offsets:   List containing the offsets of the coefficient arrays.
+    @param Shapes:    List containing the (2D) shapes of the coefficient arrays.
+    @param order:     The order in which the last two axes are flattened (see order_coeffs).
+    '''
+    shape = np.shape(B)[:-1]
+    if order == 'F':
+        return [np.swapaxes(np.reshape(B[..., offset:offset + r*c], shape + (c, r)), -1, -2) for (offset, (r, c)) in zip(Offsets, Shapes)]
+    return [np.reshape(B[..., offset:offset + r*c], shape + (r, c)) for (offset, (r, c)) in zip(Offsets, Shapes)]
+    
+def maximum_coeffs(Cs):
+    '''
+    Returns the maximum of the absolute values of the coefficients
+    of all the given coefficient arrays.
+    '''
+    return max([max(np.amax(C), -np.amin(C)) for C in Cs])
+    
+def hard_threshold_coeffs(Cs, threshold):
+    '''
+    Sets all coefficients of the given coefficient arrays with an absolute value
+    below the given threshold to zero (in place) and returns the number of
+    remaining large coefficients (with an absolute value of at least the threshold).
+    '''
     count = 0
-    for c in C.flatten():
-        if (abs(c) >= threshold):
-            count = count + 1
+    for C in Cs:
+        Mask = np.less(C, threshold)
+        np.logical_and(Mask, np.greater(C, -threshold), out=Mask)
+        np.putmask(C, Mask, 0)
+        count = count + (C.size - np.count_nonzero(Mask))
     return count
+    
+def compress_coeffs(Cs, fraction):
+    '''
+    Sets all coefficients of the given coefficient arrays with an absolute value
+    below the fraction * maximum of the absolute values of the coefficients
+    to zero (in place).
+    Returns a tuple containing the threshold and the number of remaining
+    large coefficients.
+    '''
+    threshold = fraction * maximum_coeffs(Cs)
+    return (threshold, hard_threshold_coeffs(Cs, threshold))
+
+def top_coeffs(Cs, count):
+    '''
+    Sets all coefficients of the given coefficient arrays except the given number
+    of coefficients with the largest absolute values to zero (in place). The implied
+    threshold is found with a partial selection (instead of a full sort) of the absolute
+    values of all coefficients. Of the coefficients with an absolute value equal to
+    the threshold, the first ones are kept, so exactly the given number is kept.
+    Returns a tuple containing the implied threshold (the smallest absolute value
+    of the kept coefficients) and the number of remaining large coefficients.
+    '''
+    size = sum([C.size for C in Cs])
+    if count >= size:
+        return (min([np.amin(np.abs(C)) for C in Cs if C.size > 0] or [0.0]), size)
+    if count <= 0:
+        for C in Cs:
+            C[...] = 0
+        return (np.inf, 0)
+    A = np.concatenate([np.abs(C).reshape(-1) for C in Cs])
+    A.partition(size - count)
+    threshold = A[size - count]
+    #The number of coefficients equal to the threshold that are kept
+    ties = count - np.count_nonzero(A[size-count+1:] > threshold)
+    for C in Cs:
+        M = np.abs(C)
+        np.putmask(C, M < threshold, 0)
+        Equal = np.flatnonzero(M == threshold)
+        if len(Equal) > ties:
+            C.flat[Equal[ties:]] = 0
+        ties = max(0, ties - len(Equal))
+    return (threshold, count)
 
 def concat_coeffs(A):
     return reduce(np.append, A[1:], A[0])
     
-def concat_coeffs2(A):
-    return reduce(combine, A[1:], A[0])
+def concat_coeffs2(A, Layout=None):
+    return layout.concat2(A, Layout=Layout)
     
 def combine(S, (H, V, D)):
-    (Sx, Sy) = S.shape
-    (Hx, Hy) = H.shape
-    (Vx, Vy) = V.shape
-    (Dx, Dy) = D.shape
-
-    NS = np.zeros((Sx+Dx, Sy+Dy))
-    for i in range(Sx):
-        for j in range(Sy):
-            NS[i,j] = S[i,j]
-    for i in range(Hx):
-        for j in range(Hy):
-            NS[i+Sx,j] = H[i,j]
-    for i in range(Vx):
-        for j in range(Vy):
-            NS[i,j+Sy] = V[i,j]
-    for i in range(Dx):
-        for j in range(Dy):
-            NS[i+Sx,j+Sy] = D[i,j]
-    return NS      
+    return layout.concat2([S, (H, V, D)])
     
 def draw_coeffs(C):
     pylab.figure()
@@ -5,17 +5,24 @@
 @version    1.0
 '''
 import node
+import parallel
 import quadtree
 import pywt
+import swt
+import synthesis
 
 ###############################################################################
 # ANALYSIS ALGORITHM FUNCTIONS
 ###############################################################################  
 
-def sd(S, wavelet="db4", mode=pywt.MODES.ppd):
+# Number of decomposition steps of the subband decomposition for fingerprints
+levels = 5
+
+def sd(S, wavelet="db4", mode=pywt.MODES.ppd, workers=1):
     '''
     Returns the subband decomposition for fingerprints for the given 2D input signal.
-    @param S:         Input signal.
+    @param S:         Input signal (2D) or stack of input signals of the same shape (3D),
+                      whose nodes contain the coefficients of all signals (see quadtree.collect).
                       Both single and double precision floating-point data types are supported
                       and the output type depends on the input type. If the input data is not
                       in one of these types it will be converted to the default double precision
@@ -24,19 +31,22 @@ def sd(S, wavelet="db4", mode=pywt.MODES.ppd):
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodic-padding.
+    @param workers:   The number of threads that traverse the four (independent) subtrees
+                      of the first level (see parallel.map).
     @return:          A list containing the nodes of the subband decomposition for fingerprints
                       for the given input signal. 
     '''
     #Data collection step
-    #Optimization: don't construct the full tree, but lazy initialize
-    Nodes = quadtree.collect(S, wavelet=wavelet, mode=mode, level=5)
+    #(only the nodes that are visited during the traversal are computed)
+    Nodes = quadtree.collect_lazy(S, wavelet=wavelet, mode=mode, level=levels)
     #node.print_nodes(Nodes)
-    #Downstream traversal
-    Result = []
-    traverse(Nodes[0][0], Nodes, Result)
-    traverse(Nodes[0][1], Nodes, Result)
-    traverse(Nodes[0][2], Nodes, Result)
-    traverse(Nodes[0][3], Nodes, Result)
+    #Downstream traversal (the first level is computed before the subtrees are traversed)
+    Roots = [Nodes[0][0], Nodes[0][1], Nodes[0][2], Nodes[0][3]]
+    def traverse_subtree(Node):
+        Result = []
+        traverse(Node, Nodes, Result)
+        return Result
+    Result = sum(parallel.map(traverse_subtree, Roots, workers=workers), [])
     return sorted(Result, cmp=node.compare_low_level_first, reverse=False)
         
 def traverse(Node, Nodes, Result):
@@ -76,7 +86,7 @@ def traverse(Node, Nodes, Result):
 # SYNTHESIS ALGORITHM FUNCTIONS
 ###############################################################################
         
-def isd(Nodes, wavelet="db4", mode=pywt.MODES.ppd):
+def isd(Nodes, wavelet="db4", mode=pywt.MODES.ppd, root=(-1, 0), plan=None):
     '''
     Returns the inverse subband decomposition for fingerprints for the given
     list containing the nodes of the discrete wavelet packet transformation.
@@ -86,20 +96,82 @@ def isd(Nodes, wavelet="db4", mode=pywt.MODES.ppd):
                       This must be a name of the wavelet from the wavelist() list.
     @param mode:      Signal extension mode to deal with the border distortion problem.
                       The default mode is periodic-padding.
+    @param root:      The position (level, index) of the node to synthesize
+                      (see quadtree.iwp2).
+    @param plan:      The plan for the basis of the given nodes (see quadtree.iwp2).
     @return:          The inverse subband decomposition for fingerprints for the given
                       list containing the nodes of the discrete wavelet packet transformation.
     '''
-    return quadtree.iwp2(Nodes, wavelet=wavelet, mode=mode)
+    return quadtree.iwp2(Nodes, wavelet=wavelet, mode=mode, root=root, plan=plan)
+
+def isd_region(Nodes, region, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Returns the given region of the inverse subband decomposition for fingerprints
+    for the given list containing the nodes of the discrete wavelet packet transformation.
+    @param Nodes:     List containing the nodes of the subband decomposition
+                      for fingerprints
+    @param region:    The region ((row start, row stop), (column start, column stop)).
+    @param wavelet:   Wavelet to use in the transform. 
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    '''
+    return quadtree.iwp2_region(Nodes, region, wavelet=wavelet, mode=mode)
+
+def isd_swt(Nodes, Filters, root=(-1, 0)):
+    '''
+    Returns the inverse subband decomposition for fingerprints for the given
+    list containing the nodes of the symmetric wavelet transformation
+    (see WSQ Annex A.2).
+    @param Nodes:     List containing the nodes of the subband decomposition
+                      for fingerprints
+    @param Filters:   The analysis filters (see swt.filters).
+    @param root:      The position (level, index) of the node to synthesize
+                      (see quadtree.iwp2).
+    @return:          The inverse subband decomposition for fingerprints for the given
+                      list containing the nodes of the symmetric wavelet transformation.
+    '''
+    Schedule = synthesis.get_schedule([(Node.level, Node.index) for Node in Nodes], n=4, root=root)
+    def merge(Childs):
+        (CA, CH, CV, CD) = Childs
+        return swt.iswt2((CA, (CH, CV, CD)), Filters)
+    return synthesis.run(Nodes, Schedule, merge, n=4)
+
+def isd_swt_region(Nodes, region, Filters):
+    '''
+    Returns the given region of the inverse subband decomposition for fingerprints
+    for the given list containing the nodes of the symmetric wavelet transformation.
+    Only the coefficients that affect the region are synthesized.
+    @param Nodes:     List containing the nodes of the subband decomposition
+                      for fingerprints
+    @param region:    The region ((row start, row stop), (column start, column stop)).
+    @param Filters:   The analysis filters (see swt.filters).
+    '''
+    Schedule = synthesis.get_schedule([(Node.level, Node.index) for Node in Nodes], n=4)
+    #The shapes of the merged nodes follow from the shapes of their childs
+    Shapes = dict([((Node.level, Node.index), Node.C.shape) for Node in Nodes])
+    for (level, index) in Schedule:
+        (SA, SH, SV, SD) = [Shapes[(level+1, 4*index+k)] for k in range(4)]
+        Shapes[(level, index)] = (SA[0] + SH[0], SA[1] + SV[1])
+    def support(position, Region, k):
+        (rows, columns) = Shapes[position]
+        return (swt.support(Filters, rows, Region[0])[k % 2],
+                swt.support(Filters, columns, Region[1])[k / 2])
+    Regions = synthesis.regions(Schedule, region, support, n=4)
+    def merge(position, Region, Childs, Subregions):
+        (CA, CH, CV, CD) = Childs
+        return swt.iswt2_region((CA, (CH, CV, CD)), Filters, Shapes[position], Region, Subregions)
+    return synthesis.run_region(Nodes, Schedule, Regions, merge, n=4)
 
 ###############################################################################
 # TESTS
 ###############################################################################      
 
 import configuration as c
-import cv2
+import pgm
 def fingerprint():
     fname = c.get_dir_fingerprints() + "cmp00002.pgm"
-    return cv2.imread(fname, 0)   
+    return pgm.read(fname)   
       
 if __name__ == "__main__":
     S = fingerprint()
@@ -0,0 +1,673 @@
+'''
+3 Wavelet packets
+3.3 WSQ files
+@author     Matthias Moulin & Vincent Peeters
+@version    1.0
+'''
+import huffman
+import node
+import numpy as np
+import pywt
+import struct
+import swt
+import synthesis
+import wsq
+
+###############################################################################
+# MARKERS
+###############################################################################
+
+SOI = 0xFFA0
+EOI = 0xFFA1
+SOF = 0xFFA2
+SOB = 0xFFA3
+DTT = 0xFFA4
+DQT = 0xFFA5
+DHT = 0xFFA6
+DRI = 0xFFA7
+COM = 0xFFA8
+
+###############################################################################
+# PARAMETERS
+###############################################################################
+
+#Subbands [first, last[ of every block and the Huffman table of every block
+blocks = [(0, 19), (19, 52), (52, 64)]
+tables = [0, 1, 1]
+
+#Quantizer bin center parameter
+bin_center = 0.44
+#Loading factor of the quantizers
+loading = 2.5
+#Minimum variance of a transmitted subband
+min_variance = 1.01
+
+def scale(value, bits=16):
+    '''
+    Returns the scale exponent and the scaled integer of the given non-negative value
+    such that the scaled integer fits in the given number of bits.
+    (value = integer / 10^exponent)
+    @param value:     The value.
+    @param bits:      The number of bits of the scaled integer.
+    '''
+    maximum = (1 << bits) - 1
+    if value == 0:
+        return (0, 0)
+    e = 0
+    while e < 255 and round(value * 10**(e+1)) <= maximum:
+        e += 1
+    return (e, int(round(value * 10**e)))
+
+def unscale(e, v):
+    '''
+    Returns the value of the given scale exponent and scaled integer.
+    @param e:         The scale exponent.
+    @param v:         The scaled integer.
+    '''
+    return v / 10.0**e
+
+#Filter bank path of every subband (see WSQ Figure A.5): every pair contains
+#the filter applied to the rows and the filter applied to the columns
+#(0 for lowpass, 1 for highpass)
+paths = ["00,00,00,00,00", "00,00,00,00,10", "00,00,00,00,01", "00,00,00,00,11",
+         "00,00,00,10", "00,00,00,01", "00,00,00,11",
+         "00,00,10,10", "00,00,10,00", "00,00,10,11", "00,00,10,01",
+         "00,00,01,01", "00,00,01,11", "00,00,01,00", "00,00,01,10",
+         "00,00,11,11", "00,00,11,01", "00,00,11,10", "00,00,11,00",
+         "00,10,10,00", "00,10,10,10", "00,10,10,01", "00,10,10,11",
+         "00,10,00,10", "00,10,00,00", "00,10,00,11", "00,10,00,01",
+         "00,10,11,01", "00,10,11,11", "00,10,11,00", "00,10,11,10",
+         "00,10,01,11", "00,10,01,01", "00,10,01,10", "00,10,01,00",
+         "00,01,01,00", "00,01,01,10", "00,01,01,01", "00,01,01,11",
+         "00,01,11,10", "00,01,11,00", "00,01,11,11", "00,01,11,01",
+         "00,01,00,01", "00,01,00,11", "00,01,00,00", "00,01,00,10",
+         "00,01,10,11", "00,01,10,01", "00,01,10,10", "00,01,10,00",
+         "00,11", "10,10", "10,00", "10,11", "10,01", "01,01", "01,11", "01,00", "01,10",
+         "11,11", "11,01", "11,10", "11,00"]
+
+def position(path):
+    '''
+    Returns the position (level, index) of the node of the subband decomposition
+    for fingerprints with the given filter bank path. The childs of a node are
+    ordered like the coefficients of pywt.dwt2: CA (00), CH (01), CV (10), CD (11).
+    @param path:      The filter bank path.
+    '''
+    Pairs = path.split(",")
+    index = 0
+    for pair in Pairs:
+        index = 4 * index + 2 * int(pair[0]) + int(pair[1])
+    return (len(Pairs) - 1, index)
+
+positions = [position(path) for path in paths]
+
+def subbands(Nodes):
+    '''
+    Returns the nodes of the subband decomposition for fingerprints in
+    subband order (see WSQ Figure A.5).
+    @param Nodes:     List containing the nodes of the subband decomposition
+                      for fingerprints (see wsq.sd).
+    '''
+    Positions = dict([((Node.level, Node.index), Node) for Node in Nodes])
+    return [Positions[p] for p in positions]
+
+def shapes(shape, split):
+    '''
+    Returns the shapes of the subbands of the subband decomposition for fingerprints
+    of an image with the given shape (in subband order).
+    @param shape:     The shape of the image.
+    @param split:     The function returning the lengths (lowpass, highpass) of the
+                      subbands of a signal with the given length.
+    '''
+    Shapes = []
+    for path in paths:
+        (rows, cols) = shape
+        for pair in path.split(","):
+            (rows, cols) = (split(rows)[int(pair[1])], split(cols)[int(pair[0])])
+        Shapes.append((rows, cols))
+    return Shapes
+
+###############################################################################
+# QUANTIZATION
+###############################################################################
+
+def normalize(S):
+    '''
+    Returns the normalized image and the (stored) shift and scale of the
+    normalization of the given image (see WSQ Part 3, 1).
+    @param S:         The image.
+    @return:          A tuple containing the normalized image, the mean M and the scale R
+                      (S = normalized image * R + M).
+    '''
+    S = np.asarray(S, dtype=float)
+    M = unscale(*scale(np.mean(S)))
+    R = unscale(*scale(max(np.max(S) - M, M - np.min(S)) / 128.0))
+    if R == 0:
+        R = 1.0
+    return ((S - M) / R, M, R)
+
+def variance(C, region):
+    '''
+    Returns the (unbiased) variance of the given subband (see WSQ Part 3, 3.1).
+    @param C:         The coefficients of the subband.
+    @param region:    If True the variance is estimated on the central subregion
+                      of the subband, otherwise on the full subband.
+    '''
+    (Y, X) = C.shape
+    if region:
+        (x0, y0) = (X / 8, 9 * Y / 32)
+        C = C[y0:y0 + 7 * Y / 16, x0:x0 + 3 * X / 4]
+    if C.size < 2:
+        return 0.0
+    return np.var(C, ddof=1)
+
+def bin_widths(Subbands, bitrate=0.75):
+    '''
+    Returns the quantization bin widths and zero bin widths of the given subbands
+    for the given target bit rate (see WSQ Part 3, 3.2).
+    @param Subbands:  List containing the nodes of the subband decomposition
+                      for fingerprints in subband order (see subbands).
+    @param bitrate:   The target bit rate (bits per pixel).
+    @return:          A tuple containing the array of bin widths Q and
+                      the array of zero bin widths Z (Q[k] = 0 if
+                      subband k is not transmitted).
+    '''
+    n = len(Subbands)
+    region = sum([variance(Subbands[k].C, True) for k in range(4)]) > 20000
+    Variances = np.array([variance(Subband.C, region) for Subband in Subbands])
+    m = np.array([4.0**(Subband.level+1) for Subband in Subbands])
+    A = np.ones(n)
+    A[[52, 56]] = 1.32
+    A[[53, 58]] = 1.08
+    A[[54, 57]] = 1.42
+    A[[55, 59]] = 1.08
+
+    K0 = [k for k in range(min(n, 60)) if Variances[k] >= min_variance]
+    Qr = np.zeros(n)
+    for k in K0:
+        Qr[k] = 1.0 if k < 4 else 10.0 / (A[k] * np.log(Variances[k]))
+    Sigmas = np.sqrt(Variances)
+
+    K = list(K0)
+    while True:
+        S = np.sum(1.0 / m[K])
+        P = np.prod(np.power(Sigmas[K] / Qr[K], 1.0 / m[K]))
+        q = np.power(2.0, bitrate / S - 1.0) / loading * np.power(P, -1.0 / S)
+        Excluded = [k for k in K if Qr[k] / q >= 2.0 * loading * Sigmas[k]]
+        if len(Excluded) == 0 or len(Excluded) == len(K):
+            break
+        K = [k for k in K if k not in Excluded]
+
+    Q = np.zeros(n)
+    Q[K0] = Qr[K0] / q
+    #Round to the stored precision
+    Q = np.array([unscale(*scale(x)) for x in Q])
+    Z = np.array([unscale(*scale(x)) for x in 1.2 * Q])
+    return (Q, Z)
+
+def quantize(C, Q, Z):
+    '''
+    Returns the quantization indices of the given coefficients
+    (see WSQ Annex A.3).
+    @param C:         The coefficients.
+    @param Q:         The bin width.
+    @param Z:         The zero bin width.
+    '''
+    A = np.ravel(C)
+    P = np.zeros(A.shape, dtype=int)
+    if Q == 0:
+        return P
+    Pos = A > Z / 2.0
+    Neg = A < -Z / 2.0
+    P[Pos] = np.floor((A[Pos] - Z / 2.0) / Q) + 1
+    P[Neg] = np.ceil((A[Neg] + Z / 2.0) / Q) - 1
+    return P
+
+###############################################################################
+# HUFFMAN CODING MODEL
+###############################################################################
+
+def run_symbols(Runs):
+    '''
+    Returns the symbols coding the given zero runs (see WSQ Annex A.4.1).
+    A run longer than 0xFFFF is coded with multiple symbols.
+    @param Runs:      Array containing the lengths of the zero runs.
+    @return:          A tuple containing the arrays of symbols, numbers of additional
+                      bits and additional bits (all runs after each other) and the array
+                      containing the number of symbols of every run.
+    '''
+    Runs = np.asarray(Runs, dtype=np.int64)
+    Counts = (Runs + 0xFFFE) / 0xFFFF
+    Pieces = np.repeat(Runs, Counts)
+    Pieces -= 0xFFFF * (np.arange(len(Pieces)) - np.repeat(np.cumsum(Counts) - Counts, Counts))
+    Pieces = np.minimum(Pieces, 0xFFFF)
+    Symbols = np.select([Pieces <= 100, Pieces <= 0xFF], [Pieces, 105], 106)
+    Sizes = np.select([Pieces <= 100, Pieces <= 0xFF], [0, 8], 16)
+    return (Symbols, Sizes, np.where(Sizes > 0, Pieces, 0), Counts)
+
+def index_symbols(P):
+    '''
+    Returns the symbols coding the given non-zero quantization indices
+    (see WSQ Annex A.4.1).
+    @param P:         Array containing the non-zero quantization indices.
+    @return:          A tuple containing the arrays of symbols, numbers of
+                      additional bits and additional bits.
+    '''
+    P = np.asarray(P, dtype=np.int64)
+    A = np.abs(P)
+    if np.any(A > 0xFFFF):
+        raise ValueError("Quantization index out of range: " + str(np.max(A)))
+    Small = (P >= -73) & (P <= 74)
+    Symbols = np.select([Small, A <= 0xFF], [180 + P, np.where(P > 0, 101, 102)], np.where(P > 0, 103, 104))
+    Sizes = np.select([Small, A <= 0xFF], [0, 8], 16)
+    return (Symbols, Sizes, np.where(Small, 0, A))
+
+def symbols(P, run=0):
+    '''
+    Returns the symbols coding the given quantization indices.
+    Zero runs continue across subbands, so the trailing zero run is not coded
+    but returned.
+    @param P:         The quantization indices.
+    @param run:       The length of the zero run preceding the indices.
+    @return:          A tuple containing the arrays of symbols, numbers of additional
+                      bits and additional bits and the length of the trailing zero run.
+    '''
+    Positions = np.flatnonzero(P)
+    if len(Positions) == 0:
+        return (np.zeros(0, dtype=np.int64),) * 3 + (run + len(P),)
+    Runs = np.diff(np.concatenate(([-1], Positions))) - 1
+    Runs[0] += run
+    (RS, RB, RE, Counts) = run_symbols(Runs)
+    (IS, IB, IE) = index_symbols(P[Positions])
+    #The symbols of every run are followed by the symbol of its index
+    Last = np.cumsum(Counts + 1) - 1
+    Mask = np.ones(Last[-1] + 1, dtype=bool)
+    Mask[Last] = False
+    Arrays = []
+    for (R, I) in [(RS, IS), (RB, IB), (RE, IE)]:
+        A = np.empty(len(Mask), dtype=np.int64)
+        A[Mask] = R
+        A[Last] = I
+        Arrays.append(A)
+    return tuple(Arrays) + (len(P) - 1 - Positions[-1],)
+
+###############################################################################
+# ENCODER
+###############################################################################
+
+def block_symbols(Subbands, first, last, Q, Z):
+    '''
+    Generates the symbols coding the given block of subbands, one subband at a time.
+    The subbands are quantized when they are visited.
+    @param Subbands:  List containing the nodes of the subband decomposition
+                      for fingerprints in subband order (see subbands).
+    @param first:     The first subband of the block.
+    @param last:      The subband following the last subband of the block.
+    @param Q:         The bin widths of the subbands.
+    @param Z:         The zero bin widths of the subbands.
+    @return:          A generator of tuples containing the arrays of symbols,
+                      numbers of additional bits and additional bits.
+    '''
+    run = 0
+    for k in range(first, min(last, len(Subbands))):
+        if Q[k] > 0:
+            (Symbols, Sizes, Extras, run) = symbols(quantize(Subbands[k].C, Q[k], Z[k]), run)
+            yield (Symbols, Sizes, Extras)
+    (Symbols, Sizes, Extras, Counts) = run_symbols([run] if run > 0 else [])
+    yield (Symbols, Sizes, Extras)
+
+def segment(marker, Data):
+    '''
+    Returns the marker segment with the given marker and parameters.
+    @param marker:    The marker.
+    @param Data:      The parameters (bytes).
+    '''
+    return struct.pack('>HH', marker, len(Data) + 2) + Data
+
+def mode_name(mode):
+    '''
+    Returns the name of the given signal extension mode.
+    @param mode:      Signal extension mode.
+    '''
+    for name in pywt.MODES.modes:
+        if getattr(pywt.MODES, name) == mode:
+            return name
+    raise ValueError("Unknown mode: " + str(mode))
+
+def write(fname, Nodes, shape, M, R, bitrate=0.75, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Writes the given subband decomposition for fingerprints to a WSQ file.
+    The subbands are quantized and coded one at a time: every subband is
+    quantized once to count the symbols for the Huffman tables and once more
+    when it is coded, so no quantized copy of the image is kept.
+    @param fname:     The file name.
+    @param Nodes:     List containing the nodes of the subband decomposition
+                      for fingerprints of the normalized image (see wsq.sd).
+    @param shape:     The shape (height, width) of the image.
+    @param M:         The shift of the normalization (see normalize).
+    @param R:         The scale of the normalization (see normalize).
+    @param bitrate:   The target bit rate (bits per pixel).
+    @param wavelet:   Wavelet used in the transform.
+    @param mode:      Signal extension mode used in the transform.
+    @return:          The number of bytes written.
+    @note:            The transform table (DTT) can only describe the symmetric
+                      WSQ filters. The wavelet and mode are stored in a comment
+                      segment (COM) instead.
+    '''
+    Subbands = subbands(Nodes)
+    (Q, Z) = bin_widths(Subbands, bitrate=bitrate)
+
+    #Symbol counts of every Huffman table
+    Counts = [np.zeros(256, dtype=int) for t in range(max(tables)+1)]
+    for ((first, last), t) in zip(blocks, tables):
+        for (Symbols, Sizes, Extras) in block_symbols(Subbands, first, last, Q, Z):
+            Counts[t] += np.bincount(Symbols, minlength=256)
+    Specifications = [huffman.specification(C) for C in Counts]
+    Tables = [huffman.encoding_table(BITS, HUFFVAL) for (BITS, HUFFVAL) in Specifications]
+
+    f = open(fname, 'wb')
+    try:
+        f.write(struct.pack('>H', SOI))
+        f.write(segment(COM, "wavelet " + wavelet + "\nmode " + mode_name(mode)))
+        #Quantization table
+        Data = struct.pack('>BH', *scale(bin_center))
+        for k in range(64):
+            (q, z) = (Q[k], Z[k]) if k < len(Subbands) else (0, 0)
+            Data += struct.pack('>BHBH', *(scale(q) + scale(z)))
+        f.write(segment(DQT, Data))
+        #Huffman tables
+        Data = ""
+        for (t, (BITS, HUFFVAL)) in enumerate(Specifications):
+            Data += struct.pack('>B16B', t, *BITS) + struct.pack('>%dB' % len(HUFFVAL), *HUFFVAL)
+        f.write(segment(DHT, Data))
+        #Frame header
+        (height, width) = shape
+        f.write(segment(SOF, struct.pack('>BBHHBHBHBH', 0, 255, height, width,
+                                         *(scale(M) + scale(R) + (2, 0)))))
+        #Blocks
+        for ((first, last), t) in zip(blocks, tables):
+            f.write(segment(SOB, struct.pack('>B', t)))
+            (EHUFCO, EHUFSI) = Tables[t]
+            (EHUFCO, EHUFSI) = (np.array(EHUFCO), np.array(EHUFSI))
+            Writer = huffman.BitWriter()
+            for (Symbols, Sizes, Extras) in block_symbols(Subbands, first, last, Q, Z):
+                Writer.write((EHUFCO[Symbols] << Sizes) | Extras, EHUFSI[Symbols] + Sizes)
+                f.write(Writer.take())
+            Writer.pad()
+            f.write(Writer.take())
+        f.write(struct.pack('>H', EOI))
+        return f.tell()
+    finally:
+        f.close()
+
+def encode(S, fname, bitrate=0.75, wavelet="db4", mode=pywt.MODES.ppd):
+    '''
+    Compresses the given image to a WSQ file.
+    @param S:         The image.
+    @param fname:     The file name.
+    @param bitrate:   The target bit rate (bits per pixel).
+    @param wavelet:   Wavelet to use in the transform.
+                      This must be a name of the wavelet from the wavelist() list.
+    @param mode:      Signal extension mode to deal with the border distortion problem.
+                      The default mode is periodic-padding.
+    @return:          The number of bytes written.
+    '''
+    (N, M, R) = normalize(S)
+    Nodes = wsq.sd(N, wavelet=wavelet, mode=mode)
+    return write(fname, Nodes, np.shape(S), M, R, bitrate=bitrate, wavelet=wavelet, mode=mode)
+
+###############################################################################
+# DECODER
+###############################################################################
+
+def dequantize(P, Q, Z, C=bin_center):
+    '''
+    Returns the coefficients of the given quantization indices
+    (see WSQ Annex A.3).
+    @param P:         The quantization indices.
+    @param Q:         The bin width.
+    @param Z:         The zero bin width.
+    @param C:         The quantizer bin center parameter.
+    '''
+    P = np.asarray(P, dtype=float)
+    return np.where(P > 0, (P - C) * Q + Z / 2.0, np.where(P < 0, (P + C) * Q - Z / 2.0, 0.0))
+
+def decode_indices(Windows, Table, count):
+    '''
+    Returns the quantization indices decoded from the given entropy-coded data.
+    @param Windows:   The 16-bit windows of the entropy-coded data (see huffman.windows).
+    @param Table:     The lookup tables of the Huffman table (see huffman.decoding_table).
+    @param count:     The number of quantization indices.
+    @return:          An array containing the quantization indices.
+    '''
+    (Symbols, Sizes) = Table
+    Positions = []
+    Values = []
+    (position, value) = (Positions.append, Values.append)
+    (bit, i) = (0, 0)
+    while i < count:
+        w = Windows[bit]
+        s = Symbols[w]
+        bit += Sizes[w]
+        if s <= 100:
+            if s == 0:
+                raise ValueError("Invalid Huffman code at bit " + str(bit))
+            i += s
+        elif s >= 107:
+            position(i)
+            value(s - 180)
+            i += 1
+        elif s <= 104:
+            extra = Windows[bit] >> 8 if s <= 102 else Windows[bit]
+            bit += 8 if s <= 102 else 16
+            position(i)
+            value(extra if s % 2 == 1 else -extra)
+            i += 1
+        else:
+            i += Windows[bit] >> 8 if s == 105 else Windows[bit]
+            bit += 8 if s == 105 else 16
+    P = np.zeros(max(count, i), dtype=int)
+    P[Positions] = Values
+    return P[:count]
+
+def read(fname, count=64):
+    '''
+    Reads the given WSQ file.
+    @param fname:     The file name.
+    @param count:     The number of subbands to read. Only the blocks containing
+                      these subbands are decoded.
+    @return:          A tuple containing the list containing the (dequantized) nodes of
+                      the first count subbands of the subband decomposition for fingerprints,
+                      the shape of the image,
+                      the shift M and the scale R of the normalization, the analysis filters
+                      of the transform table (see swt.filters) and the tuple (wavelet, mode)
+                      of the comment segment (None if not present).
+    '''
+    f = open(fname, 'rb')
+    try:
+        Data = f.read()
+    finally:
+        f.close()
+    Bytes = np.frombuffer(Data, dtype=np.uint8)
+    #Positions of all markers (0xFF followed by a non-zero byte)
+    Markers = np.flatnonzero((Bytes[:-1] == 0xFF) & (Bytes[1:] != 0))
+    if struct.unpack('>H', Data[:2])[0] != SOI:
+        raise ValueError("Not a WSQ file: " + fname)
+
+    (Filters, Wavelet) = (None, None)
+    Tables = {}
+    restart = 0
+    (Q, Z, C) = (None, None, None)
+    Frame = None
+    Stream = []
+    p = 2
+    while p < len(Data):
+        marker = struct.unpack('>H', Data[p:p+2])[0]
+        if marker == EOI:
+            break
+        length = struct.unpack('>H', Data[p+2:p+4])[0]
+        Segment = Data[p+4:p+2+length]
+        p += 2 + length
+        if marker == DTT:
+            (L0, L1) = struct.unpack('>BB', Segment[:2])
+            Values = [struct.unpack('>BBI', Segment[i:i+6]) for i in range(2, len(Segment), 6)]
+            Values = [(-1 if sn else 1) * unscale(e, v) for (sn, e, v) in Values]
+            n0 = (L0 + 1) / 2
+            Filters = swt.filters(Values[:n0], Values[n0:n0 + (L1 + 1) / 2], L0 % 2 == 1)
+        elif marker == DQT:
+            C = unscale(*struct.unpack('>BH', Segment[:3]))
+            Values = [struct.unpack('>BHBH', Segment[i:i+6]) for i in range(3, len(Segment), 6)]
+            Q = [unscale(eq, q) for (eq, q, ez, z) in Values]
+            Z = [unscale(ez, z) for (eq, q, ez, z) in Values]
+        elif marker == DHT:
+            i = 0
+            while i < len(Segment):
+                t = struct.unpack('>B', Segment[i])[0]
+                BITS = list(struct.unpack('>16B', Segment[i+1:i+17]))
+                HUFFVAL = list(struct.unpack('>%dB' % sum(BITS), Segment[i+17:i+17+sum(BITS)]))
+                Tables[t] = huffman.decoding_table(BITS, HUFFVAL)
+                i += 17 + sum(BITS)
+        elif marker == DRI:
+            restart = struct.unpack('>H', Segment[:2])[0]
+        elif marker == COM:
+            Lines = dict([tuple(line.split(" ", 1)) for line in Segment.split("\n") if " " in line])
+            if "wavelet" in Lines and "mode" in Lines:
+                Wavelet = (Lines["wavelet"], getattr(pywt.MODES, Lines["mode"]))
+        elif marker == SOF:
+            (A, B, height, width, em, m, er, r, ev, sf) = struct.unpack('>BBHHBHBHBH', Segment[:17])
+            Frame = ((height, width), unscale(em, m), unscale(er, r))
+        elif marker == SOB:
+            t = struct.unpack('>B', Segment[:1])[0]
+            #The entropy-coded data ends at the next marker other than a restart marker
+            Ends = [m for m in Markers[np.searchsorted(Markers, p):]
+                    if not (0xB0 <= Bytes[m+1] <= 0xB7)]
+            end = Ends[0] if len(Ends) > 0 else len(Data)
+            Stream.append((t, restart, Data[p:end]))
+            p = end
+        else:
+            raise ValueError("Unknown marker: " + hex(marker))
+
+    if Frame == None or Q == None or (Filters == None and Wavelet == None):
+        raise ValueError("Incomplete WSQ file: " + fname)
+    (shape, M, R) = Frame
+    if Filters == None:
+        (wavelet, mode) = Wavelet
+        length = pywt.Wavelet(wavelet).dec_len
+        split = lambda n: (pywt.dwt_coeff_len(n, length, mode),) * 2
+    else:
+        split = swt.ranks
+    Shapes = shapes(shape, split)
+
+    #Decode the blocks and dequantize the subbands
+    Nodes = []
+    for ((first, last), (t, restart, Block)) in zip(blocks, Stream):
+        if first >= count:
+            break
+        Transmitted = [k for k in range(first, last) if Q[k] > 0]
+        size = sum([Shapes[k][0] * Shapes[k][1] for k in Transmitted])
+        P = decode_block(Block, Tables[t], size, restart)
+        offset = 0
+        for k in range(first, last):
+            (level, index) = positions[k]
+            if Q[k] > 0:
+                size = Shapes[k][0] * Shapes[k][1]
+                A = dequantize(P[offset:offset+size], Q[k], Z[k], C).reshape(Shapes[k])
+                offset += size
+            else:
+                A = np.zeros(Shapes[k])
+            Nodes.append(node.Node(A, level, index))
+    for k in range(len(Nodes), len(positions)):
+        (level, index) = positions[k]
+        Nodes.append(node.Node(np.zeros(Shapes[k]), level, index))
+    return (Nodes[:count], shape, M, R, Filters, Wavelet)
+
+def decode_block(Block, Table, count, restart=0):
+    '''
+    Returns the quantization indices decoded from the given block.
+    @param Block:     The entropy-coded data of the block.
+    @param Table:     The lookup tables of the Huffman table (see huffman.decoding_table).
+    @param count:     The number of quantization indices of the block.
+    @param restart:   The restart interval (0 if restart markers are not used).
+    '''
+    if restart == 0:
+        return decode_indices(huffman.windows(Block), Table, count)
+    #Every restart interval is byte aligned and followed by a restart marker
+    Bytes = np.frombuffer(Block, dtype=np.uint8)
+    Restarts = np.flatnonzero((Bytes[:-1] == 0xFF) & (Bytes[1:] >= 0xB0) & (Bytes[1:] <= 0xB7))
+    Starts = [0] + list(Restarts + 2)
+    Ends = list(Restarts) + [len(Block)]
+    Intervals = [decode_indices(huffman.windows(Block[s:e]), Table, min(restart, count - i * restart))
+                 for (i, (s, e)) in enumerate(zip(Starts, Ends)) if i * restart < count]
+    return np.concatenate(Intervals)
+
+def decode(fname):
+    '''
+    Returns the image of the given WSQ file.
+    @param fname:     The file name.
+    '''
+    (Nodes, shape, M, R, Filters, Wavelet) = read(fname)
+    if Filters == None:
+        (wavelet, mode) = Wavelet
+        N = wsq.isd(Nodes, wavelet=wavelet, mode=mode)[:shape[0], :shape[1]]
+    else:
+        N = wsq.isd_swt(Nodes, Filters)
+    return np.clip(np.floor(N * R + M + 0.5), 0, 255).astype(np.uint8)
+
+def preview(fname, level=1):
+    '''
+    Returns a reduced-resolution preview of the image of the given WSQ file.
+    The preview is synthesized from the coarse subbands only: level 0 uses the
+    subbands 0-51 (1/4 of the size) and level 1 uses the subbands 0-18 (1/16 of
+    the size), which only requires the first block to be decoded.
+    @param fname:     The file name.
+    @param level:     The level (0 or 1) of the lowpass node to synthesize.
+    '''
+    if level not in (0, 1):
+        raise ValueError("The level of the preview must be 0 or 1")
+    root = (level, 0)
+    count = len(synthesis.subtree(positions, root, n=4))
+    (Nodes, shape, M, R, Filters, Wavelet) = read(fname, count=count)
+    if Filters == None:
+        (wavelet, mode) = Wavelet
+        N = wsq.isd(Nodes, wavelet=wavelet, mode=mode, root=root)
+        gain = np.sum(pywt.Wavelet(wavelet).dec_lo)
+        #The first sample of the signal corresponds with coefficient (F-2)/2 of the lowpass subband
+        delay = pywt.Wavelet(wavelet).dec_len - 2
+    else:
+        N = wsq.isd_swt(Nodes, Filters, root=root)
+        gain = np.sum(Filters[1][1])
+        delay = 0
+    (offset, shape) = (0, np.asarray(shape))
+    for l in range(level + 1):
+        (offset, shape) = ((offset + delay) / 2, (shape + 1) / 2)
+    #Every level of lowpass filtering scales the (constant) signal by the gain of both filters
+    N = N[offset:offset+shape[0], offset:offset+shape[1]] / gain**(2 * (level + 1))
+    return np.clip(np.floor(N * R + M + 0.5), 0, 255).astype(np.uint8)
+
+def decode_region(fname, region):
+    '''
+    Returns the given region of the image of the given WSQ file.
+    Only the coefficients that affect the region are synthesized.
+    @param fname:     The file name.
+    @param region:    The region ((row start, row stop), (column start, column stop)).
+    '''
+    (Nodes, shape, M, R, Filters, Wavelet) = read(fname)
+    ((r0, r1), (c0, c1)) = region
+    if not (0 <= r0 < r1 <= shape[0] and 0 <= c0 < c1 <= shape[1]):
+        raise ValueError("The region must be a non-empty region of the image")
+    if Filters == None:
+        (wavelet, mode) = Wavelet
+        N = wsq.isd_region(Nodes, region, wavelet=wavelet, mode=mode)
+    else:
+        N = wsq.isd_swt_region(Nodes, region, Filters)
+    return np.clip(np.floor(N * R + M + 0.5), 0, 255).astype(np.uint8)
+
+###############################################################################
+# TESTS
+###############################################################################
+
+if __name__ == "__main__":
+    S = wsq.fingerprint()
+    n = encode(S, "cmp00002.wsq")
+    print("bytes: " + str(n) + " bits per pixel: " + str(8.0 * n / S.size) + " ratio: " + str(float(S.size) / n))
+    R = decode("cmp00002.wsq")
+    print("mse: " + str(np.mean((R - np.asarray(S, dtype=float))**2)))